@@ -0,0 +1,84 @@
+# core/cache.py
+"""
+Single-flight caching on top of django.core.cache.
+
+`get_or_build` stores values in an envelope with a soft expiry and keeps them
+in the cache for a grace period after it. Once the soft expiry passes, one
+worker takes a short lock (SET NX on Redis) and rebuilds. Meanwhile the others
+keep serving the stale value, or wait briefly if there is nothing to serve yet.
+When the cache is unreachable every caller simply builds.
+Entries may also be refreshed a little early at random ("XFetch"), weighted by
+how long they took to build, so a hot key rarely expires under load at all.
+"""
+import logging
+import math
+import random
+import time
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+LOCK_TIMEOUT = 30          # seconds a rebuild may hold the lock
+WAIT_TIMEOUT = 3           # seconds a worker waits for someone else's rebuild
+WAIT_INTERVAL = 0.05
+EARLY_REFRESH_BETA = 1.0   # >1 refreshes earlier, 0 disables early refresh
+
+
+def _lock_key(key):
+    return f"{key}:lock"
+
+
+def _is_fresh(envelope, beta):
+    """XFetch check: refresh early with a probability that grows near expiry."""
+    early = envelope['delta'] * beta * -math.log(1.0 - random.random())
+    return time.time() + early < envelope['expires']
+
+
+def _store(key, value, timeout, delta):
+    envelope = {'value': value, 'expires': time.time() + timeout, 'delta': delta}
+    # Keep the entry past its soft expiry so it can be served stale during a rebuild
+    cache.set(key, envelope, timeout=timeout * 2)
+
+
+def _rebuild(key, build, timeout):
+    started = time.time()
+    value = build()
+    _store(key, value, timeout, time.time() - started)
+    return value
+
+
+def get_or_build(key, build, timeout, beta=EARLY_REFRESH_BETA):
+    """
+    Return the cached value for `key`, calling `build()` to produce it when it is
+    missing or due for refresh. Only one caller rebuilds a key at a time.
+    Exceptions from `build()` propagate and nothing is cached.
+    """
+    envelope = cache.get(key)
+    if envelope is not None and _is_fresh(envelope, beta):
+        return envelope['value']
+
+    lock_key = _lock_key(key)
+    deadline = time.monotonic() + WAIT_TIMEOUT
+    while True:
+        acquired = cache.add(lock_key, 1, timeout=LOCK_TIMEOUT)
+        if acquired is None:
+            # The cache is unreachable (errors are ignored): there is no lock to wait for
+            return build()
+        if acquired:
+            try:
+                return _rebuild(key, build, timeout)
+            finally:
+                cache.delete(lock_key)
+
+        # Another worker is rebuilding: serve what we have, or wait for its result
+        if envelope is not None:
+            return envelope['value']
+        if time.monotonic() >= deadline:
+            logger.warning("Timed out waiting for cache rebuild of %s, building locally", key)
+            return _rebuild(key, build, timeout)
+
+        time.sleep(WAIT_INTERVAL)
+        envelope = cache.get(key)
+        if envelope is not None:
+            return envelope['value']
@@ -0,0 +1,64 @@
+# core/currency.py
+"""
+Request-scoped currency handling.
+
+The currency and its exchange rate are resolved once per request and then read
+from serializer context, instead of every price field re-reading the X-Currency
+header and hitting the rates cache.
+"""
+from .service import get_exchange_rates
+
+BASE_CURRENCY = 'GHS'
+
+
+def get_exchange_rate(currency):
+    """Rate from the base currency (GHS) to `currency`. The base currency needs no lookup."""
+    if not currency or currency == BASE_CURRENCY:
+        return 1
+    return get_exchange_rates().get(currency, 1)
+
+
+def get_request_currency(request):
+    """
+    Return (currency, exchange_rate) for a request.
+    The result is memoized on the underlying HttpRequest, so DRF's Request
+    wrapper and the plain Django request share it.
+    """
+    if request is None:
+        return BASE_CURRENCY, 1
+
+    http_request = getattr(request, '_request', request)
+    resolved = getattr(http_request, '_currency_rate', None)
+    if resolved is None:
+        currency = getattr(http_request, 'currency', None) or request.headers.get('X-Currency', BASE_CURRENCY)
+        resolved = (currency, get_exchange_rate(currency))
+        http_request._currency_rate = resolved
+    return resolved
+
+
+def currency_context(request, **extra):
+    """Serializer context carrying the request's currency and rate."""
+    currency, exchange_rate = get_request_currency(request)
+    return {'request': request, 'currency': currency, 'exchange_rate': exchange_rate, **extra}
+
+
+class CurrencyContextMixin:
+    """
+    Serializer mixin for price-bearing serializers.
+
+    Reads `currency` and `exchange_rate` from context. When a view only passed
+    the request, they are resolved once and stored on the shared context, so
+    nested serializers reuse them.
+    """
+
+    def get_currency_context(self):
+        context = self.context
+        if 'exchange_rate' not in context:
+            context['currency'], context['exchange_rate'] = get_request_currency(context.get('request'))
+        return context['currency'], context['exchange_rate']
+
+    def get_currency(self, obj):
+        return self.get_currency_context()[0]
+
+    def convert_price(self, amount):
+        return round(amount * self.get_currency_context()[1], 2)
@@ -0,0 +1,30 @@
+# core/dispatch.py
+"""
+Best-effort task dispatch from request paths.
+
+`apply_async` blocks for a long time when the broker is unreachable: kombu
+retries the connection, and with the Redis result backend Celery also
+subscribes to the task's result before publishing. For nudges sent from views
+and on_commit hooks, where the database (an outbox row, a periodic task)
+already guarantees the work gets done, `dispatch` publishes over a connection
+with a short connect timeout and no retries, stores no result, and logs
+instead of raising.
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+DISPATCH_CONNECT_TIMEOUT = 1  # seconds
+
+
+def dispatch(task, args=None, kwargs=None, **options):
+    """Send `task` without waiting on an unreachable broker. Returns whether it was sent."""
+    try:
+        with task.app.connection_for_write(
+            connect_timeout=DISPATCH_CONNECT_TIMEOUT, transport_options={'max_retries': 0},
+        ) as connection:
+            task.apply_async(args, kwargs, connection=connection, retry=False, ignore_result=True, **options)
+    except Exception as e:
+        logger.warning(f"Could not dispatch {task.name}: {e}")
+        return False
+    return True
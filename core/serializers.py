@@ -12,7 +12,7 @@ from datetime import timedelta
 from userauths.tokens import otp_token_generator
 from django.db.models.query_utils import Q
 from address.models import *
-from .service import get_exchange_rates
+from .currency import CurrencyContextMixin
 from decimal import Decimal
 import random  # make sure this import is at the top of your file
 
@@ -25,7 +25,7 @@ class UserSerializer(serializers.ModelSerializer):
         model = User
         fields = ['id','first_name', 'last_name', 'email', 'phone', 'role']
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(CurrencyContextMixin, serializers.ModelSerializer):
     currency = serializers.SerializerMethodField()
     price = serializers.SerializerMethodField()
     old_price = serializers.SerializerMethodField()
@@ -35,25 +35,11 @@ class ProductSerializer(serializers.ModelSerializer):
         model = Product
         fields = ['id', 'title', 'slug', 'image', 'price', 'old_price', "currency", "sub_category"]
     
-    def get_currency(self, obj):
-        request = self.context.get('request')
-        return request.headers.get('X-Currency', 'GHS') if request else 'GHS'
-
     def get_price(self, obj):
-        request = self.context.get('request')
-        currency = request.headers.get('X-Currency', 'GHS') if request else 'GHS'
-        if currency:
-            rates = get_exchange_rates()
-            return round(obj.price * rates.get(currency, 1), 2)
-        return obj.price
+        return self.convert_price(obj.price)
 
     def get_old_price(self, obj):
-        request = self.context.get('request')
-        currency = request.headers.get('X-Currency', 'GHS') if request else 'GHS'
-        if currency:
-            rates = get_exchange_rates()
-            return round(obj.old_price * rates.get(currency, 1), 2)
-        return obj.old_price
+        return self.convert_price(obj.old_price)
 
 class SubCategorySerializer(serializers.ModelSerializer):
     image = serializers.ImageField(use_url=True)
@@ -186,7 +172,7 @@ class ProductReviewSerializer(serializers.ModelSerializer):
         return wishlist_item
 
 
-class HomeSliderSerializer(serializers.ModelSerializer):
+class HomeSliderSerializer(CurrencyContextMixin, serializers.ModelSerializer):
     price = serializers.SerializerMethodField()
     currency = serializers.SerializerMethodField()
 
@@ -206,16 +192,8 @@ class HomeSliderSerializer(serializers.ModelSerializer):
             'is_active',
         ]
 
-    def get_currency(self, obj):
-        request = self.context.get('request')
-        return request.headers.get('X-Currency', 'GHS') if request else 'GHS'
-
     def get_price(self, obj):
-        request = self.context.get('request')
-        currency = request.headers.get('X-Currency', 'GHS') if request else 'GHS'
-        rates = get_exchange_rates()
-
-        exchange_rate = Decimal(str(rates.get(currency, 1)))  # Safely convert float to Decimal
+        exchange_rate = Decimal(str(self.get_currency_context()[1]))  # Safely convert float to Decimal
         return round(obj.price * exchange_rate, 2)
 
 
@@ -6,7 +6,6 @@ from order.models import *
 from .serializers import *
 from product.serializers import ProductSerializer, VariantSerializer
 from django.db.models import Avg, Count
-import random
 import json
 from django.core.cache import cache
 from rest_framework import status
@@ -18,6 +17,12 @@ from rest_framework.permissions import AllowAny
 from order.service import *
 from rest_framework.permissions import IsAuthenticated
 from .service import *
+from .currency import BASE_CURRENCY, get_request_currency
+from .cache import get_or_build
+from product.models import Sub_Category
+from product.trending_stream import top_trending
+from product.candidates import recommend_for_session
+from product.similarity import get_similar_products
 
 class MainCategoryWithCategoriesAPIView(APIView):
     def get(self, request):
@@ -47,8 +52,8 @@ class MainAPIView(APIView):
 
     def get(self, request, *args, **kwargs):
         # Get latest products with average ratings
-        new_products = Product.objects.filter(status='published', product_type="new").annotate(average_rating=Avg('reviews__rating'), review_count=Count('reviews')).order_by('-date')[:9]
-        most_popular = Product.objects.filter(status='published').annotate(average_rating=Avg('reviews__rating'), review_count=Count('reviews')).order_by('-views')[:8]
+        new_products = Product.objects.filter(status='published', product_type="new").order_by('-date')[:9]
+        most_popular = Product.objects.filter(status='published').order_by('-views')[:8]
 
         category = Category.objects.order_by('-engagement_score').first()
 
@@ -63,8 +68,8 @@ class MainAPIView(APIView):
             # Serialize product data
             product_data = {
                 'product': ProductSerializer(product, context={'request': request}).data,  # Serialize the product instance
-                'average_rating': product.average_rating or 0,
-                'review_count': product.review_count or 0,
+                'average_rating': product.average_rating,
+                'review_count': product.review_count,
                 # 'variants': VariantSerializer(product_variants, many=True).data,
                 # 'colors': list(product_colors),  # ensure list is serialized correctly
             }
@@ -115,16 +120,12 @@ class RecentlyViewedRelatedProductsAPIView(APIView):
             position = int(request.query_params.get("position", 0))
             product_id = product_ids[position]
 
-            product = Product.objects.select_related("sub_category").get(pk=product_id)
-            sub_category = product.sub_category
+            product = Product.objects.only("id", "sub_category_id").get(pk=product_id)
 
-            if not sub_category:
+            if not product.sub_category_id:
                 return Response([], status=status.HTTP_200_OK)
 
-            related_products = Product.objects.filter(
-                sub_category=sub_category,
-                status='published'
-            ).exclude(id=product.id)[:10]
+            related_products = get_similar_products(product)
 
             serializer = ProductSerializer(related_products, many=True, context={'request': request})
             return Response(serializer.data)
@@ -179,51 +180,26 @@ class RecommendedProducts(APIView):
         sorted_viewed_products = [products_dict[pid] for pid in viewed_product_ids if pid in products_dict]
 
         # -----------------------------
-        # 2. Related by Category
-        # -----------------------------
-        related_products = set()
-        for product in viewed_products_qs:
-            related_products.update(
-                Product.objects.filter(
-                    status='published',
-                    sub_category=product.sub_category
-                ).exclude(id=product.id)
-            )
-
-        # -----------------------------
-        # 3. Related by Search History
+        # 2. Search History
         # -----------------------------
         try:
             search_cookie = request.COOKIES.get('search_history', '[]')
             search_history = json.loads(search_cookie)
+            if not isinstance(search_history, list):
+                search_history = []
         except Exception:
             search_history = []
 
-        search_related_products = set()
-        for query in search_history:
-            matched_by_title = Product.objects.filter(
-                status="published", title__icontains=query
-            ).exclude(id__in=viewed_product_ids)
-
-            matched_by_description = Product.objects.filter(
-                status="published", description__icontains=query
-            ).exclude(id__in=viewed_product_ids)
-
-            search_related_products.update(matched_by_title)
-            search_related_products.update(matched_by_description)
-
         # -----------------------------
-        # 4. Combine, Shuffle, Limit
+        # 3. Bounded candidates: bought together, search history, same category
         # -----------------------------
-        combined_related = list(related_products | search_related_products)
-        random.shuffle(combined_related)
-        recommending_products = combined_related[:10]
+        recommending_products = recommend_for_session(sorted_viewed_products, search_history, limit=10)
 
         if not sorted_viewed_products and not search_history:
             recommending_products = Product.objects.filter(status='published').order_by('-views')[:10]
 
         # -----------------------------
-        # 5. Serialize & Return
+        # 4. Serialize & Return
         # -----------------------------
         serialized_viewed = ProductSerializer(
             sorted_viewed_products, many=True, context={'request': request}
@@ -243,24 +219,40 @@ class RecommendedProducts(APIView):
 
 class TrendingProductsAPIView(APIView):
     def get(self, request):
-        products_data = cache.get("top_trending_product")
-
-        if not products_data:
-            products = Product.objects.filter(status='published').order_by('-trending_score')[:10]
-            # Serialize in base currency only (GHS)
-            products_data = ProductSerializer(products, many=True, context={'request': request}).data
-            cache.set("top_trending_products", products_data, timeout=600)  # Cache for 10 minutes
+        # Optional ?category=<sub category slug> narrows the list to one sub category
+        slug = request.GET.get('category')
+        sub_category = Sub_Category.objects.filter(slug=slug).first() if slug else None
+        if slug and not sub_category:
+            return Response({"detail": "Category not found"}, status=404)
+
+        def build():
+            published = Product.objects.filter(status='published')
+            if sub_category:
+                published = published.filter(sub_category=sub_category)
+            # Live decayed scores from Redis; the snapshotted column when Redis is unavailable
+            try:
+                ids = top_trending(10, sub_category.id if sub_category else None)
+            except Exception:
+                ids = []
+            by_id = published.in_bulk(ids) if ids else {}
+            products = [by_id[product_id] for product_id in ids if product_id in by_id]
+            if len(products) < 10:
+                products += list(published.exclude(id__in=by_id).order_by('-trending_score')[:10 - len(products)])
+            # Serialize in base currency only (GHS); the request currency is applied below
+            return ProductSerializer(
+                products, many=True, context={'request': request, 'currency': BASE_CURRENCY, 'exchange_rate': 1}
+            ).data
+
+        cache_key = f"top_trending_products:{sub_category.id if sub_category else 'all'}"
+        products_data = get_or_build(cache_key, build, timeout=60)  # Scores move continuously; keep it short
 
         # Always convert prices for current request currency (dynamic part)
-        currency = request.headers.get('X-Currency', 'GHS')
-        rates = get_exchange_rates()
-        exchange_rate = rates.get(currency, 1)
-
-        for product in products_data:
-            product['currency'] = currency
-            product['price'] = round(product['price'] * exchange_rate, 2)
+        currency, exchange_rate = get_request_currency(request)
 
-        return Response(products_data)
+        return Response([
+            {**product, 'currency': currency, 'price': round(product['price'] * exchange_rate, 2)}
+            for product in products_data
+        ])
 
 # Suggested products based on cart
 # Suggested products based on cart
@@ -280,6 +280,16 @@ CACHES = {
     }
 }
 
+# Elasticsearch (set in .env); one pooled client per process, see product/search_client.py
+ELASTICSEARCH = {
+    "HOSTS": config("ELASTICSEARCH_URL", default="http://localhost:9200").split(","),
+    "MAX_CONNECTIONS": 25,  # per node, shared by every thread in the process
+    "REQUEST_TIMEOUT": 30,  # indexing and maintenance calls
+    "SEARCH_TIMEOUT": 2,  # deadline for a storefront query
+    "BREAKER_FAILURES": 5,  # consecutive failures before search falls back
+    "BREAKER_COOLDOWN": 30,  # seconds on the fallback before ES is tried again
+}
+
 # Sessions stored in Redis
 SESSION_ENGINE = "django.contrib.sessions.backends.cache"
 SESSION_CACHE_ALIAS = "default"
@@ -0,0 +1,74 @@
+# order/cart_cache.py
+"""
+Versioned cache of priced carts.
+
+Every customer's cart has a version token in the cache. The CartItem signals
+in order/signals.py replace it with `bump_cart_version` after every committed
+save or delete of an item, whichever view or payment flow made it; bulk
+updates, which send no signals, bump it themselves. A priced payload is stored
+under (customer, kind, currency, address) together with the version it was
+priced at, and the token and the payload are read with one `get_many`: a
+read of an unchanged cart is a single cache round trip and no queries, and a
+payload priced at an older version is rebuilt.
+
+Product prices, delivery rates, vendor locations and exchange rates are not
+part of the version; QUOTE_TIMEOUT bounds how long a change to them takes to
+show in a cached cart. Cached payloads are shared and must be treated as
+read-only.
+"""
+import uuid
+
+from django.core.cache import cache
+
+QUOTE_TIMEOUT = 300
+NO_ADDRESS = '-'
+
+
+def _version_key(user_id):
+    return f"cart_version:{user_id}"
+
+
+def _quote_key(user_id, kind, currency, address):
+    return f"cart_quote:{user_id}:{kind}:{currency}:{address}"
+
+
+def _new_version():
+    return uuid.uuid4().hex[:12]
+
+
+def bump_cart_version(user_id):
+    """Invalidate every cached payload of the customer's cart."""
+    cache.set(_version_key(user_id), _new_version(), timeout=None)
+
+
+def address_key(profile):
+    """The part of a profile's location that pricing depends on."""
+    if profile is None or profile.latitude is None or profile.longitude is None:
+        return NO_ADDRESS
+    return f"{profile.latitude:.6f},{profile.longitude:.6f}"
+
+
+def get_cart_quote(user_id, kind, build, currency='', address=NO_ADDRESS):
+    """
+    The `kind` payload of the customer's cart for `currency` and `address`,
+    calling `build()` when it is missing or was priced at an older version.
+    Exceptions from `build()` propagate and nothing is cached.
+    """
+    version_key = _version_key(user_id)
+    quote_key = _quote_key(user_id, kind, currency, address)
+    found = cache.get_many([version_key, quote_key])
+
+    version = found.get(version_key)
+    if version is None:
+        version = _new_version()
+        if not cache.add(version_key, version, timeout=None):
+            version = cache.get(version_key) or version
+
+    entry = found.get(quote_key)
+    if entry is not None and entry['version'] == version:
+        return entry['value']
+
+    # Read before building: a cart changed meanwhile bumps past this version
+    value = build()
+    cache.set(quote_key, {'version': version, 'value': value}, QUOTE_TIMEOUT)
+    return value
@@ -5,9 +5,11 @@ from rest_framework.response import Response
 from rest_framework import status
 from product.models import Product, Variants
 from .models import Cart
+from .cart_cache import get_cart_quote
+from .pricing import CartPricingEngine
 from product.serializers import ProductSerializer, VariantSerializer
 from .serializers import CartItemSerializer
-from core.service import get_exchange_rates
+from core.currency import currency_context, get_request_currency
 
 logger = logging.getLogger(__name__)
 
@@ -26,39 +28,46 @@ def calculate_packaging_fee(weight, volume):
 
 
 def get_authenticated_cart_response(request):
-    cart = Cart.objects.get_for_request(request)
-    currency = request.headers.get('X-Currency', 'GHS')
-    rates = get_exchange_rates()
-    exchange_rate = rates.get(currency, 1)
-    if not cart:
-        return Response(
-            {"detail": "Cart not found", "items": [], "total_amount": 0, "packaging_fee": 0, "currency": currency},
-            status=status.HTTP_200_OK
-        )
-
-    cart_items = cart.cart_items.all()
-    total_amount = cart.total_price
-    packaging_fee = cart.calculate_packaging_fees()
+    currency, exchange_rate = get_request_currency(request)
 
-    return Response({
-        "items": CartItemSerializer(cart_items, context={'request': request}, many=True).data,
-        "total_amount": round(total_amount * exchange_rate, 2),
-        "packaging_fee": round(packaging_fee * exchange_rate, 2),
-        "cart_id": cart.id,
-        "currency": currency,
-    })
+    def build():
+        cart = Cart.objects.get_for_request(request)
+        if not cart:
+            return {"detail": "Cart not found", "items": [], "total_amount": 0, "packaging_fee": 0, "currency": currency}
+
+        # Item totals only: delivery is priced at checkout, once there is an address
+        quote = CartPricingEngine(include_delivery=False).price(cart)
+        return {
+            "items": CartItemSerializer(
+                [line.item for line in quote.lines], context=currency_context(request), many=True
+            ).data,
+            "total_amount": round(float(quote.subtotal) * exchange_rate, 2),
+            "packaging_fee": round(float(quote.packaging_fee) * exchange_rate, 2),
+            "cart_id": cart.id,
+            "currency": currency,
+        }
+
+    return Response(get_cart_quote(request.user.id, 'cart', build, currency), status=status.HTTP_200_OK)
+
+
+def get_cart_quantity(request):
+    """Total quantity in the authenticated user's cart, cached per cart version."""
+    def build():
+        cart = Cart.objects.get_for_request(request)
+        return cart.total_quantity if cart else 0
+
+    return get_cart_quote(request.user.id, 'quantity', build)
 
 
 def get_guest_cart_response(request):
     guest_cart_header = request.headers.get('X-Guest-Cart')
-    currency = request.headers.get('X-Currency', 'GHS')
-    rates = get_exchange_rates()
-    exchange_rate = rates.get(currency, 1)
+    currency, exchange_rate = get_request_currency(request)
     try:
         guest_cart = json.loads(guest_cart_header) if guest_cart_header else []
     except (json.JSONDecodeError, TypeError):
         guest_cart = []
 
+    context = currency_context(request)
     items = []
     total_amount = 0
     packaging_fee = 0
@@ -78,8 +87,8 @@ def get_guest_cart_response(request):
                 price = variant.price
 
             item_data = {
-                "product": ProductSerializer(product, context={'request': request}).data,
-                "variant": VariantSerializer(variant, context={'request': request}).data if variant else None,
+                "product": ProductSerializer(product, context=context).data,
+                "variant": VariantSerializer(variant, context=context).data if variant else None,
                 "quantity": quantity,
                 "subtotal": price * quantity,
             }
@@ -91,68 +91,19 @@ class Cart(models.Model):
     
     def calculate_total_delivery_fee(self, user_profile):
         """
-        Calculate the total delivery fee based on vendors and their respective locations.
-        Each vendor is processed once.
+        Delivery fees of all vendors plus the packaging fees (see order.pricing).
         """
-        processed_vendors = set()
-        total_delivery_fee = Decimal(0)
-        vendor_delivery_fees = {}
-
-        packaging_fees = Decimal(self.calculate_packaging_fees())
-
-        for item in self.cart_items.all():
-
-            product_delivery_option = ProductDeliveryOption.objects.filter(
-                product=item.product, default=True
-            ).first()
-
-            # Fallback if no default option is defined
-            if not product_delivery_option:
-                product_delivery_option = ProductDeliveryOption.objects.filter(product=item.product).first()
-
-
-            product = item.product
-            vendor = product.vendor
-            # delivery_option_cost = item.delivery_option.cost if item.delivery_option else product_delivery_option.delivery_option.cost
-            if item.delivery_option:
-                delivery_option_cost = item.delivery_option.cost
-            elif product_delivery_option and product_delivery_option.delivery_option:
-                delivery_option_cost = product_delivery_option.delivery_option.cost
-            else:
-                raise ValidationError(f"No delivery option available for product: {item.product.title}")
-
-
-
-            # Retrieve delivery options for the product that are set to default
-
-
-            if vendor not in processed_vendors:
-                # Calculate the delivery fee based on the vendor's location
-                delivery_fee = calculate_delivery_fee(
-                    vendor.about.latitude, vendor.about.longitude,
-                    user_profile.latitude, user_profile.longitude,
-                    delivery_option_cost  # Use the first product's delivery option cost for calculation
-                )
-                total_delivery_fee += Decimal(delivery_fee)
-                vendor_delivery_fees[vendor.id] = Decimal(delivery_fee)
-                processed_vendors.add(vendor)
-            else:
-                # If the vendor has already been processed, add only the delivery option cost
-                total_delivery_fee += Decimal(delivery_option_cost)
-
-        return total_delivery_fee + packaging_fees
+        from .pricing import CartPricingEngine
+        quote = CartPricingEngine.for_profile(user_profile).price(self)
+        return quote.delivery_fee + quote.packaging_fee
     
     
     def calculate_grand_total(self, user_profile):
         """
         Calculate the grand total amount for the cart.
         """
-        total_amount = Decimal(self.total_price)  # Convert total_price to Decimal
-        # packaging_fees = Decimal(self.calculate_packaging_fees())  # Convert packaging fees to Decimal
-        delivery_fees = Decimal(self.calculate_total_delivery_fee(user_profile))  # Convert delivery fees to Decimal
-
-        grand_total = total_amount + delivery_fees
-        return grand_total
+        from .pricing import CartPricingEngine
+        return CartPricingEngine.for_profile(user_profile).price(self).grand_total
     
     def check_address_region(self, user_profile):
         """
@@ -0,0 +1,155 @@
+# order/pricing.py
+"""
+Single-pass cart pricing.
+
+CartPricingEngine loads a cart's items together with their product, vendor
+location, variant, chosen delivery option and the product's delivery options
+in two queries, reads the delivery rate once, and walks the items once. The
+result is a CartQuote: an immutable snapshot with the subtotal, packaging
+fees, the delivery fee per vendor and the grand total, plus the priced lines
+for views that list the items.
+
+Delivery follows the existing rules. The first item of each vendor pays the
+distance-based fee (base price up to 5 km, then per km, plus the item's
+delivery option cost); further items from the same vendor add only their
+option's cost. An item without a chosen option uses the product's default
+option, then any of its options; a product with none can't be priced.
+"""
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db.models import Prefetch
+
+from product.models import ProductDeliveryOption
+from product.utils import calculate_packaging_fee
+from .models import CartItem, DeliveryRate
+from .service import delivery_fee_for_distance, haversine
+
+DEFAULT_BUYER_LOCATION = (5.5600, -0.2050)  # Accra, for profiles without coordinates
+ZERO = Decimal(0)
+
+
+def to_decimal(value):
+    return Decimal(str(value or 0))
+
+
+@dataclass(frozen=True)
+class PricedLine:
+    item: CartItem
+    unit_price: Decimal
+    amount: Decimal
+    packaging_fee: Decimal
+    delivery_option: object  # the DeliveryOption used, or None when delivery wasn't priced
+    delivery_options: tuple  # every ProductDeliveryOption of the product
+
+    @property
+    def product(self):
+        return self.item.product
+
+
+@dataclass(frozen=True)
+class CartQuote:
+    lines: tuple
+    subtotal: Decimal
+    packaging_fee: Decimal
+    vendor_delivery_fees: tuple  # ((vendor_id, fee), ...) in cart order
+    delivery_fee: Decimal
+    grand_total: Decimal
+    total_quantity: int
+
+    @property
+    def total_items(self):
+        return len(self.lines)
+
+    @property
+    def is_empty(self):
+        return not self.lines
+
+
+EMPTY_QUOTE = CartQuote((), ZERO, ZERO, (), ZERO, ZERO, 0)
+
+
+class CartPricingEngine:
+    """Prices carts for one buyer location. Pass include_delivery=False where only item totals are shown."""
+
+    def __init__(self, buyer_location=None, include_delivery=True):
+        latitude, longitude = buyer_location or (None, None)
+        self.buyer_latitude = latitude or DEFAULT_BUYER_LOCATION[0]
+        self.buyer_longitude = longitude or DEFAULT_BUYER_LOCATION[1]
+        self.include_delivery = include_delivery
+
+    @classmethod
+    def for_profile(cls, profile, include_delivery=True):
+        return cls((profile.latitude, profile.longitude) if profile else None, include_delivery)
+
+    def load_items(self, cart):
+        options = ProductDeliveryOption.objects.select_related('delivery_option').order_by('-default', 'id')
+        return list(
+            CartItem.objects.filter(cart=cart, product__isnull=False)
+            .select_related('product__vendor__about', 'variant', 'delivery_option')
+            .prefetch_related(Prefetch('product__productdeliveryoption_set', queryset=options))
+            .order_by('id')
+        )
+
+    def delivery_rate(self):
+        rate_record = DeliveryRate.objects.first()
+        if not rate_record:
+            raise ValueError("Delivery rate not set in the database")
+        return rate_record
+
+    def vendor_distance(self, vendor):
+        about = getattr(vendor, 'about', None) if vendor else None
+        if about is None or about.latitude is None or about.longitude is None:
+            return 0  # location unknown: charge the base price
+        return haversine(about.latitude, about.longitude, self.buyer_latitude, self.buyer_longitude)
+
+    def price(self, cart):
+        if cart is None:
+            return EMPTY_QUOTE
+        items = self.load_items(cart)
+        if not items:
+            return EMPTY_QUOTE
+        rate_record = self.delivery_rate() if self.include_delivery else None
+
+        lines = []
+        vendor_fees = {}
+        subtotal = packaging = delivery = ZERO
+        quantity = 0
+        for item in items:
+            product = item.product
+            unit_price = to_decimal(item.variant.price if item.variant else product.price)
+            packaging_fee = to_decimal(calculate_packaging_fee(product.weight, product.volume)) * item.quantity
+            delivery_options = tuple(product.productdeliveryoption_set.all())
+
+            delivery_option = None
+            if self.include_delivery:
+                delivery_option = item.delivery_option or (delivery_options[0].delivery_option if delivery_options else None)
+                if delivery_option is None:
+                    raise ValidationError(f"No delivery option available for product: {product.title}")
+                if product.vendor_id not in vendor_fees:
+                    fee = to_decimal(delivery_fee_for_distance(
+                        self.vendor_distance(product.vendor), rate_record, delivery_option.cost,
+                    ))
+                    vendor_fees[product.vendor_id] = fee
+                else:
+                    # The vendor already pays the trip; further items add their option's cost
+                    fee = to_decimal(delivery_option.cost)
+                    vendor_fees[product.vendor_id] += fee
+                delivery += fee
+
+            amount = unit_price * item.quantity
+            subtotal += amount
+            packaging += packaging_fee
+            quantity += item.quantity
+            lines.append(PricedLine(item, unit_price, amount, packaging_fee, delivery_option, delivery_options))
+
+        return CartQuote(
+            lines=tuple(lines),
+            subtotal=subtotal,
+            packaging_fee=packaging,
+            vendor_delivery_fees=tuple(vendor_fees.items()),
+            delivery_fee=delivery,
+            grand_total=subtotal + packaging + delivery,
+            total_quantity=quantity,
+        )
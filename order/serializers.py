@@ -5,12 +5,12 @@ from rest_framework import serializers
 from .models import DeliveryOption  # Adjust the import according to your project structure
 from vendor.models import Vendor
 from address.serializers import AddressSerializer
-from core.service import get_exchange_rates
+from core.currency import CurrencyContextMixin
 from decimal import Decimal
 
 
 
-class DeliveryOptionSerializer(serializers.ModelSerializer):
+class DeliveryOptionSerializer(CurrencyContextMixin, serializers.ModelSerializer):
     status = serializers.SerializerMethodField()
     date_range = serializers.SerializerMethodField()
     currency = serializers.SerializerMethodField()
@@ -32,16 +32,8 @@ class DeliveryOptionSerializer(serializers.ModelSerializer):
             }
         return result
     
-    def get_currency(self, obj):
-        request = self.context.get('request')
-        return request.headers.get('X-Currency', 'GHS') if request else 'GHS'
-
     def get_cost(self, obj):
-        request = self.context.get('request')
-        currency = request.headers.get('X-Currency', 'GHS') if request else 'GHS'
-        rates = get_exchange_rates()  # Make sure this is imported and working
-
-        exchange_rate = Decimal(rates.get(currency, 1))  # Default to 1 if currency not found
+        exchange_rate = Decimal(self.get_currency_context()[1])  # cost is a DecimalField
         return round(obj.cost * exchange_rate, 2)
 
 class ProductDeliveryOptionSerializer(serializers.ModelSerializer):
@@ -70,7 +62,7 @@ class VendorSerializer(serializers.ModelSerializer):
         model = Vendor
         fields = ['name']
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(CurrencyContextMixin, serializers.ModelSerializer):
     delivery_options = DeliveryOptionSerializer(many=True)
     vendor = VendorSerializer()
     currency = serializers.SerializerMethodField()
@@ -106,17 +98,8 @@ class ProductSerializer(serializers.ModelSerializer):
             "currency",
         ]
     
-    def get_currency(self, obj):
-        request = self.context.get('request')
-        return request.headers.get('X-Currency', 'GHS') if request else 'GHS'
-
     def get_price(self, obj):
-        request = self.context.get('request')
-        currency = request.headers.get('X-Currency', 'GHS') if request else 'GHS'
-        if currency:
-            rates = get_exchange_rates()
-            return round(obj.price * rates.get(currency, 1), 2)
-        return obj.price
+        return self.convert_price(obj.price)
 
 class ColorSerializer(serializers.ModelSerializer):
     class Meta:
@@ -128,7 +111,7 @@ class SizeSerializer(serializers.ModelSerializer):
         model = Size
         fields = '__all__'
 
-class VariantSerializer(serializers.ModelSerializer):
+class VariantSerializer(CurrencyContextMixin, serializers.ModelSerializer):
     product = ProductSerializer()
     size = SizeSerializer()
     color = ColorSerializer()
@@ -142,17 +125,8 @@ class VariantSerializer(serializers.ModelSerializer):
             "quantity", "image", "currency", "id"
         ]
 
-    def get_currency(self, obj):
-        request = self.context.get('request')
-        return request.headers.get('X-Currency', 'GHS') if request else 'GHS'
-
     def get_price(self, obj):
-        request = self.context.get('request')
-        currency = request.headers.get('X-Currency', 'GHS') if request else 'GHS'
-        rates = get_exchange_rates()  # Make sure this is imported and working
-
-        exchange_rate = rates.get(currency, 1)  # Default to 1 if currency not found
-        return round(obj.price * exchange_rate, 2)   
+        return self.convert_price(obj.price)
 
 class CartItemSerializer(serializers.ModelSerializer):
     product = ProductSerializer()
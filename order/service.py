@@ -18,13 +18,15 @@ def haversine(lat1, lon1, lat2, lon2):
 
 def calculate_delivery_fee(vendor_lat, vendor_lon, buyer_lat, buyer_lon, delivery_option):
     DeliveryRate = apps.get_model('order', 'DeliveryRate')  # Use the correct app label
-    delivery_fee = 0
-    
-    distance = haversine(vendor_lat, vendor_lon, buyer_lat, buyer_lon)
     rate_record = DeliveryRate.objects.first()
     if not rate_record:
         raise ValueError("Delivery rate not set in the database")
 
+    distance = haversine(vendor_lat, vendor_lon, buyer_lat, buyer_lon)
+    return delivery_fee_for_distance(distance, rate_record, delivery_option)
+
+def delivery_fee_for_distance(distance, rate_record, delivery_option):
+    """The delivery fee for `distance` km with the DeliveryRate row already loaded."""
     base_price = rate_record.base_price  # Base price for up to 5 kilometers
     rate_per_km = rate_record.rate_per_km # Additional cost per kilometer
 
@@ -1,15 +1,29 @@
-from django.db.models.signals import pre_save, post_save
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 from product.models import *
 from django.contrib.auth.signals import user_logged_in
 from django.http import JsonResponse
 from .models import Cart, CartItem
+from .cart_cache import bump_cart_version
 
 @receiver(pre_save, sender=ProductDeliveryOption)
 def ensure_one_default(sender, instance, **kwargs):
     if instance.default:
         ProductDeliveryOption.objects.filter(product=instance.product, default=True).update(default=False)
     
+@receiver(post_save, sender=CartItem)
+@receiver(post_delete, sender=CartItem)
+def invalidate_cart_quote(sender, instance, **kwargs):
+    """Any change to a cart's items retires its cached quotes, once the change is committed."""
+    if CartItem.cart.is_cached(instance):
+        user_id = instance.cart.user_id
+    else:
+        user_id = Cart.objects.filter(pk=instance.cart_id).values_list('user_id', flat=True).first()
+    if user_id:
+        transaction.on_commit(lambda: bump_cart_version(user_id))
+
+
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
 from .models import Order
@@ -37,7 +37,11 @@ from product.models import Product, Variants, ProductDeliveryOption
 from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.views import APIView
 from product.serializers import ProductSerializer, VariantSerializer
-from .cart_utils import get_authenticated_cart_response, get_guest_cart_response, calculate_packaging_fee
+from .cart_utils import get_authenticated_cart_response, get_cart_quantity, get_guest_cart_response, calculate_packaging_fee
+from .cart_cache import address_key, bump_cart_version, get_cart_quote
+from core.currency import get_exchange_rate, get_request_currency
+from .pricing import CartPricingEngine
+from django.core.exceptions import ValidationError as DjangoValidationError
 
 logger = logging.getLogger(__name__)
 
@@ -165,17 +169,16 @@ class RemoveFromCartView(views.APIView):
             cart_item.delete()
 
             # Prepare updated cart data for response
-            cart_items = CartItem.objects.filter(cart=cart).select_related('product', 'variant')
-            packaging_fee = sum(item.product.packaging_fee * item.quantity for item in cart_items)
+            quote = CartPricingEngine(include_delivery=False).price(cart)
 
             response_data = {
                 "success": True,
                 "message": "Item removed from cart",
-                "quantity": cart.total_quantity if cart else 0,
+                "quantity": quote.total_quantity,
                 "cart": {
-                    "items_count": cart_items.count(),
-                    "total_amount": cart.total_price if cart else 0,
-                    "packaging_fee": packaging_fee,
+                    "items_count": quote.total_items,
+                    "total_amount": quote.subtotal,
+                    "packaging_fee": quote.packaging_fee,
                 }
             }
 
@@ -197,8 +200,7 @@ class CartQuantityView(APIView):
     def get(self, request):
         try:
             if request.auth and request.user.is_authenticated:  # Authenticated user
-                cart = Cart.objects.get_for_request(request)
-                total_quantity = cart.total_quantity if cart else 0
+                total_quantity = get_cart_quantity(request)
 
             else:  # Guest user
                 guest_cart_header = request.headers.get('X-Guest-Cart')
@@ -325,8 +327,7 @@ class NavInfo(APIView):
 
         # If user is authenticated, you can serialize more info
         if request.auth:  # Authenticated user
-            cart = Cart.objects.get_for_request(request)
-            total_quantity = cart.total_quantity if cart else 0
+            total_quantity = get_cart_quantity(request)
 
         else:  # Guest user
             guest_cart_header = request.headers.get('X-Guest-Cart')
@@ -354,54 +355,30 @@ class CheckoutAPIView(APIView):
     def get(self, request):
         user = request.user
         profile = get_object_or_404(Profile, user=user)
+        currency, _ = get_request_currency(request)
 
-        cart = Cart.objects.get_for_request(request)
-        if not cart:
-            return Response({"error": "No cart found for this user"}, status=status.HTTP_404_NOT_FOUND)
+        def build():
+            cart = Cart.objects.get_for_request(request)
+            if not cart:
+                return None
+            quote = CartPricingEngine.for_profile(profile).price(cart)
+            if quote.is_empty:
+                return {}
 
-        cart_items = CartItem.objects.filter(cart=cart)
-        if not cart_items.exists():
-            return Response({"detail": "There are no items to checkout."}, status=status.HTTP_400_BAD_REQUEST)
+            delivery_date_ranges = {}
+            all_product_delivery_options = {}
 
-        total_delivery_fee = Decimal(0)
-        delivery_date_ranges = {}
-        all_product_delivery_options = {}
-
-        for item in cart_items:
-            product = item.product
-            vendor = product.vendor
-
-            # Get all delivery options for this product
-            product_delivery_options = ProductDeliveryOption.objects.filter(product=product)
-            if not product_delivery_options.exists():
-                return Response({
-                    "detail": f"No delivery options found for product {product.title}"
-                }, status=status.HTTP_400_BAD_REQUEST)
-
-            # Serialize all delivery options for frontend dropdown
-            all_product_delivery_options[product.id] = ProductDeliveryOptionSerializer(
-                product_delivery_options, many=True,
-                context={'request': request}
-            ).data
-
-            # Select delivery option: user-chosen or fallback to default
-            selected_delivery_option = item.delivery_option
-
-            if not selected_delivery_option:
-                default_option = product_delivery_options.filter(default=True).first()
-                if default_option:
-                    selected_delivery_option = default_option.delivery_option
-
-            if selected_delivery_option:
-                # Calculate delivery fee
-                delivery_fee = calculate_delivery_fee(
-                    vendor.about.latitude,
-                    vendor.about.longitude,
-                    profile.latitude,
-                    profile.longitude,
-                    selected_delivery_option.cost
-                )
-                total_delivery_fee += Decimal(delivery_fee)
+            for line in quote.lines:
+                product = line.product
+
+                # Serialize all delivery options for frontend dropdown
+                all_product_delivery_options[product.id] = ProductDeliveryOptionSerializer(
+                    line.delivery_options, many=True,
+                    context={'request': request}
+                ).data
+
+                # User-chosen option, or the product's default
+                selected_delivery_option = line.delivery_option
 
                 min_date = now() + timezone.timedelta(days=selected_delivery_option.min_days)
                 max_date = now() + timezone.timedelta(days=selected_delivery_option.max_days)
@@ -418,8 +395,28 @@ class CheckoutAPIView(APIView):
                     label = f"{min_date.strftime('%d %B')} to {max_date.strftime('%d %B')}"
 
                 delivery_date_ranges[product.id] = label
-            else:
-                delivery_date_ranges[product.id] = "Delivery option not selected"
+
+            return {
+                'cart_items': CartItemSerializer(
+                    [line.item for line in quote.lines], many=True, context={'request': request}
+                ).data,
+                'sub_total': quote.subtotal,
+                'total_delivery_fee': quote.delivery_fee,
+                'product_delivery_options': all_product_delivery_options,
+                'total_packaging_fee': quote.packaging_fee,
+                'grand_total': quote.grand_total,
+                'delivery_date_ranges': delivery_date_ranges,
+            }
+
+        # The priced cart is cached per cart version; coupons are read fresh
+        try:
+            priced = get_cart_quote(user.id, 'checkout', build, currency, address_key(profile))
+        except DjangoValidationError as e:
+            return Response({"detail": e.messages[0]}, status=status.HTTP_400_BAD_REQUEST)
+        if priced is None:
+            return Response({"error": "No cart found for this user"}, status=status.HTTP_404_NOT_FOUND)
+        if not priced:
+            return Response({"detail": "There are no items to checkout."}, status=status.HTTP_400_BAD_REQUEST)
 
         # Coupons
         clipped_coupons = ClippedCoupon.objects.filter(user=user)
@@ -432,21 +429,14 @@ class CheckoutAPIView(APIView):
                 if coupon.is_valid() and clipped_coupons.filter(coupon=coupon).exists():
                     applied_coupon = coupon
                     discount_amount = coupon.discount_amount or (
-                        cart.total_price * Decimal(coupon.discount_percentage / 100)
+                        priced['sub_total'] * Decimal(coupon.discount_percentage / 100)
                     ).quantize(Decimal('0.01'))
             except Coupon.DoesNotExist:
                 del request.session['applied_coupon']
 
-        grand_total = cart.calculate_grand_total(profile) - discount_amount
-
         response_data = {
-            'cart_items': CartItemSerializer(cart_items, many=True, context={'request': request}).data,
-            'sub_total': cart.total_price,
-            'total_delivery_fee': total_delivery_fee,
-            'product_delivery_options': all_product_delivery_options,
-            'total_packaging_fee': cart.calculate_packaging_fees(),
-            'grand_total': grand_total,
-            'delivery_date_ranges': delivery_date_ranges,
+            **priced,
+            'grand_total': priced['grand_total'] - discount_amount,
             'clipped_coupons': CouponSerializer(clipped_coupons, many=True).data,
             'applied_coupon': CouponSerializer(applied_coupon).data if applied_coupon else None,
             'discount_amount': discount_amount,
@@ -494,6 +484,8 @@ class UpdateDeliveryOptionAPIView(APIView):
 
             # Update the delivery option for all matching cart items
             cart_items.update(delivery_option=delivery_option)
+            # update() sends no signals, so the cached quotes are retired here
+            bump_cart_version(request.user.id)
 
             return Response(
                 {
@@ -517,40 +509,32 @@ class CartSummaryAPIView(APIView):
     def get(self, request):
         user = request.user if request.user.is_authenticated else None
 
-        currency = request.headers.get('X-Currency', 'GHS')
-        rates = get_exchange_rates()
-        exchange_rate = Decimal(str(rates.get(currency, 1)))
+        currency, exchange_rate = get_request_currency(request)
+        exchange_rate = Decimal(str(exchange_rate))
 
         try:
-            if user:
-                cart = Cart.objects.get_for_request(request)
-            else:
+            if not user:
                 return Response({'detail': 'No cart found.'}, status=status.HTTP_404_NOT_FOUND)
 
-            user_profile = Profile.objects.get(user=user) if user else None
-
-            if not user_profile:
-                return Response({'detail': 'User profile not found.'}, status=status.HTTP_400_BAD_REQUEST)
-
-            # Fallback lat/lon if not set
-            if not user_profile.latitude:
-                user_profile.latitude = 5.5600  # Accra
-            if not user_profile.longitude:
-                user_profile.longitude = -0.2050  # Accra
-
-            if not user_profile:
-                return Response({'detail': 'User profile not found.'}, status=status.HTTP_400_BAD_REQUEST)
-
-            summary = {
-                "grand_total": round(cart.calculate_grand_total(user_profile) * exchange_rate, 2) or 0.00,
-                "grand_total_cedis": round(cart.calculate_grand_total(user_profile), 2) or 0,
-                "delivery_fee": round(cart.calculate_total_delivery_fee(user_profile) * exchange_rate, 2) or 0.00,
-                "packaging_fee": round(Decimal(cart.calculate_packaging_fees()) * exchange_rate, 2) or 0.00,
-                "total_price": round(Decimal(cart.total_price) * exchange_rate, 2) or 0.00,
-                "total_quantity": cart.total_quantity or 0,
-                "total_items": cart.total_items or 0,
-                "currency": currency,
-            }
+            user_profile = Profile.objects.get(user=user)
+
+            def build():
+                # Profiles without coordinates are priced from Accra
+                cart = Cart.objects.get_for_request(request)
+                quote = CartPricingEngine.for_profile(user_profile).price(cart)
+                return {
+                    "grand_total": round(quote.grand_total * exchange_rate, 2) or 0.00,
+                    "grand_total_cedis": round(quote.grand_total, 2) or 0,
+                    # delivery_fee has always included the packaging fees
+                    "delivery_fee": round((quote.delivery_fee + quote.packaging_fee) * exchange_rate, 2) or 0.00,
+                    "packaging_fee": round(quote.packaging_fee * exchange_rate, 2) or 0.00,
+                    "total_price": round(quote.subtotal * exchange_rate, 2) or 0.00,
+                    "total_quantity": quote.total_quantity,
+                    "total_items": quote.total_items,
+                    "currency": currency,
+                }
+
+            summary = get_cart_quote(user.id, 'summary', build, currency, address_key(user_profile))
 
             return Response(summary, status=status.HTTP_200_OK)
 
@@ -594,10 +578,9 @@ class OrderReceiptAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, order_id):
-        currency = request.GET.get('currency') or request.headers.get('X-Currency', 'GHS')
-
-        rates = get_exchange_rates()
-        exchange_rate = Decimal(str(rates.get(currency, 1)))
+        # The receipt may be rendered in a currency other than the session's
+        currency = request.GET.get('currency') or get_request_currency(request)[0]
+        exchange_rate = Decimal(str(get_exchange_rate(currency)))
 
         currency_symbol = "$" if currency == "USD" else "₵"  # 👈 UPDATED
 
@@ -8,6 +8,7 @@ from rest_framework.views import APIView
 from userauths.models import User
 from address.models import Address
 from order.models import Order, OrderProduct, Cart
+from order.pricing import CartPricingEngine
 from .models import Payment
 
 
@@ -48,7 +49,8 @@ class FlutterwaveCallbackAPIView(APIView):
 
         # Get cart and shipping address
         cart = Cart.objects.filter(user=user).first()
-        if not cart or not cart.cart_items.exists():
+        quote = CartPricingEngine(include_delivery=False).price(cart)
+        if quote.is_empty:
             return Response({"error": "Cart is empty"}, status=400)
 
         address = Address.objects.filter(user=user, status=True).first()
@@ -81,7 +83,7 @@ class FlutterwaveCallbackAPIView(APIView):
         )
 
         # Assign vendors
-        unique_vendors = {item.product.vendor for item in cart.cart_items.all() if item.product.vendor}
+        unique_vendors = {line.product.vendor for line in quote.lines if line.product.vendor}
         order.vendors.set(unique_vendors)
 
         # Generate a unique order number
@@ -93,8 +95,9 @@ class FlutterwaveCallbackAPIView(APIView):
         order.save()
 
         # Create OrderProduct items and update stock
-        for cart_item in cart.cart_items.all():
-            price = cart_item.variant.price if cart_item.variant else cart_item.product.price
+        for line in quote.lines:
+            cart_item = line.item
+            price = cart_item.price
 
             OrderProduct.objects.create(
                 order=order,
@@ -12,6 +12,7 @@ import paypalrestsdk
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.csrf import csrf_exempt
 from order.models import Cart, Order, OrderProduct
+from order.pricing import CartPricingEngine
 from address.models import Address
 from django.contrib import messages
 from product.models import *
@@ -40,7 +41,8 @@ class VerifyPaymentAPIView(APIView):
     def get(self, request, reference):
         # Get user's cart
         cart = Cart.objects.filter(user=request.user).first()
-        if not cart or not cart.cart_items.exists():
+        quote = CartPricingEngine(include_delivery=False).price(cart)
+        if quote.is_empty:
             return Response(
                 {"status": "failed", "message": "Cart is empty or does not exist"},
                 status=status.HTTP_400_BAD_REQUEST
@@ -87,7 +89,7 @@ class VerifyPaymentAPIView(APIView):
                 is_ordered=True,
             )
 
-            unique_vendors = {cart_item.product.vendor for cart_item in cart.cart_items.all() if cart_item.product.vendor}
+            unique_vendors = {line.product.vendor for line in quote.lines if line.product.vendor}
 
             # Assign unique vendors to the Order's ManyToMany field
             order.vendors.set(unique_vendors)
@@ -100,8 +102,9 @@ class VerifyPaymentAPIView(APIView):
             order.save()
 
             # Loop through cart items and create OrderProduct
-            for cart_item in cart.cart_items.all():
-                price = cart_item.variant.price if cart_item.variant else cart_item.product.price
+            for line in quote.lines:
+                cart_item = line.item
+                price = cart_item.price
 
                 OrderProduct.objects.create(
                     order=order,
@@ -28,6 +28,7 @@ class ProductAdmin(admin.ModelAdmin):
     list_editable = ['status']
     inlines = [ProductImagesAdmin, ProductVariantsAdmin, ProductDeliveryOptionAdmin]
     list_display = ['title', 'product_image', "price",'sub_category', 'vendor', 'status']
+    readonly_fields = ['average_rating', 'review_count', 'rating_1_count', 'rating_2_count', 'rating_3_count', 'rating_4_count', 'rating_5_count']
 
 class ProductVariantImageAdmin(admin.ModelAdmin):
     list_display = ['image']
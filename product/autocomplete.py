@@ -0,0 +1,161 @@
+# product/autocomplete.py
+"""
+Prefix index for search suggestions, kept in Redis sorted sets.
+
+Every prefix of every word in a published product's title, brand and sub
+category maps to a sorted set of product ids scored by `trending_score`, so a
+suggestion lookup is a single ZREVRANGE (or a ZINTERSTORE for several words)
+plus an HMGET of the ready-made payloads, with no database access.
+
+Publishing, editing, unpublishing or deleting a product updates its entries
+through the signals in product/signals.py. Brand and category renames, and
+trending score drift, are picked up by `rebuild_autocomplete_index`, run from
+the `rebuild_autocomplete` command or the task of the same name.
+
+A completed rebuild sets READY_KEY. Until then (a fresh deploy, a flushed
+Redis) the index may be empty or hold only the products saved since, so
+`suggest` raises IndexNotReady and the view falls back to the database.
+"""
+import json
+import uuid
+
+from django_redis import get_redis_connection
+
+from .local_search import tokenize
+from .models import Product
+
+KEY_PREFIX = 'autocomplete'
+PAYLOADS_KEY = f'{KEY_PREFIX}:products'
+READY_KEY = f'{KEY_PREFIX}:ready'
+MAX_PREFIX_LENGTH = 20
+SUGGESTION_LIMIT = 10
+
+
+class IndexNotReady(Exception):
+    """The index hasn't been completely built since Redis was last emptied."""
+
+
+def _prefix_key(prefix):
+    return f'{KEY_PREFIX}:prefix:{prefix}'
+
+
+def _product_keys_key(product_id):
+    return f'{KEY_PREFIX}:keys:{product_id}'
+
+
+def get_connection():
+    """Raw Redis connection behind the default cache. Raises when the cache isn't Redis."""
+    return get_redis_connection('default')
+
+
+def product_prefix_keys(product):
+    words = tokenize(product.title)
+    if product.brand:
+        words += tokenize(product.brand.title)
+    if product.sub_category:
+        words += tokenize(product.sub_category.title)
+    return {
+        _prefix_key(word[:length])
+        for word in words
+        for length in range(1, min(len(word), MAX_PREFIX_LENGTH) + 1)
+    }
+
+
+def product_payload(product):
+    return json.dumps({
+        "title": product.title,
+        "price": product.price,
+        "thumbnail": product.image.url if product.image else None,
+        "category": product.sub_category.title if product.sub_category else "Uncategorized",
+    })
+
+
+def index_product(product, pipe=None, conn=None):
+    """Add or refresh a published product, dropping prefixes it no longer matches."""
+    conn = conn or get_connection()
+    own_pipe = pipe is None
+    if own_pipe:
+        pipe = conn.pipeline()
+
+    keys = product_prefix_keys(product)
+    stale = {key.decode() for key in conn.smembers(_product_keys_key(product.id))} - keys
+    for key in stale:
+        pipe.zrem(key, product.id)
+    for key in keys:
+        pipe.zadd(key, {product.id: product.trending_score})
+    pipe.delete(_product_keys_key(product.id))
+    if keys:
+        pipe.sadd(_product_keys_key(product.id), *keys)
+    pipe.hset(PAYLOADS_KEY, product.id, product_payload(product))
+
+    if own_pipe:
+        pipe.execute()
+
+
+def remove_product(product_id, conn=None):
+    conn = conn or get_connection()
+    pipe = conn.pipeline()
+    for key in conn.smembers(_product_keys_key(product_id)):
+        pipe.zrem(key.decode(), product_id)
+    pipe.delete(_product_keys_key(product_id))
+    pipe.hdel(PAYLOADS_KEY, product_id)
+    pipe.execute()
+
+
+def sync_product(product_id):
+    """Bring one product's entries in line with the database (publish, edit, unpublish, delete)."""
+    product = Product.objects.select_related('brand', 'sub_category').filter(id=product_id, status="published").first()
+    if product:
+        index_product(product)
+    else:
+        remove_product(product_id)
+
+
+def rebuild_autocomplete_index(batch_size=500):
+    """Re-index every published product and drop entries for products that are gone. Returns the count."""
+    conn = get_connection()
+    indexed_ids = set()
+    pipe = conn.pipeline(transaction=False)
+    products = Product.objects.filter(status="published").select_related('brand', 'sub_category')
+    for product in products.iterator(chunk_size=batch_size):
+        index_product(product, pipe=pipe, conn=conn)
+        indexed_ids.add(product.id)
+        if len(pipe) >= batch_size * 10:
+            pipe.execute()
+    pipe.execute()
+
+    for product_id in conn.hkeys(PAYLOADS_KEY):
+        if int(product_id) not in indexed_ids:
+            remove_product(int(product_id), conn=conn)
+    conn.set(READY_KEY, 1)
+    return len(indexed_ids)
+
+
+def suggest(query, limit=SUGGESTION_LIMIT):
+    """
+    Top `limit` products matching every word of `query` as a prefix, most
+    trending first. Raises IndexNotReady before the first complete rebuild.
+    """
+    words = tokenize(query)
+    if not words:
+        return []
+    keys = [_prefix_key(word[:MAX_PREFIX_LENGTH]) for word in words]
+
+    conn = get_connection()
+    pipe = conn.pipeline()
+    pipe.exists(READY_KEY)
+    if len(keys) == 1:
+        pipe.zrevrange(keys[0], 0, limit - 1)
+        ready, ids = pipe.execute()
+    else:
+        scratch = f'{KEY_PREFIX}:tmp:{uuid.uuid4().hex}'
+        pipe.zinterstore(scratch, keys, aggregate='MAX')
+        pipe.zrevrange(scratch, 0, limit - 1)
+        pipe.delete(scratch)
+        ready, _, ids, _ = pipe.execute()
+    if not ready:
+        raise IndexNotReady("The autocomplete index hasn't been built yet")
+
+    if not ids:
+        return []
+    return [json.loads(payload) for payload in conn.hmget(PAYLOADS_KEY, ids) if payload]
@@ -0,0 +1,132 @@
+# product/candidates.py
+"""
+Bounded candidate generation for "recommended for you" from a browsing session.
+
+Each source proposes at most CANDIDATES_PER_SOURCE product ids, best first:
+
+    bought together  neighbors of the viewed products in the active
+                     frequently-bought-together run (cached lists)
+    search history   one Elasticsearch query matching any of the recent
+                     terms; the in-process index when search is unavailable
+    same category    most trending published products in the viewed
+                     products' sub categories, one query
+
+A candidate's score is the sum over the sources that propose it of the
+source weight times (1 - rank / CANDIDATES_PER_SOURCE), so items near the top
+of several sources win. Ties break on product id, so the same session always
+gets the same list. The winners are hydrated with one `id__in` query.
+
+The work per request is fixed: at most one query per source plus the
+hydration, whatever the length of the history.
+"""
+import logging
+from collections import defaultdict
+
+from .fbt import get_neighbors
+from .local_search import get_local_index
+from .models import Product
+from .search_client import search
+from .search_index import PRODUCTS_ALIAS
+from .trending import rank_by_trending
+
+logger = logging.getLogger(__name__)
+
+CANDIDATES_PER_SOURCE = 30
+MAX_VIEWED = 20         # most recent viewed products considered
+MAX_SEARCH_TERMS = 5    # most recent search terms considered
+SOURCE_WEIGHTS = {
+    'bought_together': 3.0,
+    'search_history': 2.0,
+    'same_category': 1.0,
+}
+
+
+def bought_together_candidates(product_ids, k=CANDIDATES_PER_SOURCE, rules=None):
+    """Ids most bought with `product_ids`, by summed confidence, from the cached neighbor lists."""
+    scores = defaultdict(float)
+    for neighbors in get_neighbors(product_ids, rules).values():
+        for recommended_id, confidence, _ in neighbors:
+            scores[recommended_id] += confidence
+    return sorted(scores, key=lambda product_id: (-scores[product_id], product_id))[:k]
+
+
+def search_history_candidates(terms, k=CANDIDATES_PER_SOURCE):
+    """Ids matching any of `terms`, best first, from one search request."""
+    if not terms:
+        return []
+    body = {
+        "query": {
+            "bool": {
+                "should": [
+                    {"multi_match": {"query": term, "fields": ["title^2", "description"], "fuzziness": "AUTO"}}
+                    for term in terms
+                ],
+                "minimum_should_match": 1,
+                "filter": [{"term": {"status": "published"}}],
+            }
+        },
+        "sort": [{"_score": "desc"}, {"id": "asc"}],
+        "size": k,
+        "_source": False,
+    }
+    try:
+        return [int(hit['_id']) for hit in search(PRODUCTS_ALIAS, **body)['hits']['hits']]
+    except Exception as e:
+        logger.warning(f"Search history candidates from the local index: {e}")
+
+    # Interleave the per-term rankings so every term gets a share of the budget
+    index = get_local_index()
+    rankings = [index.search(term, limit=k) for term in terms]
+    merged = []
+    for position in range(k):
+        for ranking in rankings:
+            if position < len(ranking) and ranking[position] not in merged:
+                merged.append(ranking[position])
+    return merged[:k]
+
+
+def same_category_candidates(sub_category_ids, exclude=(), k=CANDIDATES_PER_SOURCE, trending_scores=None):
+    """The most trending published ids in `sub_category_ids`, other than `exclude`."""
+    if not sub_category_ids:
+        return []
+    products = Product.objects.filter(status="published", sub_category_id__in=sub_category_ids).exclude(id__in=exclude)
+    return rank_by_trending(products, k, trending_scores)
+
+
+def merge_candidates(rankings, exclude=(), k=CANDIDATES_PER_SOURCE):
+    """Ids ranked by weighted reciprocal position across `rankings` ({source: [ids]})."""
+    scores = defaultdict(float)
+    for source, ids in rankings.items():
+        weight = SOURCE_WEIGHTS[source]
+        for rank, product_id in enumerate(ids[:k]):
+            if product_id not in exclude:
+                scores[product_id] += weight * (1 - rank / k)
+    return sorted(scores, key=lambda product_id: (-scores[product_id], product_id))
+
+
+def recommend_for_session(viewed_products, search_terms, limit=10, k=CANDIDATES_PER_SOURCE,
+                          rules=None, trending_scores=None):
+    """
+    Recommended published products for a session, best first. `viewed_products`
+    are the already loaded, most recent first viewed products; they are never
+    recommended themselves. `rules` and `trending_scores` replace the active
+    bought-together run and the stored trending scores (see the evaluation).
+    """
+    viewed_products = list(viewed_products)[:MAX_VIEWED]
+    viewed_ids = {product.id for product in viewed_products}
+    terms = [term.strip() for term in search_terms if isinstance(term, str) and term.strip()][:MAX_SEARCH_TERMS]
+
+    rankings = {
+        'bought_together': bought_together_candidates(viewed_ids, k, rules) if viewed_ids else [],
+        'search_history': search_history_candidates(terms, k),
+        'same_category': same_category_candidates(
+            {product.sub_category_id for product in viewed_products if product.sub_category_id}, viewed_ids, k,
+            trending_scores,
+        ),
+    }
+    # Over-fetch a little so unpublished candidates don't shrink the list
+    candidates = merge_candidates(rankings, exclude=viewed_ids, k=k)[:limit * 2]
+    if not candidates:
+        return []
+    by_id = Product.objects.filter(id__in=candidates, status="published").in_bulk()
+    return [by_id[product_id] for product_id in candidates if product_id in by_id][:limit]
@@ -0,0 +1,111 @@
+# product/detail_cache.py
+"""
+Two-tier cache for the shared (non user-specific) part of the product detail page.
+
+Entries live in Redis and, in front of it, in a small per-process LRU so hot
+products skip the network round trip and unpickling. Every key carries the
+product's current version token; the signals in product/signals.py replace the
+token whenever the product or one of its variants, images, reviews or delivery
+options changes, so stale entries are never read again and simply age out.
+
+Cached payloads are shared between requests and must be treated as read-only.
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.core.cache import cache
+
+from core.cache import get_or_build
+
+DETAIL_CACHE_TIMEOUT = 600
+LOCAL_CACHE_SIZE = 256
+
+
+class LocalLRUCache:
+    """A thread-safe, size-bounded LRU with per-entry expiry."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + timeout, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+local_cache = LocalLRUCache(LOCAL_CACHE_SIZE)
+
+
+def _version_key(sku):
+    return f"product_detail_version:{sku}"
+
+
+def _new_version():
+    return uuid.uuid4().hex[:12]
+
+
+def get_product_version(sku):
+    """
+    Current version token for a product, created on first use. None when the
+    token can't be stored (the cache is unreachable): a version that was never
+    stored can't be bumped, so nothing may be cached under it.
+    """
+    key = _version_key(sku)
+    version = cache.get(key)
+    if version is None:
+        version = _new_version()
+        if not cache.add(key, version, timeout=None):
+            # Created meanwhile by another worker, or not stored at all
+            version = cache.get(key)
+    return version
+
+
+def bump_product_version(sku):
+    """Invalidate every cached detail payload of a product, in all processes."""
+    if sku:
+        cache.set(_version_key(sku), _new_version(), timeout=None)
+
+
+def detail_cache_key(sku, slug, currency, version):
+    return f"product_detail_cache:{sku}:{slug}:{currency}:{version}"
+
+
+def get_product_detail(sku, slug, currency, build):
+    """
+    Return the cached `(shared_data, product)` for a product page, calling
+    `build()` to produce it on a miss. A hit costs one Redis read for the
+    version token and no database queries; concurrent misses are collapsed
+    into a single rebuild.
+    """
+    version = get_product_version(sku)
+    if version is None:
+        return build()
+    key = detail_cache_key(sku, slug, currency, version)
+
+    entry = local_cache.get(key)
+    if entry is None:
+        entry = get_or_build(key, build, timeout=DETAIL_CACHE_TIMEOUT)
+        local_cache.set(key, entry, DETAIL_CACHE_TIMEOUT)
+    return entry
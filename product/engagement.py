@@ -0,0 +1,114 @@
+# product/engagement.py
+"""
+Engagement scores for categories, brands and sub categories in one pass.
+
+    category      sum of its published products' views
+    brand         0.6 * views + 0.4 * cart adds
+    sub category  0.6 * views + 0.4 * cart adds
+
+Cart adds are running tallies on Brand and Sub_Category. Each run reads only
+the cart items created since the watermark in `EngagementWatermark`, with one
+query grouped by (brand, sub category), and adds them to the tallies. Ids are
+handed out before commit, so a row can become visible after a higher id has
+been counted; the watermark therefore only advances to the highest id among
+rows older than SETTLE_INTERVAL, and newer rows wait for the next run. Product
+views come from one query grouped by sub category and category. Only rows
+whose score changed are written, with bulk_update.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+
+from order.models import CartItem
+from .models import Brand, Category, EngagementWatermark, Product, Sub_Category
+
+VIEW_WEIGHT = 0.6
+CART_WEIGHT = 0.4
+WATERMARK_NAME = 'engagement'
+# Longer than any transaction that adds to a cart: older rows are all committed
+SETTLE_INTERVAL = timedelta(minutes=5)
+
+
+def new_cart_adds(after_id, up_to_id):
+    """({brand_id: adds}, {sub_category_id: adds}) for cart items with after_id < id <= up_to_id."""
+    by_brand, by_sub_category = {}, {}
+    grouped = (
+        CartItem.objects.filter(id__gt=after_id, id__lte=up_to_id, product__isnull=False)
+        .values('product__brand_id', 'product__sub_category_id')
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+    for row in grouped:
+        brand_id, sub_category_id = row['product__brand_id'], row['product__sub_category_id']
+        if brand_id:
+            by_brand[brand_id] = by_brand.get(brand_id, 0) + row['total']
+        if sub_category_id:
+            by_sub_category[sub_category_id] = by_sub_category.get(sub_category_id, 0) + row['total']
+    return by_brand, by_sub_category
+
+
+def category_views():
+    """{category_id: total views of its published products} from one grouped query."""
+    views = {}
+    grouped = (
+        Product.published.filter(sub_category__category__isnull=False)
+        .values('sub_category__category_id')
+        .annotate(total=Sum('views'))
+        .order_by()
+    )
+    for row in grouped:
+        views[row['sub_category__category_id']] = row['total'] or 0
+    return views
+
+
+def _update_scores(queryset, fields, compute):
+    """Apply `compute(obj)` (sets attributes, returns the new score) and bulk write the changed rows."""
+    changed = []
+    for obj in queryset:
+        score = compute(obj)
+        if obj.engagement_score != score or getattr(obj, '_tally_changed', False):
+            obj.engagement_score = score
+            changed.append(obj)
+    queryset.model.objects.bulk_update(changed, fields, batch_size=1000)
+    return len(changed)
+
+
+def update_engagement_scores():
+    """Run the pipeline once. Returns {level: rows updated}."""
+    with transaction.atomic():
+        watermark, _ = EngagementWatermark.objects.select_for_update().get_or_create(name=WATERMARK_NAME)
+        settled = CartItem.objects.filter(
+            id__gt=watermark.last_cart_item_id, date__lte=timezone.now() - SETTLE_INTERVAL,
+        )
+        up_to_id = settled.aggregate(last=Max('id'))['last'] or watermark.last_cart_item_id
+        brand_adds, sub_category_adds = new_cart_adds(watermark.last_cart_item_id, up_to_id)
+        views = category_views()
+
+        def tallied(adds):
+            def compute(obj):
+                if adds.get(obj.id):
+                    obj.cart_adds += adds[obj.id]
+                    obj._tally_changed = True
+                return round(VIEW_WEIGHT * obj.views + CART_WEIGHT * obj.cart_adds, 2)
+            return compute
+
+        updated = {
+            'categories': _update_scores(
+                Category.objects.only('id', 'engagement_score'), ['engagement_score'],
+                lambda category: float(views.get(category.id, 0)),
+            ),
+            'brands': _update_scores(
+                Brand.objects.only('id', 'views', 'cart_adds', 'engagement_score'),
+                ['cart_adds', 'engagement_score'], tallied(brand_adds),
+            ),
+            'sub_categories': _update_scores(
+                Sub_Category.objects.only('id', 'views', 'cart_adds', 'engagement_score'),
+                ['cart_adds', 'engagement_score'], tallied(sub_category_adds),
+            ),
+        }
+        if up_to_id > watermark.last_cart_item_id:
+            watermark.last_cart_item_id = up_to_id
+            watermark.save(update_fields=['last_cart_item_id', 'updated_at'])
+    return updated
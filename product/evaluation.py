@@ -0,0 +1,160 @@
+# product/evaluation.py
+"""
+Offline evaluation of the recommenders against a time split of the orders.
+
+Every customer who ordered both before and after the split is one case: the
+products they ordered before the split (most recent first) are what a
+recommender knows about them, and the new products they ordered after it are
+what it should have suggested. Each strategy runs its production code path on
+every case and is scored on
+
+    hit rate@k   share of cases where at least one of the top k was ordered
+    coverage     share of published products recommended at least once
+    latency      p50 / p95 wall time per call, in ms
+    queries      mean database queries per call
+
+Mined state is rebuilt as of the split instead of read live: the
+frequently-bought-together rules are mined in memory from the orders placed
+before it (the production counting and scoring), and trending scores come
+from the cart adds and orders in the trending window that ends at it. The
+strategies reading them get this snapshot in place of the active run and the
+stored scores. Cart co-occurrence reads the carts as they are now;
+`evaluate_recommenders` notes when those include test-period adds.
+"""
+import time
+from collections import defaultdict
+
+from django.db import connection
+from django.db.models import Max
+from django.test.utils import CaptureQueriesContext
+
+from order.models import CartItem, OrderProduct
+from .candidates import recommend_for_session
+from .fbt import count_cooccurrences, recommend_for_products, rules_as_neighbors, score_rules
+from .models import Product
+from .service import get_cart_based_recommendations, same_category_recommendations
+from .similarity import get_similar_products
+from .trending import rank_by_trending, trending_scores_at
+from .user_recommendations import recommend_for_order_history
+
+MAX_HISTORY = 20  # most recent pre-split products given to a recommender
+
+
+class MinedState:
+    """Bought-together rules and trending scores as they would have been at `split`."""
+
+    def __init__(self, split, min_count=2, min_lift=1.0, max_rules_per_product=20):
+        n_products = (Product.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+        cooccurrence, orders = count_cooccurrences(n_products, before=split)
+        self.rules = rules_as_neighbors(
+            score_rules(cooccurrence, orders, min_count, min_lift, max_rules_per_product)
+        ) if orders else {}
+        self.trending_scores = trending_scores_at(split)
+        self._top_trending = []
+
+    def top_trending(self, k):
+        """The `k` most trending published ids, ranked once per size."""
+        if len(self._top_trending) < k:
+            self._top_trending = rank_by_trending(Product.objects.filter(status="published"), k, self.trending_scores)
+        return self._top_trending[:k]
+
+
+def _ids(products):
+    return [product.id for product in products]
+
+
+# Each strategy maps (history ids, most recent first; k; MinedState) to ranked product ids
+STRATEGIES = {
+    'fbt': lambda history, k, state: _ids(recommend_for_products(history, limit=k, rules=state.rules)),
+    'co_order': lambda history, k, state: recommend_for_order_history(
+        set(history), limit=k, rules=state.rules, trending_scores=state.trending_scores,
+    ),
+    'cart_cooccurrence': lambda history, k, state: _ids(get_cart_based_recommendations(history[0]))[:k],
+    'category': lambda history, k, state: same_category_recommendations(history, limit=k),
+    'trending': lambda history, k, state: state.top_trending(k),
+    'session': lambda history, k, state: _ids(recommend_for_session(
+        Product.objects.filter(id__in=history), [], limit=k,
+        rules=state.rules, trending_scores=state.trending_scores,
+    )),
+    'similar': lambda history, k, state: _ids(get_similar_products(
+        Product.objects.only('id', 'sub_category_id').get(id=history[0]), limit=k,
+    )),
+}
+
+
+def build_cases(split, max_cases=None):
+    """[(user id, history ids most recent first, set of new product ids ordered after `split`)]."""
+    history = defaultdict(list)
+    after = defaultdict(set)
+    lines = (
+        OrderProduct.objects.filter(order__user__isnull=False)
+        .order_by('order__user_id', '-date_created', '-id')
+        .values_list('order__user_id', 'product_id', 'date_created')
+    )
+    for user_id, product_id, date in lines.iterator(chunk_size=5000):
+        if date < split:
+            if product_id not in history[user_id]:
+                history[user_id].append(product_id)
+        else:
+            after[user_id].add(product_id)
+
+    cases = []
+    for user_id in sorted(after):
+        seen = history.get(user_id)
+        if not seen:
+            continue
+        targets = after[user_id] - set(seen)
+        if targets:
+            cases.append((user_id, seen[:MAX_HISTORY], targets))
+            if max_cases and len(cases) >= max_cases:
+                break
+    return cases
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * p))], 1)
+
+
+def evaluate_strategy(recommend, cases, state, k=10):
+    """Score one strategy over `cases`. Returns the metrics dict; exceptions from the strategy propagate."""
+    hits = 0
+    recommended = set()
+    latencies, query_counts = [], []
+    for _, history, targets in cases:
+        started = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            ids = recommend(history, k, state)[:k]
+        latencies.append((time.perf_counter() - started) * 1000)
+        query_counts.append(len(queries))
+        recommended.update(ids)
+        if targets.intersection(ids):
+            hits += 1
+
+    catalog = Product.objects.filter(status="published").count()
+    return {
+        'cases': len(cases),
+        f'hit_rate@{k}': round(hits / len(cases), 4) if cases else None,
+        'coverage': round(len(recommended) / catalog, 4) if catalog else None,
+        'p50_ms': percentile(latencies, 0.50),
+        'p95_ms': percentile(latencies, 0.95),
+        'queries': round(sum(query_counts) / len(query_counts), 2) if query_counts else None,
+    }
+
+
+def evaluate(cases, split, strategies=None, k=10):
+    """{strategy: metrics} for the named strategies (all by default), against the state mined up to `split`."""
+    names = strategies or list(STRATEGIES)
+    state = MinedState(split)
+    return {name: evaluate_strategy(STRATEGIES[name], cases, state, k) for name in names}
+
+
+def leaked_state(split, strategies=None):
+    """Descriptions of the live state read by the evaluated strategies that has seen the test period."""
+    notes = []
+    names = strategies or list(STRATEGIES)
+    if 'cart_cooccurrence' in names and CartItem.objects.filter(date__gte=split).exists():
+        notes.append("cart_cooccurrence reads current carts, which include items added after the split")
+    return notes
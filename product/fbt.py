@@ -0,0 +1,232 @@
+# product/fbt.py
+"""
+Frequently-bought-together miner.
+
+Order lines are streamed as (order_id, product_id) pairs, a chunk of orders
+at a time, into a sparse order x product basket matrix B. Pair co-occurrence
+counts accumulate as B.T @ B, whose diagonal holds each product's order
+count. Memory is bounded by the number of distinct co-purchased pairs, not by
+the number of orders.
+
+Every pair bought together at least `min_count` times becomes a rule scored
+with support, confidence and lift. Rules below `min_lift` are dropped, and
+only each product's best `max_rules_per_product` are kept. Rules are written
+with bulk_create under a new FrequentlyBoughtTogetherRun. The run is then made
+the active one in a single transaction, so readers see either the old rules
+or the new ones, never an empty table. Older runs are deleted afterwards.
+
+Retrieval (`recommend_for_products`) merges the neighbor lists of a whole set
+of products. Each product's list (recommended id, confidence, lift) is cached
+under the active run's id, so a new run retires every list at once.
+"""
+from collections import defaultdict
+
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
+from scipy.sparse import coo_matrix, csr_matrix
+
+from order.models import OrderProduct
+from .models import FrequentlyBoughtTogether, FrequentlyBoughtTogetherRun, Product
+
+ORDERS_PER_CHUNK = 20000
+WRITE_BATCH_SIZE = 5000
+ACTIVE_RUN_KEY = 'fbt_active_run'
+NEIGHBORS_TIMEOUT = 3600
+
+
+def basket_chunks(orders_per_chunk=ORDERS_PER_CHUNK, before=None):
+    """
+    Yield (row indexes, product ids, order count) for consecutive chunks of
+    whole orders; only the lines placed before `before` when it is given.
+    """
+    lines = OrderProduct.objects.filter(product__isnull=False)
+    if before is not None:
+        lines = lines.filter(date_created__lt=before)
+    pairs = (
+        lines.order_by('order_id')
+        .values_list('order_id', 'product_id')
+        .iterator(chunk_size=orders_per_chunk)
+    )
+    rows, cols = [], []
+    row = -1
+    current_order = None
+    for order_id, product_id in pairs:
+        if order_id != current_order:
+            if row + 1 == orders_per_chunk:
+                yield rows, cols, row + 1
+                rows, cols, row = [], [], -1
+            current_order = order_id
+            row += 1
+        rows.append(row)
+        cols.append(product_id)
+    if rows:
+        yield rows, cols, row + 1
+
+
+def count_cooccurrences(n_products, orders_per_chunk=ORDERS_PER_CHUNK, before=None):
+    """(co-occurrence matrix, number of orders); entry [a, b] counts orders containing both a and b."""
+    cooccurrence = csr_matrix((n_products, n_products), dtype=np.int64)
+    orders = 0
+    for rows, cols, n_orders in basket_chunks(orders_per_chunk, before):
+        baskets = coo_matrix(
+            (np.ones(len(rows), dtype=np.int64), (rows, cols)), shape=(n_orders, n_products)
+        ).tocsr()
+        baskets.data[:] = 1  # a product ordered twice in one order still counts once
+        cooccurrence = cooccurrence + (baskets.T @ baskets).tocsr()
+        orders += n_orders
+    return cooccurrence, orders
+
+
+def score_rules(cooccurrence, orders, min_count=2, min_lift=1.0, max_rules_per_product=20):
+    """Arrays (product, recommended, support, confidence, lift), best rules per product first."""
+    product_orders = cooccurrence.diagonal()
+    pairs = cooccurrence.tocoo()
+    keep = (pairs.row != pairs.col) & (pairs.data >= min_count)
+    product, recommended, together = pairs.row[keep], pairs.col[keep], pairs.data[keep].astype(float)
+
+    support = together / orders
+    confidence = together / product_orders[product]
+    lift = confidence / (product_orders[recommended] / orders)
+    keep = lift >= min_lift
+    product, recommended = product[keep], recommended[keep]
+    support, confidence, lift = support[keep], confidence[keep], lift[keep]
+
+    # Per product: highest lift first, confidence breaking ties; then cap the count
+    order = np.lexsort((-confidence, -lift, product))
+    product, recommended = product[order], recommended[order]
+    support, confidence, lift = support[order], confidence[order], lift[order]
+    starts = np.searchsorted(product, product, side='left')
+    keep = (np.arange(len(product)) - starts) < max_rules_per_product
+    return product[keep], recommended[keep], support[keep], confidence[keep], lift[keep]
+
+
+def rules_as_neighbors(rules):
+    """{product_id: [(recommended_id, confidence, lift), ...]}, best first: the shape `get_neighbors` returns."""
+    neighbors = defaultdict(list)
+    for product_id, recommended_id, _, confidence, lift in zip(*rules):
+        neighbors[int(product_id)].append((int(recommended_id), float(confidence), float(lift)))
+    return dict(neighbors)
+
+
+def write_rules(run, rules):
+    """bulk_create `rules` under `run`, in batches."""
+    product, recommended, support, confidence, lift = rules
+    batch = []
+    for i in range(len(product)):
+        batch.append(FrequentlyBoughtTogether(
+            run=run,
+            product_id=int(product[i]),
+            recommended_id=int(recommended[i]),
+            support=round(float(support[i]), 6),
+            confidence=round(float(confidence[i]), 6),
+            lift=round(float(lift[i]), 4),
+        ))
+        if len(batch) >= WRITE_BATCH_SIZE:
+            FrequentlyBoughtTogether.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        FrequentlyBoughtTogether.objects.bulk_create(batch)
+
+
+def activate_run(run):
+    """Make `run` the one readers see, in one transaction, then drop the older runs."""
+    with transaction.atomic():
+        FrequentlyBoughtTogetherRun.objects.filter(is_active=True).exclude(id=run.id).update(is_active=False)
+        run.is_active = True
+        run.save(update_fields=['is_active'])
+    cache.set(ACTIVE_RUN_KEY, run.id, timeout=None)
+
+    old_runs = FrequentlyBoughtTogetherRun.objects.exclude(id=run.id)
+    FrequentlyBoughtTogether.objects.filter(run__in=old_runs).delete()
+    FrequentlyBoughtTogether.objects.filter(run__isnull=True).delete()
+    old_runs.delete()
+
+
+def mine_fbt_rules(orders_per_chunk=ORDERS_PER_CHUNK, min_count=2, min_lift=1.0, max_rules_per_product=20):
+    """Mine and publish a new generation of rules. Returns the run, or None when there are no orders."""
+    n_products = (Product.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+    cooccurrence, orders = count_cooccurrences(n_products, orders_per_chunk)
+    if not orders:
+        return None
+
+    rules = score_rules(cooccurrence, orders, min_count, min_lift, max_rules_per_product)
+    run = FrequentlyBoughtTogetherRun.objects.create(orders=orders, rules=len(rules[0]))
+    try:
+        write_rules(run, rules)
+    except Exception:
+        # The active run is untouched; drop the half-written one
+        FrequentlyBoughtTogether.objects.filter(run=run).delete()
+        run.delete()
+        raise
+    activate_run(run)
+    return run
+
+
+def get_active_run_id():
+    run_id = cache.get(ACTIVE_RUN_KEY)
+    if run_id is None:
+        run_id = FrequentlyBoughtTogetherRun.objects.filter(is_active=True).values_list('id', flat=True).first() or 0
+        cache.set(ACTIVE_RUN_KEY, run_id, timeout=None if run_id else 60)
+    return run_id
+
+
+def _neighbors_key(run_id, product_id):
+    return f"fbt_neighbors:{run_id}:{product_id}"
+
+
+def get_neighbors(product_ids, rules=None):
+    """
+    {product_id: [(recommended_id, confidence, lift), ...]} from the cache;
+    misses are loaded in one query. `rules` (from `rules_as_neighbors`)
+    replaces the active run, e.g. with rules mined for an evaluation.
+    """
+    if rules is not None:
+        return {product_id: rules[product_id] for product_id in product_ids if product_id in rules}
+
+    run_id = get_active_run_id()
+    if not run_id or not product_ids:
+        return {}
+
+    keys = {product_id: _neighbors_key(run_id, product_id) for product_id in product_ids}
+    cached = cache.get_many(list(keys.values()))
+    neighbors = {product_id: cached[key] for product_id, key in keys.items() if key in cached}
+
+    missing = [product_id for product_id in product_ids if product_id not in neighbors]
+    if missing:
+        loaded = defaultdict(list)
+        rows = (
+            FrequentlyBoughtTogether.objects.filter(run_id=run_id, product_id__in=missing)
+            .order_by('product_id', '-lift')
+            .values_list('product_id', 'recommended_id', 'confidence', 'lift')
+        )
+        for product_id, recommended_id, confidence, lift in rows:
+            loaded[product_id].append((recommended_id, confidence, lift))
+        found = {product_id: loaded.get(product_id, []) for product_id in missing}
+        cache.set_many({keys[product_id]: value for product_id, value in found.items()}, NEIGHBORS_TIMEOUT)
+        neighbors.update(found)
+    return neighbors
+
+
+def recommend_for_products(product_ids, limit=10, rules=None):
+    """
+    Published products most often bought with `product_ids`, best first. A
+    candidate's score is the sum of its confidence over every product that
+    recommends it (lift breaks ties). The given products themselves are excluded.
+    """
+    product_ids = {int(product_id) for product_id in product_ids if product_id}
+    scores = defaultdict(lambda: [0.0, 0.0])
+    for neighbors in get_neighbors(product_ids, rules).values():
+        for recommended_id, confidence, lift in neighbors:
+            if recommended_id not in product_ids:
+                scores[recommended_id][0] += confidence
+                scores[recommended_id][1] += lift
+    if not scores:
+        return []
+
+    ranked = sorted(scores, key=lambda product_id: (-scores[product_id][0], -scores[product_id][1], product_id))
+    # Over-fetch a little so unpublished candidates don't shrink the list
+    candidates = ranked[:limit * 2]
+    by_id = Product.objects.filter(id__in=candidates, status="published").in_bulk()
+    return [by_id[product_id] for product_id in candidates if product_id in by_id][:limit]
@@ -0,0 +1,428 @@
+# product/listing.py
+"""
+Shared listing engine for the category, brand and search pages.
+
+Every listing page used to rebuild the same pipeline by hand (price bounds,
+count, pagination, a Variants query per product and the sidebar facets).
+`ProductListing` runs that pipeline once, in a fixed number of queries
+regardless of page size:
+
+    1. price bounds (+ count when no filters are active)
+    2. filtered count and price bounds (only when filters are active)
+    3. the page itself, with its related objects prefetched
+    4. one query per requested facet
+
+Pages are numbered by default. Infinite-scroll clients can opt into cursor
+pagination with `?cursor=` (empty for the first page): the page is then found
+by seeking past the last row on an indexed sort key instead of an OFFSET, and
+the total comes from a short-lived cached count.
+"""
+import base64
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.db.models import Count, Max, Min, Prefetch, Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from core.currency import currency_context, get_request_currency
+from vendor.models import Vendor
+from .models import Brand, Color, Product, ProductReview, Size, Sub_Category, Variants
+from .serializers import (
+    BrandSerializer, ColorSerializer, ProductSerializer, SizeSerializer,
+    SubCategorySerializer, VariantSerializer, VendorSerializer,
+)
+
+LISTING_PAGE_SIZE = 12
+DEFAULT_FACETS = ('colors', 'sizes', 'brands', 'vendors')
+
+CURSOR_PARAM = 'cursor'
+SORT_PARAM = 'sort'
+# Sort keys a listing can be ordered (and seeked) by; id breaks ties
+SORT_FIELDS = ('id', 'price', 'trending_score', 'date')
+DEFAULT_SORT = 'id'
+LISTING_SUMMARY_TIMEOUT = 300  # seconds a cursor-mode count/price range is reused
+
+
+def parse_listing_sort(request):
+    """Read `?sort=` (e.g. `price`, `-trending_score`). Raises ValueError on unknown keys."""
+    ordering = request.GET.get(SORT_PARAM) or DEFAULT_SORT
+    if ordering.lstrip('-') not in SORT_FIELDS:
+        raise ValueError(f"Unsupported sort: {ordering}")
+    return ordering
+
+
+def encode_cursor(position):
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor into [sort value, id]. Raises ValueError when it was
+    tampered with; the sort value is checked by the listing, which knows its ordering.
+    """
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (TypeError, ValueError, UnicodeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(position, list) or len(position) != 2 or not is_cursor_integer(position[1]):
+        raise ValueError("Invalid cursor")
+    return position
+
+
+def is_cursor_integer(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def is_cursor_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def is_cursor_datetime(value):
+    # parse_datetime raises ValueError itself for well-formed but impossible dates
+    return isinstance(value, str) and parse_datetime(value) is not None
+
+
+# How the sort value of a cursor is checked, per sort field
+CURSOR_VALUE_CHECKS = {
+    'id': is_cursor_integer,
+    'price': is_cursor_number,
+    'trending_score': is_cursor_number,
+    'date': is_cursor_datetime,
+}
+
+
+def parse_listing_filters(request):
+    """
+    Read the sidebar filters from the query string.
+    Raises ValueError on malformed price bounds.
+    """
+    return {
+        'colors': [int(i) for i in request.GET.getlist('color') if i.isdigit()],
+        'sizes': [int(i) for i in request.GET.getlist('size') if i.isdigit()],
+        'brands': [int(i) for i in request.GET.getlist('brand') if i.isdigit()],
+        'vendors': [int(i) for i in request.GET.getlist('vendor') if i.isdigit()],
+        'rating': [int(i) for i in request.GET.getlist('rating') if i.isdigit()],
+        'min_price': float(request.GET.get('from')) if request.GET.get('from') else None,
+        'max_price': float(request.GET.get('to')) if request.GET.get('to') else None,
+    }
+
+
+def listing_page_queryset(queryset):
+    """Attach everything ProductSerializer and the variant details need for a page of products."""
+    return queryset.select_related(
+        'sub_category__category__main_category',
+        'vendor__about',
+        'brand',
+    ).prefetch_related(
+        'available_in_regions',
+        'delivery_options',
+        'vendor__followers',
+        'vendor__openinghour_set',
+        Prefetch('reviews', queryset=ProductReview.objects.select_related('user')),
+        Prefetch('variants', queryset=Variants.objects.select_related('color', 'size')),
+    )
+
+
+def facet_source(name):
+    """(base queryset, serializer, lookup to products) for a sidebar facet."""
+    return {
+        'colors': (Color.objects.all(), ColorSerializer, 'variants__product__in'),
+        'sizes': (Size.objects.all(), SizeSerializer, 'variants__product__in'),
+        'brands': (Brand.objects.all(), BrandSerializer, 'product__in'),
+        'vendors': (
+            Vendor.objects.select_related('about').prefetch_related('followers', 'openinghour_set'),
+            VendorSerializer,
+            'product__in',
+        ),
+        'categories': (
+            Sub_Category.objects.select_related('category__main_category'),
+            SubCategorySerializer,
+            'product__in',
+        ),
+    }[name]
+
+
+class ProductListing:
+    """
+    Build a listing page for a scope of published products.
+
+    `scope` is a Q object selecting the products (a sub category, a brand, a
+    vendor or a set of search hits). Facets are computed over the whole scope,
+    or over the filtered products when `facet_filtered` is set (search page).
+    """
+    page_size = LISTING_PAGE_SIZE
+    cursor_value_checks = CURSOR_VALUE_CHECKS
+
+    def __init__(self, request, scope, facets=DEFAULT_FACETS, facet_filtered=False):
+        self.request = request
+        self.scope = scope
+        self.facets = facets
+        self.facet_filtered = facet_filtered
+
+        self.currency, self.exchange_rate = get_request_currency(request)
+        self.filters = parse_listing_filters(request)
+        self.ordering = self.parse_ordering(request)
+
+        self.use_cursor = CURSOR_PARAM in request.GET
+        cursor = request.GET.get(CURSOR_PARAM)
+        self.cursor = self.parse_cursor(cursor) if cursor else None
+
+    def parse_ordering(self, request):
+        return parse_listing_sort(request)
+
+    def parse_cursor(self, cursor):
+        """
+        Decode a cursor and check its sort value against the active ordering, so
+        a tampered value is rejected here instead of failing the seek query.
+        """
+        position = decode_cursor(cursor)
+        try:
+            valid = self.cursor_value_checks[self.sort_field](position[0])
+        except (KeyError, ValueError):
+            valid = False
+        if not valid:
+            raise ValueError("Invalid cursor")
+        return position
+
+    def scoped_queryset(self):
+        return Product.objects.filter(self.scope, status="published")
+
+    @property
+    def sort_field(self):
+        return self.ordering.lstrip('-')
+
+    @property
+    def sort_descending(self):
+        return self.ordering.startswith('-')
+
+    def base_queryset(self):
+        if self.sort_field == 'id':
+            return self.scoped_queryset().order_by(self.ordering)
+        # id keeps the order total, which the cursor seek relies on
+        return self.scoped_queryset().order_by(self.ordering, '-id' if self.sort_descending else 'id')
+
+    def filter_q(self):
+        """
+        Translate the active filters into a Q object.
+        Variant filters use subqueries so the queryset never needs distinct();
+        rating is a plain WHERE on the denormalized average_rating column.
+        """
+        f = self.filters
+        filters = Q()
+
+        if f['colors']:
+            filters &= Q(id__in=Variants.objects.filter(color__id__in=f['colors']).values('product_id'))
+        if f['sizes']:
+            filters &= Q(id__in=Variants.objects.filter(size__id__in=f['sizes']).values('product_id'))
+        if f['brands']:
+            filters &= Q(brand__id__in=f['brands'])
+        if f['vendors']:
+            filters &= Q(vendor__id__in=f['vendors'])
+        if f['min_price'] is not None:
+            filters &= Q(price__gte=f['min_price'] / self.exchange_rate)
+        if f['max_price'] is not None:
+            filters &= Q(price__lte=f['max_price'] / self.exchange_rate)
+        if f['rating']:
+            filters &= Q(average_rating__gte=min(f['rating']))
+        return filters
+
+    def get_page_number(self, total_items):
+        total_pages = max(1, (total_items + self.page_size - 1) // self.page_size)
+        try:
+            requested_page = int(self.request.GET.get('page', '1'))
+        except ValueError:
+            requested_page = 1
+        if requested_page < 1 or requested_page > total_pages or total_items == 0:
+            requested_page = 1
+        return requested_page, total_pages
+
+    def page_links(self, page_number, total_pages):
+        url = self.request.build_absolute_uri()
+        next_link = replace_query_param(url, 'page', page_number + 1) if page_number < total_pages else None
+        if page_number <= 1:
+            previous_link = None
+        elif page_number == 2:
+            previous_link = remove_query_param(url, 'page')
+        else:
+            previous_link = replace_query_param(url, 'page', page_number - 1)
+        return next_link, previous_link
+
+    def seek_q(self, position):
+        """Rows strictly after `position` ([sort value, id]) in the listing order."""
+        value, last_id = position
+        op = 'lt' if self.sort_descending else 'gt'
+        if self.sort_field == 'id':
+            return Q(**{f'id__{op}': last_id})
+        return (
+            Q(**{f'{self.sort_field}__{op}': value})
+            | Q(**{self.sort_field: value, f'id__{op}': last_id})
+        )
+
+    def cursor_position(self, product):
+        value = getattr(product, self.sort_field)
+        if hasattr(value, 'isoformat'):
+            value = value.isoformat()
+        return [value, product.id]
+
+    def cursor_page(self, filtered_products):
+        """Fetch one page past the current cursor; returns (products, next_cursor)."""
+        if self.cursor:
+            filtered_products = filtered_products.filter(self.seek_q(self.cursor))
+
+        products = list(listing_page_queryset(filtered_products)[:self.page_size + 1])
+        if len(products) <= self.page_size:
+            return products, None
+
+        products = products[:self.page_size]
+        return products, encode_cursor(self.cursor_position(products[-1]))
+
+    def summary_cache_key(self, filtered_products):
+        """Key the cached summary on the compiled filter SQL, or None when it can't be compiled."""
+        try:
+            sql, params = filtered_products.order_by().query.sql_with_params()
+        except EmptyResultSet:
+            return None
+        digest = hashlib.md5(f"{sql}|{params}".encode()).hexdigest()
+        return f"listing_summary:{digest}"
+
+    def get_summary(self, scoped_queryset, filtered_products, filtered):
+        """Price bounds (unfiltered and filtered) and the filtered total."""
+        # Unfiltered price range for slider bounds; doubles as the count when no filter is active
+        unfiltered = scoped_queryset.aggregate(
+            min_price_unfiltered=Min('price'),
+            max_price_unfiltered=Max('price'),
+            total=Count('id'),
+        )
+        summary = {
+            'min_price_unfiltered': unfiltered['min_price_unfiltered'] or 0,
+            'max_price_unfiltered': unfiltered['max_price_unfiltered'] or 0,
+            'min_price': unfiltered['min_price_unfiltered'],
+            'max_price': unfiltered['max_price_unfiltered'],
+            'total': unfiltered['total'],
+        }
+        if filtered:
+            summary.update(filtered_products.aggregate(
+                min_price=Min('price'), max_price=Max('price'), total=Count('id'),
+            ))
+        return summary
+
+    def get_cached_summary(self, scoped_queryset, filtered_products, filtered):
+        """
+        Cursor pages are fetched one after another while scrolling, so the total
+        and price bounds are reused for a few minutes rather than recounted.
+        """
+        cache_key = self.summary_cache_key(filtered_products)
+        summary = cache.get(cache_key) if cache_key else None
+        if summary is None:
+            summary = self.get_summary(scoped_queryset, filtered_products, filtered)
+            if cache_key:
+                cache.set(cache_key, summary, timeout=LISTING_SUMMARY_TIMEOUT)
+        return summary
+
+    def get_facets(self, products):
+        product_ids = products.values('id')
+        facets = {}
+        for name in self.facets:
+            queryset, serializer, lookup = facet_source(name)
+            facets[name] = serializer(queryset.filter(**{lookup: product_ids}).distinct(), many=True).data
+        return facets
+
+    def serialize_products(self, products):
+        context = currency_context(self.request)
+        serialized_products = ProductSerializer(products, many=True, context=context).data
+
+        products_with_details = []
+        for product, product_data in zip(products, serialized_products):
+            product_variants = list(product.variants.all())
+            products_with_details.append({
+                'product': product_data,
+                'average_rating': product.average_rating,
+                'review_count': product.review_count,
+                'variants': VariantSerializer(product_variants, many=True, context=context).data,
+                'colors': [
+                    {'color__name': getattr(v.color, 'name', None), 'color__code': getattr(v.color, 'code', None), 'id': v.id}
+                    for v in product_variants
+                ],
+            })
+        return serialized_products, products_with_details
+
+    def get_results(self):
+        """
+        The currency-neutral outcome of the listing: the page of products, the
+        facets, the summary (prices in the base currency) and the page position.
+        """
+        scoped_queryset = self.scoped_queryset()
+        base_queryset = self.base_queryset()
+        filters = self.filter_q()
+        filtered_products = base_queryset.filter(filters) if filters else base_queryset
+
+        page_number = total_pages = next_cursor = None
+        if self.use_cursor:
+            summary = self.get_cached_summary(scoped_queryset, filtered_products, bool(filters))
+            paged_products, next_cursor = self.cursor_page(filtered_products)
+        else:
+            summary = self.get_summary(scoped_queryset, filtered_products, bool(filters))
+            total_items = summary['total']
+            page_number, total_pages = self.get_page_number(total_items)
+            offset = (page_number - 1) * self.page_size
+            paged_products = list(listing_page_queryset(filtered_products)[offset:offset + self.page_size]) if total_items else []
+
+        return {
+            'products': paged_products,
+            'ids': [product.id for product in paged_products],
+            'facets': self.get_facets(filtered_products if self.facet_filtered else scoped_queryset),
+            'summary': summary,
+            'page': page_number,
+            'total_pages': total_pages,
+            'next_cursor': next_cursor,
+        }
+
+    def get_data(self):
+        return self.render(self.get_results())
+
+    def render(self, results):
+        """Turn `get_results()` into the response for this request (currency, links)."""
+        if self.use_cursor:
+            previous_link = None  # cursor mode only scrolls forward
+            next_cursor = results['next_cursor']
+            next_link = replace_query_param(self.request.build_absolute_uri(), CURSOR_PARAM, next_cursor) if next_cursor else None
+        elif results['ids']:
+            next_link, previous_link = self.page_links(results['page'], results['total_pages'])
+        else:
+            next_link = previous_link = None
+        serialized_products, products_with_details = self.page_cards(results)
+        return self.page_data(
+            serialized_products, products_with_details, results['facets'], results['summary'],
+            next_link, previous_link, results['next_cursor'],
+        )
+
+    def page_cards(self, results):
+        """(serialized products, products with details) for the page, in the request currency."""
+        return self.serialize_products(results['products'])
+
+    def page_data(self, serialized_products, products_with_details, facets, summary, next_link, previous_link, next_cursor=None):
+        """Assemble the response shared by every listing page; prices go out in the request currency."""
+        min_price_unfiltered = summary['min_price_unfiltered']
+        max_price_unfiltered = summary['max_price_unfiltered']
+        exchange_rate = self.exchange_rate
+
+        data = {
+            **facets,
+            "products": serialized_products,
+            "products_with_details": products_with_details,
+            "min_price": round((summary['min_price'] or min_price_unfiltered) * exchange_rate, 2),
+            "max_price": round((summary['max_price'] or max_price_unfiltered) * exchange_rate, 2),
+            "min_price_unfiltered": round(min_price_unfiltered * exchange_rate, 2),
+            "max_price_unfiltered": round(max_price_unfiltered * exchange_rate, 2),
+            "default_max_price": round(10000 * exchange_rate, 2),
+            "currency": self.currency,
+            "next": next_link,
+            "previous": previous_link,
+            "total": summary['total'],
+        }
+        if self.use_cursor:
+            data["next_cursor"] = next_cursor
+        return data
@@ -0,0 +1,209 @@
+# product/local_search.py
+"""
+In-process full-text search, used when Elasticsearch is unavailable.
+
+An inverted index over the titles and descriptions of published products is
+built on first use and kept per process. Queries are scored with BM25 (title
+terms weigh double, like the ES `title^2` boost) and are typo tolerant: query
+terms also match indexed terms within the same edit distance ES uses for
+`fuzziness: AUTO`, found through a trigram index of the vocabulary, and the
+last term also matches as a prefix while the user is still typing.
+
+Changes to the indexed fields (LOCAL_INDEX_FIELDS) of a product bump a
+version token in the cache (`invalidate_local_search`), which makes every
+process rebuild its index on the next search. Other product writes (stock,
+views, trending scores) cannot change the index and leave the token alone.
+"""
+import bisect
+import math
+import re
+import threading
+import time
+import unicodedata
+import uuid
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.utils.functional import cached_property
+from django.utils.html import strip_tags
+
+from .listing import CURSOR_VALUE_CHECKS, ProductListing, is_cursor_integer, parse_listing_sort
+from .models import Product
+from .search_cache import SearchResultCacheMixin
+
+LOCAL_SEARCH_LIMIT = 500      # ranked hits handed to the listing
+INDEX_MAX_AGE = 600           # seconds before an index is rebuilt regardless
+VERSION_KEY = 'local_search_version'
+LOCAL_INDEX_FIELDS = ('title', 'description', 'status')
+TITLE_WEIGHT = 2.0
+FUZZY_PENALTY = 0.6           # score factor for a typo match
+PREFIX_PENALTY = 0.8          # score factor for a prefix match
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """Lowercase, strip accents (like ES asciifolding) and split into words."""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    return TOKEN_RE.findall(text)
+
+
+def trigrams(term):
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def max_edits(term):
+    """Edit distance allowed for a term, matching ES `fuzziness: AUTO`."""
+    if len(term) <= 2:
+        return 0
+    return 1 if len(term) <= 5 else 2
+
+
+def within_distance(a, b, limit):
+    """
+    Edit distance between a and b is at most `limit`. Like ES, a swap of two
+    adjacent letters counts as one edit (optimal string alignment).
+    """
+    if abs(len(a) - len(b)) > limit:
+        return False
+    before_previous = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before_previous[j - 2] + 1)
+        if min(current) > limit:
+            return False
+        before_previous, previous = previous, current
+    return previous[-1] <= limit
+
+
+class InvertedIndex:
+    def __init__(self, documents):
+        """`documents` yields (product_id, title, description)."""
+        self.postings = defaultdict(dict)   # term -> {product_id: weighted term frequency}
+        self.lengths = {}
+        for product_id, title, description in documents:
+            weights = defaultdict(float)
+            for term in tokenize(title):
+                weights[term] += TITLE_WEIGHT
+            for term in tokenize(strip_tags(description or '')):
+                weights[term] += 1.0
+            for term, weight in weights.items():
+                self.postings[term][product_id] = weight
+            self.lengths[product_id] = sum(weights.values())
+
+        self.average_length = (sum(self.lengths.values()) / len(self.lengths)) if self.lengths else 0
+        self.grams = defaultdict(set)
+        for term in self.postings:
+            for gram in trigrams(term):
+                self.grams[gram].add(term)
+        self.sorted_terms = sorted(self.postings)
+
+    def expand(self, term, prefix=False):
+        """Indexed terms matching `term`, with the factor their score is scaled by."""
+        matches = {}
+        if prefix:
+            start = bisect.bisect_left(self.sorted_terms, term)
+            for candidate in self.sorted_terms[start:]:
+                if not candidate.startswith(term):
+                    break
+                matches[candidate] = PREFIX_PENALTY
+        limit = max_edits(term)
+        if limit:
+            candidates = set()
+            for gram in trigrams(term):
+                candidates |= self.grams.get(gram, set())
+            for candidate in candidates:
+                if candidate not in matches and within_distance(term, candidate, limit):
+                    matches[candidate] = FUZZY_PENALTY
+        if term in self.postings:
+            matches[term] = 1.0
+        return matches
+
+    def search(self, query, limit=LOCAL_SEARCH_LIMIT):
+        """Return product ids ranked by BM25 score, best first."""
+        terms = tokenize(query)
+        scores = defaultdict(float)
+        total = len(self.lengths)
+        for position, term in enumerate(terms):
+            for match, factor in self.expand(term, prefix=position == len(terms) - 1).items():
+                postings = self.postings[match]
+                idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+                for product_id, tf in postings.items():
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[product_id] / (self.average_length or 1))
+                    scores[product_id] += factor * idf * tf * (BM25_K1 + 1) / (tf + norm)
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [product_id for product_id, _ in ranked[:limit]]
+
+
+_index = None
+_index_version = None
+_index_built_at = 0.0
+_index_lock = threading.Lock()
+
+
+def _current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex[:12]
+        if not cache.add(VERSION_KEY, version, timeout=None):
+            version = cache.get(VERSION_KEY) or version
+    return version
+
+
+def invalidate_local_search():
+    """Make every process rebuild its local index on its next search."""
+    cache.set(VERSION_KEY, uuid.uuid4().hex[:12], timeout=None)
+
+
+def get_local_index():
+    global _index, _index_version, _index_built_at
+    version = _current_version()
+    with _index_lock:
+        if _index is None or _index_version != version or time.monotonic() - _index_built_at > INDEX_MAX_AGE:
+            documents = (
+                Product.objects.filter(status="published")
+                .values_list('id', 'title', 'description').iterator(chunk_size=2000)
+            )
+            _index = InvertedIndex(documents)
+            _index_version = version
+            _index_built_at = time.monotonic()
+        return _index
+
+
+class LocalSearchListing(SearchResultCacheMixin, ProductListing):
+    """
+    Search listing ranked by the in-process index. Pages, filters and facets
+    work exactly like the other listings; results keep relevance order unless
+    `?sort=` asks for another key.
+    """
+    result_cache_backend = 'local'
+    cursor_value_checks = {**CURSOR_VALUE_CHECKS, 'search_rank': is_cursor_integer}
+
+    def __init__(self, request, query, facets=('colors', 'sizes', 'vendors', 'brands', 'categories')):
+        super().__init__(request, Q(), facets=facets, facet_filtered=True)
+        self.query = query
+
+    def parse_ordering(self, request):
+        return parse_listing_sort(request) if request.GET.get('sort') else 'search_rank'
+
+    @cached_property
+    def ranked_ids(self):
+        # Only ranked on a result cache miss
+        return get_local_index().search(self.query)
+
+    def scoped_queryset(self):
+        rank = Case(
+            *[When(id=product_id, then=Value(position)) for position, product_id in enumerate(self.ranked_ids)],
+            output_field=IntegerField(),
+        ) if self.ranked_ids else Value(0, output_field=IntegerField())
+        return Product.objects.filter(id__in=self.ranked_ids, status="published").annotate(search_rank=rank)
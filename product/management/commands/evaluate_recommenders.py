@@ -0,0 +1,49 @@
+# product/management/commands/evaluate_recommenders.py
+import json
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from product.evaluation import STRATEGIES, build_cases, evaluate, leaked_state
+
+
+class Command(BaseCommand):
+    help = 'Replay a time split of past orders against each recommender: hit rate, coverage, latency, queries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--split', help='ISO date; orders from then on are the test set (default: --test-days ago)')
+        parser.add_argument('--test-days', type=int, default=30)
+        parser.add_argument('--k', type=int, default=10)
+        parser.add_argument('--max-cases', type=int, default=1000)
+        parser.add_argument('--strategy', action='append', choices=sorted(STRATEGIES), dest='strategies',
+                            help='evaluate only this strategy (repeatable)')
+        parser.add_argument('--json', action='store_true', help='print the results as JSON')
+
+    def handle(self, *args, **options):
+        if options['split']:
+            try:
+                split = datetime.fromisoformat(options['split'])
+            except ValueError:
+                raise CommandError(f"Invalid --split date: {options['split']}")
+            if timezone.is_naive(split):
+                split = timezone.make_aware(split)
+        else:
+            split = timezone.now() - timedelta(days=options['test_days'])
+
+        cases = build_cases(split, max_cases=options['max_cases'])
+        if not cases:
+            raise CommandError(f'No customer ordered new products both before and after {split:%Y-%m-%d}')
+
+        results = evaluate(cases, split, options['strategies'], k=options['k'])
+        if options['json']:
+            self.stdout.write(json.dumps({'split': split.isoformat(), 'results': results}, indent=2))
+            return
+
+        self.stdout.write(f'{len(cases)} customers, split at {split:%Y-%m-%d %H:%M}')
+        columns = list(next(iter(results.values())))
+        self.stdout.write(f"{'strategy':<18}" + ''.join(f'{column:>12}' for column in columns))
+        for name, metrics in results.items():
+            cells = ''.join(f"{'-' if metrics[column] is None else metrics[column]:>12}" for column in columns)
+            self.stdout.write(f'{name:<18}{cells}')
+        for note in leaked_state(split, options['strategies']):
+            self.stdout.write(self.style.WARNING(f'Note: {note}'))
@@ -1,12 +1,23 @@
 # product/management/commands/index_products.py
-from django.core.management.base import BaseCommand
-from product.models import Product
-from elasticsearch8 import Elasticsearch
+from django.core.management.base import BaseCommand, CommandError
+from product.search_index import (
+    OUTBOX_BATCH_SIZE, begin_rebuild, bulk_index_products, create_index, drain_search_outbox, end_rebuild,
+    finish_index, indexable_products, new_index_name, swap_alias,
+)
+from product.search_cache import bump_catalog_version
+from product.search_client import get_search_client
 import time
-from django.db.models import Q
 
 class Command(BaseCommand):
-    help = 'Index products into Elasticsearch with improved search capabilities'
+    help = 'Rebuild the Elasticsearch product index into a new index and swap the products alias onto it'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='Documents per bulk request')
+        parser.add_argument('--threads', type=int, default=4, help='Parallel bulk workers')
+        parser.add_argument('--replicas', type=int, default=1, help='Replicas to restore once loading is done')
+        parser.add_argument('--keep-old', action='store_true', help="Don't delete the previous index after the swap")
+        parser.add_argument('--max-failures', type=int, default=0,
+                            help='Products allowed to fail indexing before the new index is discarded')
 
     def handle(self, *args, **options):
         # Connection setup with retries
@@ -14,18 +25,75 @@ class Command(BaseCommand):
         if not es:
             return
 
-        # Create or update index with better search configuration
-        self.setup_index(es)
+        index = new_index_name()
+        queryset = indexable_products()
+        total = queryset.count()
+        self.stdout.write(f"Building {index} with {total} products...")
+
+        # Edits from here on are held in the outbox and replayed into the new index after the swap
+        marker = begin_rebuild()
+        try:
+            create_index(es, index)
+            started = time.monotonic()
+            indexed, failed = bulk_index_products(
+                es, index, queryset,
+                chunk_size=options['chunk_size'],
+                thread_count=options['threads'],
+                progress=lambda done, errors, elapsed: self.report(done, errors, total, elapsed),
+            )
+            elapsed = time.monotonic() - started
+            finish_index(es, index, replicas=options['replicas'])
+        except Exception as e:
+            # Search keeps serving the old index; drop the half-built one
+            self.stdout.write(self.style.ERROR(f'Failed to build {index}: {str(e)}'))
+            es.indices.delete(index=index, ignore_unavailable=True)
+            end_rebuild(marker)
+            raise
+
+        if failed > options['max_failures']:
+            # Products missing from the new index would vanish from search: keep the old one live
+            es.indices.delete(index=index, ignore_unavailable=True)
+            end_rebuild(marker)
+            raise CommandError(f"{failed} products failed to index; {index} was discarded and the alias left as it was")
+        if failed:
+            self.stdout.write(self.style.WARNING(f"{failed} products failed to index"))
+
+        try:
+            previous = swap_alias(es, index)
+        finally:
+            end_rebuild(marker)
+        self.stdout.write(f"Alias products -> {index}")
+
+        replayed = 0
+        while True:
+            batch = drain_search_outbox(es)
+            replayed += batch
+            if batch < OUTBOX_BATCH_SIZE:
+                break
+        if replayed:
+            bump_catalog_version()
+            self.stdout.write(f"Replayed {replayed} search updates queued during the rebuild")
+
+        if not options['keep_old']:
+            for name in previous:
+                es.indices.delete(index=name, ignore_unavailable=True)
+                self.stdout.write(f"Deleted old index {name}")
+
+        rate = indexed / elapsed if elapsed else indexed
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully indexed {indexed}/{total} products in {elapsed:.1f}s ({rate:.0f} docs/s)'
+        ))
 
-        # Index products with improved data handling
-        self.index_products(es)
+    def report(self, done, failed, total, elapsed):
+        rate = done / elapsed if elapsed else done
+        self.stdout.write(f"Indexed {done}/{total} products ({failed} failed, {rate:.0f} docs/s)...")
 
     def connect_to_elasticsearch(self):
         max_retries = 5
         retry_delay = 5
         for attempt in range(max_retries):
             try:
-                es = Elasticsearch(hosts=["http://localhost:9200"], request_timeout=30)
+                es = get_search_client()
                 if not es.ping():
                     raise ConnectionError("Elasticsearch is not running or unreachable.")
                 return es
@@ -36,106 +104,3 @@ class Command(BaseCommand):
                 else:
                     self.stdout.write(self.style.ERROR(f"Failed to connect after {max_retries} attempts"))
                     return None
-
-    def setup_index(self, es):
-        try:
-            # Delete existing index if it exists
-            if es.indices.exists(index="products"):
-                es.indices.delete(index="products")
-
-            # Create new index with better search configuration
-            es.indices.create(
-                index="products",
-                body={
-                    "settings": {
-                        "analysis": {
-                            "analyzer": {
-                                "custom_analyzer": {
-                                    "type": "custom",
-                                    "tokenizer": "standard",
-                                    "filter": ["lowercase", "asciifolding"]
-                                }
-                            }
-                        }
-                    },
-                    "mappings": {
-                        "properties": {
-                            "title": {
-                                "type": "text",
-                                "analyzer": "custom_analyzer",
-                                "fields": {
-                                    "keyword": {"type": "keyword"}
-                                }
-                            },
-                            "description": {
-                                "type": "text",
-                                "analyzer": "custom_analyzer"
-                            },
-                            "price": {"type": "float"},
-                            "status": {"type": "keyword"},
-                            "vendor": {
-                                "type": "text",
-                                "fields": {
-                                    "keyword": {"type": "keyword"}
-                                }
-                            },
-                            "brand": {
-                                "type": "text",
-                                "fields": {
-                                    "keyword": {"type": "keyword"}
-                                }
-                            },
-                            "sub_category": {"type": "keyword"},
-                            "variants": {
-                                "type": "nested",
-                                "properties": {
-                                    "color": {"type": "keyword"},
-                                    "size": {"type": "keyword"}
-                                }
-                            }
-                        }
-                    }
-                }
-            )
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f'Failed to setup index: {str(e)}'))
-            raise
-
-    def index_products(self, es):
-        try:
-            # Only index published products
-            products = Product.objects.filter(status="published")
-            total = products.count()
-            success = 0
-
-            for i, product in enumerate(products, 1):
-                try:
-                    doc = {
-                        "id": product.id,
-                        "title": product.title,
-                        "description": str(product.description),
-                        "price": float(product.price),
-                        "status": product.status,
-                        "vendor": getattr(product.vendor, 'name', ''),
-                        "brand": getattr(getattr(product, 'brand', None), 'title', ''),
-                        "sub_category": getattr(getattr(product, 'sub_category', None), 'title', ''),
-                        "variants": [
-                            {
-                                "color": getattr(v.color, 'name', 'Unknown'),
-                                "size": getattr(v.size, 'name', 'Unknown')
-                            }
-                            for v in product.variants.all()
-                        ]
-                    }
-                    es.index(index="products", id=product.id, body=doc)
-                    success += 1
-                    
-                    # Progress update
-                    if i % 100 == 0 or i == total:
-                        self.stdout.write(f"Indexed {i}/{total} products...")
-                except Exception as e:
-                    self.stdout.write(self.style.WARNING(f"Failed to index product {product.id}: {str(e)}"))
-
-            self.stdout.write(self.style.SUCCESS(f'Successfully indexed {success}/{total} products'))
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f'Failed to index products: {str(e)}'))
\ No newline at end of file
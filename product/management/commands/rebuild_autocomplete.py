@@ -0,0 +1,14 @@
+# product/management/commands/rebuild_autocomplete.py
+from django.core.management.base import BaseCommand
+from product.autocomplete import rebuild_autocomplete_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the Redis prefix index behind search suggestions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        indexed = rebuild_autocomplete_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} products for autocomplete'))
@@ -0,0 +1,14 @@
+# product/management/commands/rebuild_product_ratings.py
+from django.core.management.base import BaseCommand
+from product.ratings import rebuild_product_ratings
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the denormalized rating columns on Product from approved reviews'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        updated = rebuild_product_ratings(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Updated ratings on {updated} products'))
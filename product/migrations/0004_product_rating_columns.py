@@ -0,0 +1,74 @@
+# Generated by Django 5.1.6 on 2026-10-18 17:36
+
+from django.db import migrations, models
+
+
+def backfill_ratings(apps, schema_editor):
+    Product = apps.get_model('product', 'Product')
+    ProductReview = apps.get_model('product', 'ProductReview')
+
+    histograms = {}
+    grouped = (
+        ProductReview.objects.filter(status=True, product__isnull=False, rating__in=range(1, 6))
+        .values('product_id', 'rating')
+        .annotate(total=models.Count('id'))
+        .order_by()
+    )
+    for row in grouped:
+        histograms.setdefault(row['product_id'], {})[row['rating']] = row['total']
+
+    fields = ['average_rating', 'review_count'] + [f'rating_{star}_count' for star in range(1, 6)]
+    products = list(Product.objects.filter(id__in=histograms.keys()).only('id'))
+    for product in products:
+        histogram = histograms[product.id]
+        product.review_count = sum(histogram.values())
+        product.average_rating = sum(star * count for star, count in histogram.items()) / product.review_count
+        for star in range(1, 6):
+            setattr(product, f'rating_{star}_count', histogram.get(star, 0))
+    Product.objects.bulk_update(products, fields, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0003_alter_product_delivery_returns_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='average_rating',
+            field=models.FloatField(db_index=True, default=0.0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_1_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_2_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_3_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_4_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_5_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_ratings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.6 on 2026-10-18 18:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0006_search_index_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EngagementWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_cart_item_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='brand',
+            name='cart_adds',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='sub_category',
+            name='cart_adds',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
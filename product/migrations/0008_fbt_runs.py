@@ -0,0 +1,63 @@
+# Generated by Django 5.1.6 on 2026-10-18 18:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def adopt_existing_rules(apps, schema_editor):
+    """Keep serving the rules mined before runs existed until the first new run replaces them."""
+    FrequentlyBoughtTogether = apps.get_model('product', 'FrequentlyBoughtTogether')
+    FrequentlyBoughtTogetherRun = apps.get_model('product', 'FrequentlyBoughtTogetherRun')
+    rules = FrequentlyBoughtTogether.objects.filter(run__isnull=True)
+    if rules.exists():
+        run = FrequentlyBoughtTogetherRun.objects.create(rules=rules.count(), is_active=True)
+        rules.update(run=run)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0007_engagement_watermark'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FrequentlyBoughtTogetherRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('rules', models.PositiveIntegerField(default=0)),
+                ('is_active', models.BooleanField(default=False)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='frequentlyboughttogether',
+            name='confidence',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='frequentlyboughttogether',
+            name='lift',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='frequentlyboughttogether',
+            name='support',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AlterUniqueTogether(
+            name='frequentlyboughttogether',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='frequentlyboughttogether',
+            name='run',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='pairs', to='product.frequentlyboughttogetherrun'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='frequentlyboughttogether',
+            unique_together={('run', 'product', 'recommended')},
+        ),
+        migrations.RunPython(adopt_existing_rules, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.6 on 2026-10-18 18:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0008_fbt_runs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarProducts',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='similar', serialize=False, to='product.product')),
+                ('neighbors', models.BinaryField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
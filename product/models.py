@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from shortuuid.django_fields import ShortUUIDField
 from django.utils.html import mark_safe
 from userauths.models import User
@@ -68,6 +68,7 @@ class Sub_Category(models.Model):
     category = models.ForeignKey(Category, related_name='category', on_delete=models.CASCADE, null=True)
     image = models.ImageField(upload_to="subcategory/", default="subcategory.jpg")
     views = models.PositiveIntegerField(default=0)
+    cart_adds = models.PositiveIntegerField(default=0)  # running tally kept by the engagement task
     engagement_score = models.FloatField(default=0.0)
     date = models.DateTimeField(auto_now_add=True, null=True,blank=True)
 
@@ -104,6 +105,7 @@ class Brand(models.Model):
     slug = models.SlugField(max_length=100, null=True, unique=True)
     image = models.ImageField(upload_to="brands/", default="brand.jpg")
     views = models.PositiveIntegerField(default=0)
+    cart_adds = models.PositiveIntegerField(default=0)  # running tally kept by the engagement task
     engagement_score = models.FloatField(default=0.0)
 
     def __str__(self):
@@ -227,6 +229,15 @@ class Product(models.Model):
     updated = models.DateTimeField(null=True, blank=True)
     views = models.PositiveIntegerField(default=0)
 
+    # Denormalized from approved ProductReview rows, kept current by product/ratings.py
+    average_rating = models.FloatField(default=0.0, db_index=True)
+    review_count = models.PositiveIntegerField(default=0)
+    rating_1_count = models.PositiveIntegerField(default=0)
+    rating_2_count = models.PositiveIntegerField(default=0)
+    rating_3_count = models.PositiveIntegerField(default=0)
+    rating_4_count = models.PositiveIntegerField(default=0)
+    rating_5_count = models.PositiveIntegerField(default=0)
+
     objects  = models.Manager() # Default Manager
     published = PublishedManager() # Custom Manager
 
@@ -235,10 +246,18 @@ class Product(models.Model):
     
     def save(self, *args, **kwargs):
         self.slug = slugify(self.title, allow_unicode=True)
-        super(Product, self).save(*args, **kwargs)
+        # Atomic so the search outbox row written by post_save commits with the product
+        with transaction.atomic():
+            super(Product, self).save(*args, **kwargs)
 
     class Meta:
         verbose_name_plural = "products"
+        indexes = [
+            # Listing sort keys, paired with id for cursor pagination (product/listing.py)
+            models.Index(fields=['price', 'id'], name='product_price_id_idx'),
+            models.Index(fields=['trending_score', 'id'], name='product_trending_id_idx'),
+            models.Index(fields=['date', 'id'], name='product_date_id_idx'),
+        ]
 
     def product_image(self):
         return mark_safe('<img src="%s" width="50" height="50" />' % (self.image.url))
@@ -254,6 +273,10 @@ class Product(models.Model):
     def packaging_fee(self):
         return calculate_packaging_fee(self.weight, self.volume)
 
+    def rating_histogram(self):
+        """Approved review counts per star, e.g. {1: 0, 2: 1, 3: 4, 4: 10, 5: 22}."""
+        return {star: getattr(self, f'rating_{star}_count') for star in range(1, 6)}
+
 
 
 
@@ -323,6 +346,11 @@ class Variants(models.Model):
         # Join components with a separator (e.g., " - ")
         return " - ".join(components)
 
+    def save(self, *args, **kwargs):
+        # Atomic so the search outbox row written by post_save commits with the variant
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     def __str__(self):
         return self.get_combined_title()
     
@@ -346,12 +374,42 @@ class VariantImage(models.Model):
         return mark_safe('<img src="%s" width="50" height="50" />' % (self.images.url))
 
 
+class FrequentlyBoughtTogetherRun(models.Model):
+    """
+    One generation of mined rules. Rules are written under a new run while the
+    active one keeps serving, then the active flag moves over in one transaction.
+    """
+    created_at = models.DateTimeField(auto_now_add=True)
+    orders = models.PositiveIntegerField(default=0)
+    rules = models.PositiveIntegerField(default=0)
+    is_active = models.BooleanField(default=False)
+
+    def __str__(self):
+        return f"FBT run {self.id} ({self.rules} rules{', active' if self.is_active else ''})"
+
+
 class FrequentlyBoughtTogether(models.Model):
+    run = models.ForeignKey(FrequentlyBoughtTogetherRun, related_name='pairs', on_delete=models.CASCADE, null=True)
     product = models.ForeignKey(Product, related_name='frequently_bought_with', on_delete=models.CASCADE)
     recommended = models.ForeignKey(Product, related_name='+', on_delete=models.CASCADE)
+    support = models.FloatField(default=0.0)     # share of orders containing both products
+    confidence = models.FloatField(default=0.0)  # share of `product` orders that also contain `recommended`
+    lift = models.FloatField(default=0.0)        # confidence relative to `recommended`'s own popularity
 
     class Meta:
-        unique_together = ('product', 'recommended')
+        unique_together = ('run', 'product', 'recommended')
+
+class SimilarProducts(models.Model):
+    """
+    A product's nearest neighbors by content (TF-IDF cosine), best first,
+    packed as little-endian uint32 ids. Rebuilt by compute_similar_products.
+    """
+    product = models.OneToOneField(Product, related_name='similar', on_delete=models.CASCADE, primary_key=True)
+    neighbors = models.BinaryField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"similar to product {self.product_id}"
 
 class ProductReview(models.Model):
     RATING = (
@@ -450,4 +508,29 @@ class ClippedCoupon(models.Model):
     clipped_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f"{self.user.email} clipped {self.coupon.code}"
\ No newline at end of file
+        return f"{self.user.email} clipped {self.coupon.code}"
+
+
+class SearchIndexOutbox(models.Model):
+    """
+    Products whose search document is out of date. Rows are written in the same
+    transaction as the change and drained by the sync_search_index task.
+    """
+    product_id = models.BigIntegerField(db_index=True)  # not a FK: deleted products are queued too
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ('id',)
+
+    def __str__(self):
+        return f"product {self.product_id}"
+
+
+class EngagementWatermark(models.Model):
+    """How far the engagement task has read the cart item log (one row per pipeline)."""
+    name = models.CharField(max_length=50, unique=True)
+    last_cart_item_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ cart item {self.last_cart_item_id}"
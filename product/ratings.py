@@ -0,0 +1,104 @@
+# product/ratings.py
+"""
+Keeps Product.average_rating, review_count and the per-star counters in step
+with approved ProductReview rows, so listings never need a review join.
+The search document carries the rating too, so every change is queued for
+the search index.
+"""
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, Value, When
+from django.db.models.functions import Cast, Greatest
+
+from .models import Product, ProductReview, SearchIndexOutbox
+from .search_index import queue_product_sync, schedule_search_sync
+
+RATING_FIELDS = ['average_rating', 'review_count'] + [f'rating_{star}_count' for star in range(1, 6)]
+
+
+def _average_expression():
+    stars_total = sum(
+        (Value(star) * F(f'rating_{star}_count') for star in range(2, 6)),
+        F('rating_1_count'),
+    )
+    return Case(
+        When(review_count=0, then=Value(0.0)),
+        default=Cast(stars_total, FloatField()) / Cast(F('review_count'), FloatField()),
+        output_field=FloatField(),
+    )
+
+
+def apply_review_delta(product_id, rating, delta):
+    """
+    Add (delta=1) or remove (delta=-1) one approved review of `rating` stars.
+    Counters are moved with F() so concurrent reviews don't overwrite each other,
+    and stop at zero: a counter that drifted low must not fail the review save
+    (`rebuild_product_ratings` puts it right). Call inside the review's
+    transaction: update() sends no Product signals, so the outbox row is written here.
+    """
+    if not product_id or rating not in range(1, 6):
+        return
+
+    products = Product.objects.filter(id=product_id)
+    products.update(**{
+        'review_count': Greatest(F('review_count') + delta, Value(0)),
+        f'rating_{rating}_count': Greatest(F(f'rating_{rating}_count') + delta, Value(0)),
+    })
+    products.update(average_rating=_average_expression())
+    queue_product_sync(product_id)
+    transaction.on_commit(schedule_search_sync)
+
+
+def compute_rating_stats(histogram):
+    """Turn {star: count} into the denormalized field values."""
+    review_count = sum(histogram.values())
+    stars_total = sum(star * count for star, count in histogram.items())
+    stats = {
+        'review_count': review_count,
+        'average_rating': stars_total / review_count if review_count else 0.0,
+    }
+    for star in range(1, 6):
+        stats[f'rating_{star}_count'] = histogram.get(star, 0)
+    return stats
+
+
+def rebuild_product_ratings(batch_size=1000):
+    """
+    Recompute every product's rating columns from approved reviews in one grouped
+    query, writing only the rows that changed and queueing them for the search
+    index. Returns the number of updated products.
+    """
+    histograms = {}
+    grouped = (
+        ProductReview.objects.filter(status=True, product__isnull=False, rating__in=range(1, 6))
+        .values('product_id', 'rating')
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+    for row in grouped:
+        histograms.setdefault(row['product_id'], {})[row['rating']] = row['total']
+
+    updated = 0
+    pending = []
+
+    def flush():
+        Product.objects.bulk_update(pending, RATING_FIELDS)
+        SearchIndexOutbox.objects.bulk_create([SearchIndexOutbox(product_id=product.id) for product in pending])
+
+    for product in Product.objects.only('id', *RATING_FIELDS).iterator(chunk_size=batch_size):
+        stats = compute_rating_stats(histograms.get(product.id, {}))
+        if all(getattr(product, field) == value for field, value in stats.items()):
+            continue
+        for field, value in stats.items():
+            setattr(product, field, value)
+        pending.append(product)
+
+        if len(pending) >= batch_size:
+            flush()
+            updated += len(pending)
+            pending = []
+
+    if pending:
+        flush()
+        updated += len(pending)
+
+    return updated
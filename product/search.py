@@ -0,0 +1,207 @@
+# product/search.py
+"""
+Search listing backed by Elasticsearch.
+
+The query, the sidebar filters (post_filter), the facet and price
+aggregations and the pagination all run in a single ES request. Postgres then
+only hydrates the page of results, in score order, plus one pk lookup per facet.
+"""
+from django.db.models import Q
+
+from .listing import ProductListing, decode_cursor, encode_cursor, facet_source, is_cursor_number, listing_page_queryset
+from .models import Product
+from .search_cache import SearchResultCacheMixin
+from .search_client import search
+from .search_index import PRODUCTS_ALIAS
+
+SEARCH_FACETS = ('colors', 'sizes', 'vendors', 'brands', 'categories')
+FACET_SIZE = 100
+MAX_RESULT_WINDOW = 10000  # the index's max_result_window: from + size can't go past it
+
+# ES fields for the facets; variant facets live in the nested `variants` documents
+FACET_FIELDS = {
+    'brands': 'brand_id',
+    'vendors': 'vendor_id',
+    'categories': 'sub_category_id',
+}
+VARIANT_FACET_FIELDS = {
+    'colors': 'variants.color_id',
+    'sizes': 'variants.size_id',
+}
+
+
+class SearchListing(SearchResultCacheMixin, ProductListing):
+    """
+    ProductListing whose filtering, facets and pagination happen in Elasticsearch.
+    Results keep relevance order unless `?sort=` asks for another key.
+    """
+    result_cache_backend = 'elasticsearch'
+
+    def __init__(self, request, query):
+        self.relevance = not request.GET.get('sort')
+        super().__init__(request, Q(), facets=SEARCH_FACETS, facet_filtered=True)
+        self.query = query
+
+    def parse_cursor(self, cursor):
+        """A search_after position: ES sorts every key as a number (dates as epoch millis, relevance by _score)."""
+        position = decode_cursor(cursor)
+        if not is_cursor_number(position[0]):
+            raise ValueError("Invalid cursor")
+        return position
+
+    def query_clause(self):
+        return {
+            "bool": {
+                "must": [{
+                    "multi_match": {
+                        "query": self.query,
+                        "fields": ["title^2", "description"],
+                        "fuzziness": "AUTO"
+                    }
+                }],
+                "filter": [{"term": {"status": "published"}}],
+            }
+        }
+
+    def filter_clauses(self):
+        """The sidebar filters as ES filter context (mirrors ProductListing.filter_q)."""
+        f = self.filters
+        clauses = []
+        if f['colors']:
+            clauses.append({"nested": {"path": "variants", "query": {"terms": {"variants.color_id": f['colors']}}}})
+        if f['sizes']:
+            clauses.append({"nested": {"path": "variants", "query": {"terms": {"variants.size_id": f['sizes']}}}})
+        if f['brands']:
+            clauses.append({"terms": {"brand_id": f['brands']}})
+        if f['vendors']:
+            clauses.append({"terms": {"vendor_id": f['vendors']}})
+
+        price_range = {}
+        if f['min_price'] is not None:
+            price_range['gte'] = f['min_price'] / self.exchange_rate
+        if f['max_price'] is not None:
+            price_range['lte'] = f['max_price'] / self.exchange_rate
+        if price_range:
+            clauses.append({"range": {"price": price_range}})
+
+        if f['rating']:
+            clauses.append({"range": {"average_rating": {"gte": min(f['rating'])}}})
+        return clauses
+
+    def sort_clause(self):
+        if self.relevance:
+            return [{"_score": "desc"}, {"id": "asc"}]
+        order = "desc" if self.sort_descending else "asc"
+        return [{self.sort_field: order}, {"id": order}]
+
+    def aggregations(self, filters):
+        facet_aggs = {
+            name: {"terms": {"field": field, "size": FACET_SIZE}}
+            for name, field in FACET_FIELDS.items() if name in self.facets
+        }
+        variant_aggs = {
+            name: {"terms": {"field": field, "size": FACET_SIZE}}
+            for name, field in VARIANT_FACET_FIELDS.items() if name in self.facets
+        }
+        if variant_aggs:
+            facet_aggs["variants"] = {"nested": {"path": "variants"}, "aggs": variant_aggs}
+
+        return {
+            # Slider bounds over every match, before the sidebar filters
+            "price_unfiltered": {"stats": {"field": "price"}},
+            # Facets and the filtered price range follow the active filters
+            "filtered": {
+                "filter": {"bool": {"filter": filters}},
+                "aggs": {"price": {"stats": {"field": "price"}}, **facet_aggs},
+            },
+        }
+
+    def search_body(self, page_number):
+        filters = self.filter_clauses()
+        body = {
+            "query": self.query_clause(),
+            "post_filter": {"bool": {"filter": filters}},
+            "aggs": self.aggregations(filters),
+            "sort": self.sort_clause(),
+            "size": self.page_size + 1 if self.use_cursor else self.page_size,
+            "track_total_hits": True,
+            "_source": False,
+        }
+        if self.use_cursor:
+            if self.cursor:
+                body["search_after"] = self.cursor
+        else:
+            body["from"] = (page_number - 1) * self.page_size
+        return body
+
+    def search(self, page_number):
+        return search(PRODUCTS_ALIAS, **self.search_body(page_number))
+
+    def hydrate(self, ids):
+        """Load the page's products in the order ES returned them."""
+        products = listing_page_queryset(Product.objects.filter(id__in=ids, status="published"))
+        by_id = {product.id: product for product in products}
+        return [by_id[product_id] for product_id in ids if product_id in by_id]
+
+    def facet_data(self, aggs):
+        buckets = dict(aggs)
+        buckets.update(aggs.get('variants', {}))
+        facets = {}
+        for name in self.facets:
+            ids = [bucket['key'] for bucket in buckets.get(name, {}).get('buckets', [])]
+            queryset, serializer, _ = facet_source(name)
+            by_id = {obj.id: obj for obj in queryset.filter(id__in=ids)} if ids else {}
+            facets[name] = serializer([by_id[i] for i in ids if i in by_id], many=True).data
+        return facets
+
+    def summary(self, response):
+        aggs = response['aggregations']
+        unfiltered = aggs['price_unfiltered']
+        filtered = aggs['filtered']['price']
+        return {
+            'min_price_unfiltered': unfiltered['min'] or 0,
+            'max_price_unfiltered': unfiltered['max'] or 0,
+            'min_price': filtered['min'],
+            'max_price': filtered['max'],
+            'total': response['hits']['total']['value'],
+        }
+
+    def get_results(self):
+        page_number = total_pages = next_cursor = None
+        if not self.use_cursor:
+            try:
+                page_number = int(self.request.GET.get('page', '1'))
+            except ValueError:
+                page_number = 1
+            # Pages past the result window would fail in ES
+            if page_number < 1 or page_number * self.page_size > MAX_RESULT_WINDOW:
+                page_number = 1
+
+        response = self.search(page_number or 1)
+        summary = self.summary(response)
+
+        if not self.use_cursor:
+            total_pages = max(1, min(
+                (summary['total'] + self.page_size - 1) // self.page_size,
+                MAX_RESULT_WINDOW // self.page_size,
+            ))
+            if page_number > total_pages:
+                # Out of range: the first page, as in ProductListing.get_page_number
+                page_number = 1
+                response = self.search(page_number)
+
+        hits = response['hits']['hits']
+        if self.use_cursor and len(hits) > self.page_size:
+            hits = hits[:self.page_size]
+            next_cursor = encode_cursor(hits[-1]['sort'])
+
+        ids = [int(hit['_id']) for hit in hits]
+        return {
+            'products': self.hydrate(ids),
+            'ids': ids,
+            'facets': self.facet_data(response['aggregations']['filtered']),
+            'summary': summary,
+            'page': page_number,
+            'total_pages': total_pages,
+            'next_cursor': next_cursor,
+        }
@@ -0,0 +1,119 @@
+# product/search_cache.py
+"""
+Result cache for the search page.
+
+Identical searches (same words, filters, sort and page) are answered from the
+cache instead of re-running Elasticsearch, the id hydration and the facet
+lookups. Two layers keep the cached data independent of the request currency:
+
+  * results: the page's product ids, the facet data, the summary (prices in
+    the base currency) and the page position, keyed by a canonical form of
+    the search. Spelling, word order of filters and price bounds entered in
+    another currency all map to the same entry.
+  * cards: each product's serialized card, per currency, shared by every
+    search that shows the product.
+
+A popular search in a popular currency is then served without touching ES
+or Postgres. Both layers embed the catalog version, which the signals in
+product/signals.py bump on every catalog change (and `sync_search_index`
+bumps again once ES has caught up), so stale entries are never read.
+"""
+import hashlib
+import json
+import uuid
+
+from django.core.cache import cache
+
+from .listing import listing_page_queryset
+from .models import Product
+
+SEARCH_RESULTS_TIMEOUT = 300
+PRODUCT_CARD_TIMEOUT = 600
+CATALOG_VERSION_KEY = 'catalog_version'
+
+
+def get_catalog_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex[:12]
+        if not cache.add(CATALOG_VERSION_KEY, version, timeout=None):
+            version = cache.get(CATALOG_VERSION_KEY) or version
+    return version
+
+
+def bump_catalog_version():
+    """Retire every cached search result and product card."""
+    cache.set(CATALOG_VERSION_KEY, uuid.uuid4().hex[:12], timeout=None)
+
+
+def canonical_search(listing, query):
+    """The parts of a search that decide its results, normalized so equivalent requests compare equal."""
+    from .local_search import tokenize
+    filters = listing.filters
+    rate = listing.exchange_rate
+    canonical = {
+        'q': ' '.join(tokenize(query)),
+        'sort': listing.request.GET.get('sort') or None,
+        'min_price': round(filters['min_price'] / rate, 2) if filters['min_price'] is not None else None,
+        'max_price': round(filters['max_price'] / rate, 2) if filters['max_price'] is not None else None,
+    }
+    for name in ('colors', 'sizes', 'brands', 'vendors', 'rating'):
+        canonical[name] = sorted(set(filters[name]))
+    if listing.use_cursor:
+        canonical['cursor'] = listing.cursor
+    else:
+        try:
+            canonical['page'] = max(1, int(listing.request.GET.get('page', '1')))
+        except ValueError:
+            canonical['page'] = 1
+    return canonical
+
+
+def search_results_key(backend, canonical, version):
+    digest = hashlib.md5(json.dumps(canonical, sort_keys=True).encode()).hexdigest()
+    return f"search_results:{backend}:{version}:{digest}"
+
+
+def product_card_key(product_id, currency, version):
+    return f"search_card:{version}:{currency}:{product_id}"
+
+
+class SearchResultCacheMixin:
+    """
+    Put a listing's results behind the search cache. The listing sets `query`,
+    and `result_cache_backend` separates engines that rank differently.
+    """
+    result_cache_backend = None
+
+    def get_data(self):
+        self.catalog_version = get_catalog_version()
+        key = search_results_key(self.result_cache_backend, canonical_search(self, self.query), self.catalog_version)
+        results = cache.get(key)
+        if results is None:
+            results = self.get_results()
+            cache.set(key, {name: value for name, value in results.items() if name != 'products'}, SEARCH_RESULTS_TIMEOUT)
+        return self.render(results)
+
+    def page_cards(self, results):
+        """Cards from the cache; only products missing there are loaded and serialized."""
+        ids = results['ids']
+        keys = {product_id: product_card_key(product_id, self.currency, self.catalog_version) for product_id in ids}
+        cached = cache.get_many(list(keys.values()))
+        cards = {product_id: cached[key] for product_id, key in keys.items() if key in cached}
+
+        missing = [product_id for product_id in ids if product_id not in cards]
+        if missing:
+            products = results.get('products')
+            if products is None:
+                products = listing_page_queryset(Product.objects.filter(id__in=missing, status="published"))
+            products = [product for product in products if product.id in missing]
+            serialized_products, products_with_details = self.serialize_products(products)
+            built = {
+                product.id: (product_data, details)
+                for product, product_data, details in zip(products, serialized_products, products_with_details)
+            }
+            cache.set_many({keys[product_id]: card for product_id, card in built.items()}, PRODUCT_CARD_TIMEOUT)
+            cards.update(built)
+
+        page = [cards[product_id] for product_id in ids if product_id in cards]
+        return [product_data for product_data, _ in page], [details for _, details in page]
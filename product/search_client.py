@@ -0,0 +1,204 @@
+# product/search_client.py
+"""
+Shared Elasticsearch client with a query deadline and a circuit breaker.
+
+Each process builds one pooled client from `settings.ELASTICSEARCH` on first
+use. Every request, task and command in the process shares it, so connections
+are reused instead of opened per request.
+
+Storefront queries go through `search()`. It gives each query a short
+deadline (SEARCH_TIMEOUT) with no retries. After BREAKER_FAILURES consecutive
+failures the breaker opens. While it is open, `search()` raises
+SearchUnavailable without contacting ES, and callers serve their fallback.
+After BREAKER_COOLDOWN seconds one trial query is let through. If the trial
+succeeds the breaker closes; if it fails the breaker opens again.
+
+`search_metrics()` reports the breaker state and query latency for this
+process.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from elasticsearch8 import ApiError, Elasticsearch, TransportError
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "HOSTS": ["http://localhost:9200"],
+    "MAX_CONNECTIONS": 25,
+    "REQUEST_TIMEOUT": 30,
+    "SEARCH_TIMEOUT": 2,
+    "BREAKER_FAILURES": 5,
+    "BREAKER_COOLDOWN": 30,
+}
+LATENCY_SAMPLES = 1000  # recent queries kept for the latency percentiles
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'ELASTICSEARCH', {})}
+
+
+class SearchUnavailable(Exception):
+    """Raised instead of querying Elasticsearch while the breaker is open."""
+
+
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold, cooldown):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Whether a query may go to ES now. In half-open state only one trial query is let through."""
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = self.HALF_OPEN
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("Search circuit breaker closed")
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.times_opened += 1
+                    logger.warning(
+                        f"Search circuit breaker opened after {self.failures} failures; "
+                        f"using the fallback for {self.cooldown}s"
+                    )
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def snapshot(self):
+        with self._lock:
+            retry_in = max(0.0, self.cooldown - (time.monotonic() - self.opened_at)) if self.state == self.OPEN else 0.0
+            return {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "times_opened": self.times_opened,
+                "retry_in_seconds": round(retry_in, 1),
+            }
+
+
+class QueryMetrics:
+    """Query counters and a window of recent latencies."""
+
+    def __init__(self, samples=LATENCY_SAMPLES):
+        self.queries = 0
+        self.failures = 0
+        self.rejected = 0
+        self.latencies = deque(maxlen=samples)
+        self._lock = threading.Lock()
+
+    def record(self, elapsed_ms, ok):
+        with self._lock:
+            self.queries += 1
+            if not ok:
+                self.failures += 1
+            self.latencies.append(elapsed_ms)
+
+    def record_rejected(self):
+        with self._lock:
+            self.rejected += 1
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self.latencies)
+            data = {"queries": self.queries, "failures": self.failures, "rejected": self.rejected}
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))], 1)
+
+        data["latency_ms"] = {
+            "p50": percentile(0.50),
+            "p95": percentile(0.95),
+            "p99": percentile(0.99),
+            "max": round(latencies[-1], 1) if latencies else None,
+            "samples": len(latencies),
+        }
+        return data
+
+
+_config = get_config()
+breaker = CircuitBreaker(_config["BREAKER_FAILURES"], _config["BREAKER_COOLDOWN"])
+metrics = QueryMetrics()
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def get_search_client():
+    """The process-wide client. Rebuilt after a fork so workers never share sockets."""
+    global _client, _client_pid
+    with _client_lock:
+        if _client is None or _client_pid != os.getpid():
+            config = get_config()
+            _client = Elasticsearch(
+                hosts=config["HOSTS"],
+                connections_per_node=config["MAX_CONNECTIONS"],
+                request_timeout=config["REQUEST_TIMEOUT"],
+            )
+            _client_pid = os.getpid()
+        return _client
+
+
+def _is_outage(error):
+    """Connection errors, timeouts and server-side errors count against the breaker; bad queries don't."""
+    if isinstance(error, TransportError):
+        return True
+    return isinstance(error, ApiError) and (error.meta.status >= 500 or error.meta.status == 429)
+
+
+def search(index, **body):
+    """Run a storefront query under the deadline and the breaker. Raises SearchUnavailable while it is open."""
+    if not breaker.allow():
+        metrics.record_rejected()
+        raise SearchUnavailable("Search circuit breaker is open")
+
+    client = get_search_client().options(request_timeout=get_config()["SEARCH_TIMEOUT"], max_retries=0)
+    started = time.monotonic()
+    try:
+        response = client.search(index=index, **body)
+    except Exception as e:
+        metrics.record((time.monotonic() - started) * 1000, ok=False)
+        if _is_outage(e):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        raise
+    metrics.record((time.monotonic() - started) * 1000, ok=True)
+    breaker.record_success()
+    return response
+
+
+def search_metrics():
+    return {"pid": os.getpid(), "breaker": breaker.snapshot(), **metrics.snapshot()}
@@ -0,0 +1,283 @@
+# product/search_index.py
+"""
+Elasticsearch product index: mapping, document shape and zero-downtime rebuilds.
+
+Searches always go through the `products` alias. A rebuild creates a fresh
+timestamped index (`products_20250101120000`), fills it through the bulk API
+and then moves the alias onto it in one atomic `update_aliases` call, so search
+keeps answering from the old index until the new one is complete.
+
+Between rebuilds the index is kept current incrementally: every Product or
+Variants change queues the product in `SearchIndexOutbox` inside the same
+transaction, and the `sync_search_index` task drains the queue with bulk
+upserts and deletes.
+
+While a rebuild runs, the drain would write to the index that is about to be
+replaced. So a rebuild first queues a marker row (`begin_rebuild`), and the
+drain stops at the oldest marker. The rows queued after it stay put until the
+rebuild has swapped the alias and removed its marker, and are then drained
+into the new index. A marker older than REBUILD_MARKER_TIMEOUT is left from a
+rebuild that died, and the drain drops it.
+"""
+import logging
+import time
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Prefetch
+from django.utils import timezone
+from elasticsearch8.helpers import bulk, parallel_bulk
+
+from core.dispatch import dispatch
+from .models import Product, SearchIndexOutbox, Variants
+
+logger = logging.getLogger(__name__)
+
+PRODUCTS_ALIAS = "products"
+OUTBOX_BATCH_SIZE = 500
+SYNC_DELAY = 2  # seconds; edits committed within this window share one sync run
+REBUILD_MARKER = 0  # outbox product_id that marks a running rebuild; no product has id 0
+REBUILD_MARKER_TIMEOUT = timedelta(hours=6)
+
+INDEX_SETTINGS = {
+    "analysis": {
+        "analyzer": {
+            "custom_analyzer": {
+                "type": "custom",
+                "tokenizer": "standard",
+                "filter": ["lowercase", "asciifolding"]
+            }
+        }
+    }
+}
+
+INDEX_MAPPINGS = {
+    "properties": {
+        "id": {"type": "long"},
+        "title": {
+            "type": "text",
+            "analyzer": "custom_analyzer",
+            "fields": {
+                "keyword": {"type": "keyword"}
+            }
+        },
+        "description": {
+            "type": "text",
+            "analyzer": "custom_analyzer"
+        },
+        "price": {"type": "float"},
+        "status": {"type": "keyword"},
+        "vendor": {
+            "type": "text",
+            "fields": {
+                "keyword": {"type": "keyword"}
+            }
+        },
+        "brand": {
+            "type": "text",
+            "fields": {
+                "keyword": {"type": "keyword"}
+            }
+        },
+        "sub_category": {"type": "keyword"},
+        # ids and numbers used by the search page's filters, facets and sorts
+        "vendor_id": {"type": "integer"},
+        "brand_id": {"type": "integer"},
+        "sub_category_id": {"type": "integer"},
+        "average_rating": {"type": "float"},
+        "trending_score": {"type": "float"},
+        "date": {"type": "date"},
+        "variants": {
+            "type": "nested",
+            "properties": {
+                "color": {"type": "keyword"},
+                "size": {"type": "keyword"},
+                "color_id": {"type": "integer"},
+                "size_id": {"type": "integer"}
+            }
+        }
+    }
+}
+
+
+def indexable_products():
+    """Published products with everything `product_document` reads, loaded in bulk."""
+    return (
+        Product.objects.filter(status="published")
+        .select_related('vendor', 'brand', 'sub_category')
+        .prefetch_related(Prefetch('variants', queryset=Variants.objects.select_related('color', 'size')))
+        .order_by('id')
+    )
+
+
+def product_document(product):
+    return {
+        "id": product.id,
+        "title": product.title,
+        "description": str(product.description),
+        "price": float(product.price),
+        "status": product.status,
+        "vendor": getattr(product.vendor, 'name', ''),
+        "brand": getattr(getattr(product, 'brand', None), 'title', ''),
+        "sub_category": getattr(getattr(product, 'sub_category', None), 'title', ''),
+        "vendor_id": product.vendor_id,
+        "brand_id": product.brand_id,
+        "sub_category_id": product.sub_category_id,
+        "average_rating": product.average_rating,
+        "trending_score": product.trending_score,
+        "date": product.date.isoformat() if product.date else None,
+        "variants": [
+            {
+                "color": getattr(v.color, 'name', 'Unknown'),
+                "size": getattr(v.size, 'name', 'Unknown'),
+                "color_id": v.color_id,
+                "size_id": v.size_id
+            }
+            for v in product.variants.all()
+        ]
+    }
+
+
+def new_index_name():
+    return f"{PRODUCTS_ALIAS}_{timezone.now().strftime('%Y%m%d%H%M%S')}"
+
+
+def create_index(es, index):
+    """Create an empty index tuned for bulk loading: no refreshes, no replicas."""
+    settings = {**INDEX_SETTINGS, "refresh_interval": "-1", "number_of_replicas": 0}
+    es.indices.create(index=index, settings=settings, mappings=INDEX_MAPPINGS)
+
+
+def finish_index(es, index, replicas=1):
+    """Restore normal settings on a bulk-loaded index and make its documents searchable."""
+    es.indices.put_settings(index=index, settings={"refresh_interval": "1s", "number_of_replicas": replicas})
+    es.indices.refresh(index=index)
+
+
+def bulk_index_products(es, index, queryset=None, chunk_size=500, thread_count=4, progress=None):
+    """
+    Stream products into `index` with parallel bulk requests.
+    `progress(done, failed, elapsed)` is called after every chunk. Returns (indexed, failed).
+    """
+    queryset = indexable_products() if queryset is None else queryset
+    actions = (
+        {"_index": index, "_id": product.id, "_source": product_document(product)}
+        for product in queryset.iterator(chunk_size=chunk_size)
+    )
+
+    indexed = failed = 0
+    started = time.monotonic()
+    for ok, _ in parallel_bulk(
+        es, actions, thread_count=thread_count, chunk_size=chunk_size, raise_on_error=False,
+    ):
+        if ok:
+            indexed += 1
+        else:
+            failed += 1
+        if progress and (indexed + failed) % chunk_size == 0:
+            progress(indexed, failed, time.monotonic() - started)
+    return indexed, failed
+
+
+def swap_alias(es, index):
+    """
+    Point the `products` alias at `index` in one atomic step. Returns the names
+    of the indices it was moved away from. A legacy concrete `products` index
+    (from before aliases were used) is dropped in the same step.
+    """
+    actions = []
+    previous = []
+    if es.indices.exists_alias(name=PRODUCTS_ALIAS):
+        previous = [name for name in es.indices.get_alias(name=PRODUCTS_ALIAS) if name != index]
+        actions += [{"remove": {"index": name, "alias": PRODUCTS_ALIAS}} for name in previous]
+    elif es.indices.exists(index=PRODUCTS_ALIAS):
+        actions.append({"remove_index": {"index": PRODUCTS_ALIAS}})
+
+    actions.append({"add": {"index": index, "alias": PRODUCTS_ALIAS}})
+    es.indices.update_aliases(actions=actions)
+    return previous
+
+
+def queue_product_sync(product_id):
+    """Mark a product's search document stale. Call inside the transaction that changed it."""
+    if product_id:
+        SearchIndexOutbox.objects.create(product_id=product_id)
+
+
+def schedule_search_sync():
+    """Run sync_search_index shortly, unless a run is already due. Call after commit."""
+    if not cache.add('search_sync_scheduled', 1, timeout=SYNC_DELAY):
+        return
+    from .tasks import sync_search_index
+    # Runs in on_commit of every product save: never wait on the broker. The
+    # outbox keeps the change, and the periodic sync picks it up if this fails.
+    dispatch(sync_search_index, countdown=SYNC_DELAY)
+
+
+def sync_products(es, product_ids):
+    """
+    Bring the documents of `product_ids` in line with the database: published
+    products are upserted, anything else (unpublished or deleted) is removed.
+    Returns (indexed, deleted).
+    """
+    products = list(indexable_products().filter(id__in=product_ids))
+    published_ids = {product.id for product in products}
+    actions = [
+        {"_op_type": "index", "_index": PRODUCTS_ALIAS, "_id": product.id, "_source": product_document(product)}
+        for product in products
+    ]
+    actions += [
+        {"_op_type": "delete", "_index": PRODUCTS_ALIAS, "_id": product_id}
+        for product_id in set(product_ids) - published_ids
+    ]
+    _, errors = bulk(es, actions, raise_on_error=False, raise_on_exception=True)
+    # Deleting a document that was never indexed is not a failure
+    errors = [e for e in errors if e.get('delete', {}).get('status') != 404]
+    if errors:
+        raise RuntimeError(f"{len(errors)} search documents failed to sync: {errors[:3]}")
+    return len(published_ids), len(actions) - len(published_ids)
+
+
+def begin_rebuild():
+    """Hold back the products queued from now on until `end_rebuild`. Returns the marker row."""
+    return SearchIndexOutbox.objects.create(product_id=REBUILD_MARKER)
+
+
+def end_rebuild(marker):
+    """Release the products held back by `marker`; drain them once the alias points at the new index."""
+    SearchIndexOutbox.objects.filter(id=marker.id).delete()
+
+
+def rebuild_watermark():
+    """Outbox id the drain must stop at while a rebuild runs, or None."""
+    markers = SearchIndexOutbox.objects.filter(product_id=REBUILD_MARKER).order_by('id')
+    for marker_id, created_at in markers.values_list('id', 'created_at'):
+        if created_at > timezone.now() - REBUILD_MARKER_TIMEOUT:
+            return marker_id
+        logger.warning(f"Dropping the search rebuild marker from {created_at:%Y-%m-%d %H:%M}; its rebuild never finished")
+        SearchIndexOutbox.objects.filter(id=marker_id).delete()
+    return None
+
+
+def drain_search_outbox(es, batch_size=OUTBOX_BATCH_SIZE):
+    """
+    Sync one batch of queued products. Repeated edits to the same product are
+    coalesced into a single document write. Rows are only removed once
+    Elasticsearch has accepted the batch, and concurrent drains skip each
+    other's rows. Rows queued after a running rebuild began are left for after
+    its swap. Returns the number of outbox rows processed.
+    """
+    watermark = rebuild_watermark()
+    with transaction.atomic():
+        queued = SearchIndexOutbox.objects.select_for_update(skip_locked=True).exclude(product_id=REBUILD_MARKER)
+        if watermark is not None:
+            queued = queued.filter(id__lt=watermark)
+        rows = list(queued.order_by('id').values_list('id', 'product_id')[:batch_size])
+        if not rows:
+            return 0
+
+        product_ids = {product_id for _, product_id in rows}
+        sync_products(es, product_ids)
+        SearchIndexOutbox.objects.filter(id__in=[row_id for row_id, _ in rows]).delete()
+    return len(rows)
@@ -12,7 +12,7 @@ from datetime import timedelta
 from userauths.tokens import otp_token_generator
 from django.db.models.query_utils import Q
 from address.models import *
-from core.service import get_exchange_rates
+from core.currency import CurrencyContextMixin
 
 
 User = get_user_model()
@@ -111,7 +111,7 @@ class ProductReviewSerializer(serializers.ModelSerializer):
         review = ProductReview.objects.create(user=user, **validated_data)
         return review
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(CurrencyContextMixin, serializers.ModelSerializer):
     sub_category = SubCategorySerializer()
     vendor = VendorSerializer()
     brand = BrandSerializer()
@@ -159,25 +159,11 @@ class ProductSerializer(serializers.ModelSerializer):
             "currency",
         ]
 
-    def get_currency(self, obj):
-        request = self.context.get('request')
-        return request.headers.get('X-Currency', 'GHS') if request else 'GHS'
-
     def get_price(self, obj):
-        request = self.context.get('request')
-        currency = request.headers.get('X-Currency', 'GHS') if request else 'GHS'
-        if currency:
-            rates = get_exchange_rates()
-            return round(obj.price * rates.get(currency, 1), 2)
-        return obj.price
+        return self.convert_price(obj.price)
 
     def get_old_price(self, obj):
-        request = self.context.get('request')
-        currency = request.headers.get('X-Currency', 'GHS') if request else 'GHS'
-        if currency:
-            rates = get_exchange_rates()
-            return round(obj.old_price * rates.get(currency, 1), 2)
-        return obj.old_price
+        return self.convert_price(obj.old_price)
 
     
 
@@ -198,7 +184,7 @@ class SizeSerializer(serializers.ModelSerializer):
         model = Size
         fields = '__all__'
 
-class VariantSerializer(serializers.ModelSerializer):
+class VariantSerializer(CurrencyContextMixin, serializers.ModelSerializer):
     product = ProductSerializer()
     size = SizeSerializer()
     color = ColorSerializer()
@@ -212,17 +198,8 @@ class VariantSerializer(serializers.ModelSerializer):
             "quantity", "image", "currency", "id"
         ]
 
-    def get_currency(self, obj):
-        request = self.context.get('request')
-        return request.headers.get('X-Currency', 'GHS') if request else 'GHS'
-
     def get_price(self, obj):
-        request = self.context.get('request')
-        currency = request.headers.get('X-Currency', 'GHS') if request else 'GHS'
-        rates = get_exchange_rates()  # Make sure this is imported and working
-
-        exchange_rate = rates.get(currency, 1)  # Default to 1 if currency not found
-        return round(obj.price * exchange_rate, 2)
+        return self.convert_price(obj.price)
 
 
 class VariantImageSerializer(serializers.ModelSerializer):
@@ -6,6 +6,8 @@ from datetime import timedelta
 
 from collections import Counter
 from .models import FrequentlyBoughtTogether, Product
+from .fbt import recommend_for_products
+from .user_recommendations import get_user_recommendations, trending_product_ids
 
 import json
 from order.models import OrderProduct
@@ -16,57 +18,21 @@ from datetime import timedelta
 
 
 def get_recommended_products(request):
-    user = request.auth
-    guest_cart_raw = request.headers.get('X-Guest-Cart')
-
-    recommended_ids = set()
-
-    if user:
-        # Products ordered by user
-        user_products = OrderProduct.objects.filter(order__user=request.user).values_list('product_id', flat=True)
-        print(f"User's ordered products: {user_products}")
-
-        # Orders where those products appear (co-occurrence)
-        related_order_ids = OrderProduct.objects.filter(product_id__in=user_products).values_list('order_id', flat=True)
-
-        # Other products often ordered together
-        co_ordered = OrderProduct.objects.filter(order_id__in=related_order_ids)\
-                        .exclude(product_id__in=user_products)\
-                        .values('product_id')\
-                        .annotate(freq=Count('product_id'))\
-                        .order_by('-freq')[:10]
-        recommended_ids.update([item['product_id'] for item in co_ordered])
-
-        # Category-based suggestions
-        categories = Product.objects.filter(id__in=user_products).values_list('sub_category', flat=True)
-        category_based = Product.objects.filter(sub_category__in=categories)\
-                                        .exclude(id__in=user_products)[:10]
-        recommended_ids.update(category_based.values_list('id', flat=True))
-
-        print(f"Recommended IDs after user-based logic: {recommended_ids}")
+    """Precomputed list for a signed-in customer; same-category picks for a guest cart; else trending."""
+    if request.user.is_authenticated:
+        return get_user_recommendations(request.user.id)
 
-    elif guest_cart_raw:
+    guest_cart_raw = request.headers.get('X-Guest-Cart')
+    recommended_ids = []
+    if guest_cart_raw:
         try:
             cart_items = json.loads(guest_cart_raw)  # List of {"p": productId, "q": quantity, ...}
             product_ids = [item['p'] for item in cart_items]
-
-            if product_ids:
-                categories = Product.objects.filter(id__in=product_ids).values_list('sub_category', flat=True)
-                guest_recommendations = Product.objects.filter(sub_category__in=categories)\
-                                                    .exclude(id__in=product_ids)[:10]
-                recommended_ids.update(guest_recommendations.values_list('id', flat=True))
-        except json.JSONDecodeError:
+            recommended_ids = same_category_recommendations(product_ids)
+        except (json.JSONDecodeError, TypeError, KeyError):
             pass  # Ignore if cookie is malformed
 
-    # Fallback to trending if no personalized data found
-    if not recommended_ids:
-        last_week = timezone.now() - timedelta(days=7)
-        trending = Product.objects.filter(
-            cartitem__date__gte=last_week
-        ).annotate(count=Count('cartitem')).order_by('-count')[:10]
-        recommended_ids.update(trending.values_list('id', flat=True))
-
-    return Product.objects.filter(id__in=recommended_ids)[:10]
+    return Product.objects.filter(id__in=recommended_ids or trending_product_ids(10))[:10]
 
 
 
@@ -85,32 +51,25 @@ def get_cart_based_recommendations(product_id):
     return Product.objects.filter(id__in=[r['product_id'] for r in related_product_ids])
 
 
-def get_category_based_recommendations(user):
-    product_ids = OrderProduct.objects.filter(order__user=user).values_list('product_id', flat=True)
-    categories = Product.objects.filter(id__in=product_ids).values_list('category', flat=True)
-    
-    return Product.objects.filter(category__in=categories).exclude(id__in=product_ids)[:10]
-
-
-def get_fbt_recommendations(cart_product_ids):
-    recommended = []
-
-    for product_id in cart_product_ids:
-        related = FrequentlyBoughtTogether.objects.filter(
-            product_id=product_id
-        ).values_list('recommended_id', flat=True)
+def same_category_recommendations(product_ids, limit=10):
+    """Ids of published products in the sub categories of `product_ids`, excluding them."""
+    if not product_ids:
+        return []
+    categories = Product.objects.filter(id__in=product_ids).values('sub_category')
+    return list(
+        Product.objects.filter(sub_category__in=categories, status="published")
+        .exclude(id__in=product_ids).values_list('id', flat=True)[:limit]
+    )
 
-        recommended.extend(related)
 
-    counter = Counter(recommended)
-
-    # Get top 10 most frequent
-    top_related_ids = [item[0] for item in counter.most_common(10)]
+def get_category_based_recommendations(user):
+    product_ids = list(OrderProduct.objects.filter(order__user=user).values_list('product_id', flat=True))
+    return Product.objects.filter(id__in=same_category_recommendations(product_ids))
 
-    # Exclude items already in the cart
-    final_ids = [pid for pid in top_related_ids if pid not in cart_product_ids]
 
-    return Product.objects.filter(id__in=final_ids)
+def get_fbt_recommendations(cart_product_ids, limit=10):
+    """Published products frequently bought with the cart, ranked, excluding what's already in it."""
+    return recommend_for_products(cart_product_ids, limit=limit)
 
 
 def get_cart_product_ids(request):
@@ -1,8 +1,23 @@
 from django.contrib.auth.signals import user_logged_in, user_logged_out
 from django.dispatch import receiver
-from order.models import Cart, Location, Address
+from order.models import Cart, CartItem, Location, Address, Order, OrderProduct
 from address.models import Address
-from django.db.models.signals import post_save, post_delete
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from .models import Brand, Color, Product, ProductDeliveryOption, ProductImages, ProductReview, Size, Sub_Category, Variants
+from vendor.models import Vendor
+from .ratings import apply_review_delta
+from .detail_cache import bump_product_version
+from .search_index import queue_product_sync, schedule_search_sync
+from .local_search import LOCAL_INDEX_FIELDS, invalidate_local_search
+from .autocomplete import sync_product as sync_autocomplete
+from .search_cache import bump_catalog_version
+from .trending import CART_WEIGHT, ORDER_WEIGHT
+from .trending_stream import record_trending_event
+from .user_recommendations import schedule_user_refresh
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 @receiver(user_logged_in)
@@ -47,19 +62,158 @@ def save_carts_before_logout(sender, request, user, **kwargs):
                 cart_item.save()
             item.delete()
 
-# from product.models import Product
-# from elasticsearch8 import Elasticsearch
+@receiver(pre_save, sender=ProductReview)
+def remember_review_rating(sender, instance, **kwargs):
+    """Snapshot what the stored row counted for, so post_save can apply only the difference."""
+    previous = None
+    if instance.pk:
+        previous = ProductReview.objects.filter(pk=instance.pk).values('product_id', 'rating', 'status').first()
+    instance._previous_rating_state = previous
+
+
+@receiver(post_save, sender=ProductReview)
+def update_product_rating(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_rating_state', None)
+    current = {'product_id': instance.product_id, 'rating': instance.rating, 'status': instance.status}
+    if previous == current:
+        return
+
+    if previous and previous['status']:
+        apply_review_delta(previous['product_id'], previous['rating'], -1)
+    if instance.status:
+        apply_review_delta(instance.product_id, instance.rating, 1)
+
+
+@receiver(post_delete, sender=ProductReview)
+def remove_product_rating(sender, instance, **kwargs):
+    if instance.status:
+        apply_review_delta(instance.product_id, instance.rating, -1)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_detail(sender, instance, **kwargs):
+    # After commit: a reader of the new version must not rebuild from the old rows
+    sku = instance.sku
+    transaction.on_commit(lambda: bump_product_version(sku))
+
+
+@receiver(post_save, sender=Variants)
+@receiver(post_delete, sender=Variants)
+@receiver(post_save, sender=ProductImages)
+@receiver(post_delete, sender=ProductImages)
+@receiver(post_save, sender=ProductReview)
+@receiver(post_delete, sender=ProductReview)
+@receiver(post_save, sender=ProductDeliveryOption)
+@receiver(post_delete, sender=ProductDeliveryOption)
+def invalidate_parent_product_detail(sender, instance, **kwargs):
+    """A child row changed, so the cached detail page of its product is stale."""
+    if instance.product_id:
+        sku = Product.objects.filter(pk=instance.product_id).values_list('sku', flat=True).first()
+        transaction.on_commit(lambda: bump_product_version(sku))
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def queue_product_search_sync(sender, instance, **kwargs):
+    # Runs inside the save/delete transaction, so a committed change always has its outbox row
+    queue_product_sync(instance.pk)
+    transaction.on_commit(schedule_search_sync)
+
+
+def _touches_local_index(update_fields):
+    return update_fields is None or bool(set(update_fields) & set(LOCAL_INDEX_FIELDS))
+
+
+@receiver(pre_save, sender=Product)
+def remember_local_search_fields(sender, instance, update_fields=None, **kwargs):
+    """Snapshot the fields the local search index reads, so post_save can tell whether they changed."""
+    previous = None
+    if instance.pk and _touches_local_index(update_fields):
+        previous = Product.objects.filter(pk=instance.pk).values(*LOCAL_INDEX_FIELDS).first()
+    instance._previous_local_search_fields = previous
+
+
+@receiver(post_save, sender=Product)
+def invalidate_local_search_on_save(sender, instance, update_fields=None, **kwargs):
+    if not _touches_local_index(update_fields):
+        return
+    previous = getattr(instance, '_previous_local_search_fields', None)
+    current = {field: getattr(instance, field) for field in LOCAL_INDEX_FIELDS}
+    if previous == current:
+        return
+    # The index only holds published products
+    if current['status'] != "published" and (previous is None or previous['status'] != "published"):
+        return
+    transaction.on_commit(invalidate_local_search)
+
+
+@receiver(post_delete, sender=Product)
+def invalidate_local_search_on_delete(sender, instance, **kwargs):
+    if instance.status == "published":
+        transaction.on_commit(invalidate_local_search)
+
+
+@receiver(post_save, sender=Variants)
+@receiver(post_delete, sender=Variants)
+def queue_variant_search_sync(sender, instance, **kwargs):
+    queue_product_sync(instance.product_id)
+    transaction.on_commit(schedule_search_sync)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def update_autocomplete(sender, instance, **kwargs):
+    """Publishing adds the product to the suggestion index; unpublishing or deleting removes it."""
+    def sync():
+        try:
+            sync_autocomplete(instance.pk)
+        except Exception as e:
+            logger.warning(f"Autocomplete update failed for product {instance.pk}: {e}")
+    transaction.on_commit(sync)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Variants)
+@receiver(post_delete, sender=Variants)
+@receiver(post_save, sender=ProductReview)
+@receiver(post_delete, sender=ProductReview)
+@receiver(post_save, sender=Brand)
+@receiver(post_delete, sender=Brand)
+@receiver(post_save, sender=Sub_Category)
+@receiver(post_delete, sender=Sub_Category)
+@receiver(post_save, sender=Color)
+@receiver(post_delete, sender=Color)
+@receiver(post_save, sender=Size)
+@receiver(post_delete, sender=Size)
+@receiver(post_save, sender=Vendor)
+@receiver(post_delete, sender=Vendor)
+def invalidate_search_results(sender, instance, **kwargs):
+    """Anything shown on, or filtered by, the search page changed: retire the cached results."""
+    transaction.on_commit(bump_catalog_version)
+
 
-# es = Elasticsearch(['http://elasticsearch:9200'])
+@receiver(post_save, sender=CartItem)
+@receiver(post_save, sender=OrderProduct)
+def record_trending_activity(sender, instance, created, **kwargs):
+    """A new cart line or order line adds to the product's trending score once it's committed."""
+    if not created or not instance.product_id:
+        return
+    weight = CART_WEIGHT if sender is CartItem else ORDER_WEIGHT
+    product_id = instance.product_id
+    # Read now, in the save transaction: the hook must not load the product or keep the instance alive
+    if sender.product.is_cached(instance):
+        sub_category_id = instance.product.sub_category_id
+    else:
+        sub_category_id = Product.objects.filter(pk=product_id).values_list('sub_category_id', flat=True).first()
+    transaction.on_commit(lambda: record_trending_event(product_id, sub_category_id, weight))
 
-# @receiver(post_save, sender=Product)
-# def update_product_index(sender, instance, **kwargs):
-#     if instance.status == 'published':
-#         doc = {
-#             # Your document structure
-#         }
-#         es.index(index="products", id=instance.id, body=doc)
 
-# @receiver(post_delete, sender=Product)
-# def delete_product_index(sender, instance, **kwargs):
-#     es.delete(index="products", id=instance.id, ignore=[404])
\ No newline at end of file
+@receiver(post_save, sender=OrderProduct)
+def refresh_buyer_recommendations(sender, instance, created, **kwargs):
+    """Recompute the buyer's "recommended for you" list shortly after they order."""
+    if created:
+        order_id = instance.order_id
+        transaction.on_commit(
+            lambda: schedule_user_refresh(Order.objects.filter(pk=order_id).values_list('user_id', flat=True).first())
+        )
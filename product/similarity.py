@@ -0,0 +1,142 @@
+# product/similarity.py
+"""
+Content-similar products from TF-IDF vectors.
+
+Every published product becomes a sparse vector over the words of its title
+(counted twice) and features, plus one token each for its brand and sub
+category. Term frequencies are dampened (1 + log tf), weighted by smoothed
+idf and the rows L2-normalised, so a row product is a cosine similarity.
+Terms that occur in a single product can't link two products, and terms
+shared by more than MAX_TERM_PRODUCTS products barely separate any two; both
+are dropped, which keeps the cost of the multiply close to linear.
+
+Neighbors come from X[block] @ X.T, BLOCK_SIZE rows at a time, so memory is
+bounded by one block's similarities. The best `k` per row are picked with
+a partial sort and stored, best first, as packed uint32 ids in
+SimilarProducts. The whole table is replaced in one transaction.
+
+The detail page and the recently-viewed endpoint read one row and hydrate the
+ids with one query. Products not covered yet (new since the last run) fall
+back to their sub category.
+"""
+import math
+from collections import defaultdict
+
+import numpy as np
+from django.db import transaction
+from django.utils.html import strip_tags
+from scipy.sparse import csr_matrix, diags
+
+from .local_search import tokenize
+from .models import Product, SimilarProducts
+
+SIMILAR_LIMIT = 10
+BLOCK_SIZE = 500
+WRITE_BATCH_SIZE = 2000
+TITLE_WEIGHT = 2
+MAX_TERM_PRODUCTS = 2000  # terms shared by more products say little and make the multiply quadratic
+ID_DTYPE = np.dtype('<u4')
+
+
+def product_terms(title, features, brand_id, sub_category_id):
+    """{term: count} for one product."""
+    counts = defaultdict(int)
+    for term in tokenize(title):
+        counts[term] += TITLE_WEIGHT
+    for term in tokenize(strip_tags(features or '')):
+        counts[term] += 1
+    if brand_id:
+        counts[f'brand:{brand_id}'] += 1
+    if sub_category_id:
+        counts[f'sub_category:{sub_category_id}'] += 1
+    return counts
+
+
+def tfidf_matrix():
+    """(product ids, L2-normalised TF-IDF matrix with one row per published product)."""
+    ids, rows, cols, data = [], [], [], []
+    vocabulary = {}
+    products = (
+        Product.objects.filter(status="published").order_by('id')
+        .values_list('id', 'title', 'features', 'brand_id', 'sub_category_id')
+        .iterator(chunk_size=2000)
+    )
+    for row, (product_id, title, features, brand_id, sub_category_id) in enumerate(products):
+        ids.append(product_id)
+        for term, count in product_terms(title, features, brand_id, sub_category_id).items():
+            rows.append(row)
+            cols.append(vocabulary.setdefault(term, len(vocabulary)))
+            data.append(1 + math.log(count))
+
+    matrix = csr_matrix(
+        (np.array(data, dtype=np.float32), (rows, cols)), shape=(len(ids), len(vocabulary)),
+    )
+    document_frequency = np.bincount(matrix.indices, minlength=len(vocabulary))
+    idf = np.log((1 + len(ids)) / (1 + document_frequency)) + 1
+    idf[(document_frequency < 2) | (document_frequency > MAX_TERM_PRODUCTS)] = 0
+    matrix = matrix @ diags(idf.astype(np.float32))
+    matrix.eliminate_zeros()
+
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return np.array(ids, dtype=np.int64), (diags(1 / norms) @ matrix).astype(np.float32).tocsr()
+
+
+def top_neighbors(matrix, k=SIMILAR_LIMIT, block_size=BLOCK_SIZE):
+    """Yield (row, [neighbor rows best first]) for every row with a neighbor, one block at a time."""
+    transposed = matrix.T.tocsr()
+    for start in range(0, matrix.shape[0], block_size):
+        scores = (matrix[start:start + block_size] @ transposed).tocsr()
+        for offset in range(scores.shape[0]):
+            row = start + offset
+            begin, end = scores.indptr[offset], scores.indptr[offset + 1]
+            cols, values = scores.indices[begin:end], scores.data[begin:end]
+            keep = (cols != row) & (values > 0)
+            cols, values = cols[keep], values[keep]
+            if not len(cols):
+                continue
+            if len(cols) > k:
+                # Everything above the k-th best score, then the lowest rows among those tied with it
+                kth = np.partition(values, len(values) - k)[len(values) - k]
+                above = np.flatnonzero(values > kth)
+                tied = np.flatnonzero(values == kth)
+                tied = tied[np.argsort(cols[tied], kind='stable')][:k - len(above)]
+                best = np.concatenate([above, tied])
+                cols, values = cols[best], values[best]
+            # Highest similarity first, lower row (older product) breaking ties
+            yield row, cols[np.lexsort((cols, -values))]
+
+
+def pack_ids(ids):
+    return np.asarray(ids, dtype=ID_DTYPE).tobytes()
+
+
+def unpack_ids(data):
+    return np.frombuffer(bytes(data), dtype=ID_DTYPE).tolist()
+
+
+def compute_similar_products(k=SIMILAR_LIMIT, block_size=BLOCK_SIZE):
+    """Rebuild SimilarProducts for every published product. Returns how many products got neighbors."""
+    ids, matrix = tfidf_matrix()
+    rows = [
+        SimilarProducts(product_id=int(ids[row]), neighbors=pack_ids(ids[neighbors]))
+        for row, neighbors in top_neighbors(matrix, k, block_size)
+    ] if len(ids) else []
+
+    with transaction.atomic():
+        SimilarProducts.objects.all().delete()
+        SimilarProducts.objects.bulk_create(rows, batch_size=WRITE_BATCH_SIZE)
+    return len(rows)
+
+
+def get_similar_products(product, limit=SIMILAR_LIMIT):
+    """Published products most similar to `product`, best first; its sub category when it has no neighbors yet."""
+    packed = SimilarProducts.objects.filter(product_id=product.id).values_list('neighbors', flat=True).first()
+    if packed is None:
+        return list(
+            Product.objects.filter(sub_category_id=product.sub_category_id, status="published")
+            .exclude(id=product.id)[:limit]
+        )
+    ids = unpack_ids(packed)[:limit]
+    by_id = Product.objects.filter(id__in=ids, status="published").in_bulk()
+    return [by_id[product_id] for product_id in ids if product_id in by_id]
@@ -1,114 +1,130 @@
 # tasks.py
+import logging
+import time
 from celery import shared_task
-from .models import Product, FrequentlyBoughtTogether, Brand, Category, Sub_Category
-from .trending import calculate_trending_score
-from celery import shared_task
-from django.db.models import Sum
-from order.models import CartItem
+from .trending_stream import decay_trending_sets, recompute_trending_scores, snapshot_trending_scores
+from .engagement import update_engagement_scores as update_scores
+from .fbt import mine_fbt_rules
+from .similarity import compute_similar_products as compute_similar
+from .user_recommendations import REFRESH_BATCH_SIZE, customers_with_orders, store_user_recommendations
+from .search_client import get_search_client
+from .search_index import OUTBOX_BATCH_SIZE, drain_search_outbox, schedule_search_sync
+from .search_cache import bump_catalog_version
+from .autocomplete import rebuild_autocomplete_index
+from .view_counters import COUNTED_MODELS, flush_view_counts as flush_counts
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
 
 @shared_task
-def update_trending_scores():
-    for product in Product.objects.filter(status="published"):
-        score = calculate_trending_score(product)
-        product.trending_score = score
-        product.save()
-
+def update_trending_scores(batch_size=1000):
+    """Decay the trending sets and snapshot them into Product.trending_score. Schedule every 10 minutes."""
+    started = time.monotonic()
+    try:
+        decay_trending_sets()
+        scanned, updated = snapshot_trending_scores(batch_size=batch_size)
+    except Exception as e:
+        logger.warning(f"Trending sets unavailable, recomputing from the database: {e}")
+        scanned, updated = recompute_trending_scores(batch_size=batch_size)
+    elapsed = time.monotonic() - started
+    if updated:
+        # bulk_update skips the save signals, so refresh the search side here
+        schedule_search_sync()
+        bump_catalog_version()
+    rate = scanned / elapsed if elapsed else scanned
+    return f"Trending scores: {updated}/{scanned} products updated in {elapsed:.1f}s ({rate:.0f} rows/s)."
 
 
-import pandas as pd
-from mlxtend.frequent_patterns import apriori, association_rules
-from celery import shared_task
-from order.models import Order
 
 @shared_task
-def generate_fbt():
-    # Step 1: Gather product transactions
-    orders = Order.objects.prefetch_related('order_products__product')
-    transactions = [
-        list({item.product.id for item in order.order_products.all()})
-        for order in orders
-        if order.order_products.exists()
-    ]
-
-    if not transactions:
+def generate_fbt(min_count=2, min_lift=1.0, max_rules_per_product=20):
+    """Mine frequently-bought-together rules from all orders and swap them in atomically."""
+    started = time.monotonic()
+    run = mine_fbt_rules(min_count=min_count, min_lift=min_lift, max_rules_per_product=max_rules_per_product)
+    if run is None:
         return "No transactions to process"
+    return f"Generated {run.rules} rules from {run.orders} orders in {time.monotonic() - started:.1f}s"
 
-    # Step 2: One-hot encoding (ensuring no duplicates)
-    df = pd.DataFrame(transactions)
-    df = df.apply(lambda x: pd.Series(1, index=pd.unique(x.dropna())), axis=1).fillna(0)
-
-    # Step 3: Run Apriori
-    frequent_itemsets = apriori(df, min_support=0.01, use_colnames=True)
-    if frequent_itemsets.empty:
-        return "No frequent itemsets found"
 
-    rules = association_rules(frequent_itemsets, metric="lift", min_threshold=1.0)
-    if rules.empty:
-        return "No association rules generated"
+@shared_task
+def compute_similar_products(k=10):
+    """Rebuild the content-similar neighbors of every published product. Schedule nightly."""
+    started = time.monotonic()
+    covered = compute_similar(k=k)
+    return f"Similar products computed for {covered} products in {time.monotonic() - started:.1f}s"
 
-    # Step 4: Save rules
-    FrequentlyBoughtTogether.objects.all().delete()
-    for _, row in rules.iterrows():
-        for a in row["antecedents"]:
-            for c in row["consequents"]:
-                if a != c:
-                    FrequentlyBoughtTogether.objects.get_or_create(
-                        product_id=a, recommended_id=c
-                    )
 
-    return f"Generated {rules.shape[0]} association rules"
+@shared_task
+def update_engagement_scores():
+    """Category, brand and sub category engagement in one pass over the new cart items and product views."""
+    updated = update_scores()
+    return "Engagement scores updated: " + ", ".join(f"{count} {level}" for level, count in updated.items())
 
 
+# The per-level tasks may still be referenced by existing beat schedules
 @shared_task
 def update_category_engagement_scores():
-    for category in Category.objects.all():
-        total_views = Product.published.filter(
-            sub_category__category=category
-        ).aggregate(score=Sum('views'))['score'] or 0
-
-        category.engagement_score = total_views
-        category.save()
-    return "Category engagement scores updated."
+    return update_engagement_scores()
 
 
 @shared_task
 def update_brand_engagement_scores():
-    brands = Brand.objects.all()
-
-    for brand in brands:
-        views = brand.views
+    return update_engagement_scores()
 
-        # Count how many times this brand’s products appear in cart items
-        cart_mentions = CartItem.objects.filter(
-            product__brand=brand
-        ).count()
 
-        # Example: weighted formula
-        score = (0.6 * views) + (0.4 * cart_mentions)
+@shared_task
+def update_subcategory_engagement_scores():
+    return update_engagement_scores()
 
-        brand.engagement_score = round(score, 2)
-        brand.save()
 
-    return "Engagement scores updated."
+@shared_task
+def sync_search_index(max_batches=20):
+    """Drain the search outbox into Elasticsearch. Also worth scheduling periodically as a safety net."""
+    es = get_search_client()
+    processed = 0
+    for _ in range(max_batches):
+        batch = drain_search_outbox(es)
+        processed += batch
+        if batch < OUTBOX_BATCH_SIZE:
+            break
+    if processed:
+        # Results cached while ES still lagged the database are stale now
+        bump_catalog_version()
+    return f"Synced {processed} queued search updates."
 
 
 @shared_task
-def update_subcategory_engagement_scores():
-    subcategories = Sub_Category.objects.all()
+def rebuild_autocomplete():
+    """Refresh suggestion rankings and brand/category renames; schedule alongside the trending update."""
+    indexed = rebuild_autocomplete_index()
+    return f"Indexed {indexed} products for autocomplete."
 
-    for subcategory in subcategories:
-        # Subcategory's direct view count
-        views = subcategory.views
 
-        # Count how many times products in this subcategory appear in cart items
-        cart_mentions = CartItem.objects.filter(
-            product__sub_category=subcategory
-        ).count()
-
-        # Weighted engagement score
-        score = (0.6 * views) + (0.4 * cart_mentions)
+@shared_task
+def flush_view_counts():
+    """Move buffered page views from Redis into the views columns. Schedule every minute."""
+    if not cache.add('view_counts_flush_lock', 1, timeout=300):
+        return "A view count flush is already running."
+    try:
+        flushed = {kind: flush_counts(kind) for kind in COUNTED_MODELS}
+    finally:
+        cache.delete('view_counts_flush_lock')
+    return "Flushed view counts: " + ", ".join(f"{count} {kind}" for kind, count in flushed.items())
 
-        subcategory.engagement_score = round(score, 2)
-        subcategory.save()
 
-    return "Subcategory engagement scores updated."
+@shared_task
+def refresh_user_recommendations(user_ids=None):
+    """Recompute "recommended for you" lists: for `user_ids` after an order, or everyone who has ordered. Schedule daily."""
+    if user_ids is not None:
+        return f"Refreshed {store_user_recommendations(user_ids)} recommendation lists."
+
+    refreshed = 0
+    batch = []
+    for user_id in customers_with_orders().iterator(chunk_size=REFRESH_BATCH_SIZE):
+        batch.append(user_id)
+        if len(batch) >= REFRESH_BATCH_SIZE:
+            refreshed += store_user_recommendations(batch)
+            batch = []
+    if batch:
+        refreshed += store_user_recommendations(batch)
+    return f"Refreshed {refreshed} recommendation lists."
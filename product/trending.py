@@ -1,28 +1,98 @@
 # utils/trending.py
 
-from django.utils import timezone
+from django.db.models import Count
 from datetime import timedelta
-from .models import Product
+from .models import Product, SearchIndexOutbox
 from order.models import CartItem, OrderProduct
 
-def calculate_trending_score(product):
-    now = timezone.now()
-    recent_days = now - timedelta(days=7)
+TRENDING_WINDOW = timedelta(days=7)
+VIEW_WEIGHT = 1
+CART_WEIGHT = 2
+ORDER_WEIGHT = 3
+# Relative change a stored score needs before it is rewritten and reindexed.
+# Decay scales every score by the same factor and leaves the ranking as it
+# was, so a run that only decays would otherwise touch every product for nothing.
+MIN_RELATIVE_CHANGE = 0.1
 
-    # 1. Views (weight = 1)
-    views_score = product.views
 
-    # 2. Recent Add to Cart (weight = 2)
-    cart_count = CartItem.objects.filter(
-        product=product, date__gte=recent_days
-    ).count()
-    cart_score = 2 * cart_count
+def recent_activity_counts(since, until=None):
+    """({product_id: cart adds}, {product_id: order lines}) since `since` (and before `until`), one grouped query each."""
+    cart_items = CartItem.objects.filter(date__gte=since, product__isnull=False)
+    order_lines = OrderProduct.objects.filter(date_created__gte=since)
+    if until is not None:
+        cart_items = cart_items.filter(date__lt=until)
+        order_lines = order_lines.filter(date_created__lt=until)
+    cart_counts = dict(
+        cart_items.values('product_id').annotate(total=Count('id')).order_by()
+        .values_list('product_id', 'total')
+    )
+    order_counts = dict(
+        order_lines.values('product_id').annotate(total=Count('id')).order_by()
+        .values_list('product_id', 'total')
+    )
+    return cart_counts, order_counts
 
-    # 3. Recent Purchases (weight = 3)
-    order_count = OrderProduct.objects.filter(
-        product=product, date_created__gte=recent_days
-    ).count()
-    order_score = 3 * order_count
 
-    # Combine all
-    return views_score + cart_score + order_score
+def trending_scores_at(moment):
+    """
+    {product_id: score} as the trending window ending at `moment` saw it.
+    Views are a running total with no history, so only cart adds and orders count.
+    """
+    cart_counts, order_counts = recent_activity_counts(moment - TRENDING_WINDOW, until=moment)
+    scores = {product_id: CART_WEIGHT * count for product_id, count in cart_counts.items()}
+    for product_id, count in order_counts.items():
+        scores[product_id] = scores.get(product_id, 0) + ORDER_WEIGHT * count
+    return scores
+
+
+def rank_by_trending(products, limit, scores=None):
+    """
+    Ids of the `products` queryset, most trending first, lower id breaking ties.
+    `scores` ({product_id: score}) replaces the stored trending_score, e.g. with
+    `trending_scores_at` for an evaluation.
+    """
+    if scores is None:
+        return list(products.order_by('-trending_score', 'id').values_list('id', flat=True)[:limit])
+    ids = products.values_list('id', flat=True)
+    return sorted(ids, key=lambda product_id: (-scores.get(product_id, 0), product_id))[:limit]
+
+
+def is_significant_change(old, new, min_change=MIN_RELATIVE_CHANGE):
+    """Whether `new` differs from `old` by more than `min_change` of the larger of the two."""
+    return abs(new - old) > min_change * max(abs(old), abs(new))
+
+
+def write_trending_scores(score_for, batch_size=1000, min_change=MIN_RELATIVE_CHANGE):
+    """
+    Store `score_for(product)` as every published product's trending score,
+    writing only the rows whose score moved by more than `min_change`
+    (relative; a score appearing or dropping to zero always counts). Updated
+    products are queued for the search index. Returns (products scanned,
+    products updated).
+    """
+    scanned = updated = 0
+    pending = []
+
+    def flush():
+        Product.objects.bulk_update(pending, ['trending_score'])
+        SearchIndexOutbox.objects.bulk_create([SearchIndexOutbox(product_id=product.id) for product in pending])
+
+    products = Product.objects.filter(status="published").only('id', 'trending_score')
+    for product in products.iterator(chunk_size=batch_size):
+        scanned += 1
+        score = score_for(product)
+        if not is_significant_change(product.trending_score or 0, score, min_change):
+            continue
+        product.trending_score = score
+        pending.append(product)
+
+        if len(pending) >= batch_size:
+            flush()
+            updated += len(pending)
+            pending = []
+
+    if pending:
+        flush()
+        updated += len(pending)
+
+    return scanned, updated
@@ -0,0 +1,138 @@
+# product/trending_stream.py
+"""
+Event-driven trending scores with exponential time decay, in Redis sorted sets.
+
+Views, cart adds and order lines each add their weight to the product's score
+in a global sorted set and in one per sub category, as they happen. The
+`update_trending_scores` task periodically decays every set by
+0.5 ** (elapsed / TRENDING_HALF_LIFE) with one ZUNIONSTORE per set, prunes
+scores that have faded out, and snapshots the global scores into
+`Product.trending_score`, which the listing sorts, the search index and the
+autocomplete ranking read.
+
+The trending endpoint reads its top N straight from the sorted sets. When the
+sets are missing (first deploy, Redis flushed) they are seeded by replaying
+the recent cart adds and orders with their real ages. When Redis is down,
+`recompute_trending_scores` snapshots the same replay straight from the
+database, so the stored scores stay on the scale the listing already sorts by.
+"""
+import logging
+import time
+
+from django.utils import timezone
+from django_redis import get_redis_connection
+
+from order.models import CartItem, OrderProduct
+from .models import Sub_Category
+from .trending import CART_WEIGHT, ORDER_WEIGHT, TRENDING_WINDOW, write_trending_scores
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'trending'
+GLOBAL_KEY = f'{KEY_PREFIX}:global'
+DECAYED_AT_KEY = f'{KEY_PREFIX}:decayed_at'
+TRENDING_HALF_LIFE = 2 * 24 * 3600  # seconds for an event's weight to halve
+MIN_SCORE = 0.01  # faded scores below this are dropped from the sets
+
+
+def sub_category_key(sub_category_id):
+    return f'{KEY_PREFIX}:sub_category:{sub_category_id}'
+
+
+def get_connection():
+    return get_redis_connection('default')
+
+
+def decay_factor(seconds):
+    return 0.5 ** (seconds / TRENDING_HALF_LIFE)
+
+
+def record_trending_event(product_id, sub_category_id, weight, conn=None):
+    """Add `weight` to a product's trending score. Best effort: never raises."""
+    if not product_id:
+        return
+    try:
+        pipe = (conn or get_connection()).pipeline(transaction=False)
+        pipe.zincrby(GLOBAL_KEY, weight, product_id)
+        if sub_category_id:
+            pipe.zincrby(sub_category_key(sub_category_id), weight, product_id)
+        pipe.execute()
+    except Exception as e:
+        logger.debug(f"Trending event not recorded: {e}")
+
+
+def top_trending(limit=10, sub_category_id=None, conn=None):
+    """Ids of the `limit` highest scoring products, best first."""
+    conn = conn or get_connection()
+    key = sub_category_key(sub_category_id) if sub_category_id else GLOBAL_KEY
+    return [int(product_id) for product_id in conn.zrevrange(key, 0, limit - 1)]
+
+
+def all_keys():
+    return [GLOBAL_KEY] + [sub_category_key(i) for i in Sub_Category.objects.values_list('id', flat=True)]
+
+
+def replay_recent_events(now=None):
+    """
+    Yield (product_id, sub_category_id, score) for every cart add and order
+    line in the trending window, its weight decayed by its age at `now`.
+    Views keep no history and are left out.
+    """
+    now = now or timezone.now()
+    events = [
+        (CartItem.objects.filter(date__gte=now - TRENDING_WINDOW, product__isnull=False), 'date', CART_WEIGHT),
+        (OrderProduct.objects.filter(date_created__gte=now - TRENDING_WINDOW), 'date_created', ORDER_WEIGHT),
+    ]
+    for queryset, date_field, weight in events:
+        rows = queryset.values_list('product_id', 'product__sub_category_id', date_field)
+        for product_id, sub_category_id, date in rows.iterator(chunk_size=2000):
+            yield product_id, sub_category_id, weight * decay_factor((now - date).total_seconds())
+
+
+def seed_trending_sets(conn=None):
+    """Rebuild the sets from the recent cart adds and order lines, each decayed by its age."""
+    conn = conn or get_connection()
+    pipe = conn.pipeline(transaction=False)
+    pipe.delete(*all_keys())
+    for product_id, sub_category_id, score in replay_recent_events():
+        pipe.zincrby(GLOBAL_KEY, score, product_id)
+        if sub_category_id:
+            pipe.zincrby(sub_category_key(sub_category_id), score, product_id)
+    pipe.set(DECAYED_AT_KEY, time.time())
+    pipe.execute()
+
+
+def decay_trending_sets(conn=None):
+    """Apply the decay accrued since the last run to every set and prune faded scores."""
+    conn = conn or get_connection()
+    now = time.time()
+    decayed_at = conn.get(DECAYED_AT_KEY)
+    if decayed_at is None or not conn.exists(GLOBAL_KEY):
+        seed_trending_sets(conn)
+        return
+
+    factor = decay_factor(now - float(decayed_at))
+    pipe = conn.pipeline(transaction=False)
+    for key in all_keys():
+        pipe.zunionstore(key, {key: factor})
+        pipe.zremrangebyscore(key, '-inf', f'({MIN_SCORE}')
+    pipe.set(DECAYED_AT_KEY, now)
+    pipe.execute()
+
+
+def snapshot_trending_scores(conn=None, batch_size=1000):
+    """Write the decayed global scores to Product.trending_score. Returns (scanned, updated)."""
+    conn = conn or get_connection()
+    scores = {int(product_id): score for product_id, score in conn.zrange(GLOBAL_KEY, 0, -1, withscores=True)}
+    return write_trending_scores(lambda product: round(scores.get(product.id, 0.0), 4), batch_size=batch_size)
+
+
+def recompute_trending_scores(batch_size=1000):
+    """
+    Snapshot the replayed, decayed scores of the recent cart adds and orders
+    into Product.trending_score; the fallback when Redis is down. Returns (scanned, updated).
+    """
+    scores = {}
+    for product_id, _, score in replay_recent_events():
+        scores[product_id] = scores.get(product_id, 0.0) + score
+    return write_trending_scores(lambda product: round(scores.get(product.id, 0.0), 4), batch_size=batch_size)
@@ -1,6 +1,6 @@
 
 from django.urls import path
-from .views import AjaxColorAPIView, ProductDetailAPIView, CategoryProductListView, BrandProductListView, CartDataView, RecentlyViewedProducts, ProductSearchAPIView, SearchSuggestionsAPIView, CartRecommendationsAPIView, FrequentlyBoughtTogetherAPIView, ProductsAPIView
+from .views import AjaxColorAPIView, ProductDetailAPIView, CategoryProductListView, BrandProductListView, CartDataView, RecentlyViewedProducts, ProductSearchAPIView, SearchHealthAPIView, SearchSuggestionsAPIView, CartRecommendationsAPIView, FrequentlyBoughtTogetherAPIView, ProductsAPIView
 
 urlpatterns = [
     # AJAX and custom endpoints
@@ -12,6 +12,7 @@ urlpatterns = [
     path('brand/<slug>/', BrandProductListView.as_view(), name='brand'),
     path('search/', ProductSearchAPIView.as_view(), name='product-search'),
     path('search-suggestions/', SearchSuggestionsAPIView.as_view(), name='search-suggestions'),
+    path('search-health/', SearchHealthAPIView.as_view(), name='search-health'),
 
     # Detailed product-related views
     path('<sku>/<slug>/', ProductDetailAPIView.as_view(), name='product-detail-api'),
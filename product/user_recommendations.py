@@ -0,0 +1,104 @@
+# product/user_recommendations.py
+"""
+Precomputed "recommended for you" lists.
+
+Each customer's list is a short list of product ids kept in the cache. It is
+computed in the background by the `refresh_user_recommendations` task after
+each order, and for everyone on a schedule. Serving a list is a single
+`id__in` query. Customers without a list yet get the trending products, and
+a refresh is queued for them.
+
+A list combines the products most often bought with what the customer
+ordered (the frequently-bought-together rules) with the most trending
+products from the same sub categories. It never includes what they already
+bought.
+"""
+from django.core.cache import cache
+
+from core.dispatch import dispatch
+from order.models import OrderProduct
+from .fbt import recommend_for_products
+from .models import Product
+from .trending import rank_by_trending
+from .trending_stream import top_trending
+
+RECOMMENDATION_LIMIT = 10
+RECOMMENDATIONS_TIMEOUT = 7 * 24 * 3600
+REFRESH_DELAY = 30  # seconds; orders placed close together share one refresh
+REFRESH_BATCH_SIZE = 500
+
+
+def _user_key(user_id):
+    return f"user_recommendations:{user_id}"
+
+
+def compute_user_recommendations(user_id, limit=RECOMMENDATION_LIMIT):
+    """Ranked product ids for a customer; empty when they have never ordered."""
+    ordered_ids = set(OrderProduct.objects.filter(order__user_id=user_id).values_list('product_id', flat=True))
+    return recommend_for_order_history(ordered_ids, limit)
+
+
+def recommend_for_order_history(ordered_ids, limit=RECOMMENDATION_LIMIT, rules=None, trending_scores=None):
+    """
+    Ranked product ids for someone who ordered `ordered_ids` (a set), excluding them.
+    `rules` and `trending_scores` replace the active bought-together run and the
+    stored trending scores (see the evaluation).
+    """
+    if not ordered_ids:
+        return []
+
+    ids = [product.id for product in recommend_for_products(ordered_ids, limit=limit, rules=rules)]
+    if len(ids) < limit:
+        same_category = Product.objects.filter(
+            status="published",
+            sub_category__in=Product.objects.filter(id__in=ordered_ids).values('sub_category'),
+        ).exclude(id__in=ordered_ids | set(ids))
+        ids += rank_by_trending(same_category, limit - len(ids), trending_scores)
+    return ids
+
+
+def store_user_recommendations(user_ids):
+    """Recompute and store the lists of `user_ids`. Returns how many were stored."""
+    stored = {_user_key(user_id): compute_user_recommendations(user_id) for user_id in user_ids}
+    cache.set_many(stored, RECOMMENDATIONS_TIMEOUT)
+    return len(stored)
+
+
+def customers_with_orders():
+    return (
+        OrderProduct.objects.filter(order__user__isnull=False)
+        .values_list('order__user_id', flat=True).distinct().order_by('order__user_id')
+    )
+
+
+def schedule_user_refresh(user_id):
+    """Queue a background refresh of one customer's list, unless one is already due. Call after commit."""
+    if not user_id or not cache.add(f"user_recommendations_scheduled:{user_id}", 1, timeout=REFRESH_DELAY):
+        return
+    from .tasks import refresh_user_recommendations
+    # Called while serving a request: never wait on the broker. The scheduled
+    # full refresh picks the customer up if this fails.
+    dispatch(refresh_user_recommendations, args=[[user_id]], countdown=REFRESH_DELAY)
+
+
+def trending_product_ids(limit=RECOMMENDATION_LIMIT):
+    """Top trending ids from the live sorted set, or from the snapshot column when Redis is unavailable."""
+    try:
+        ids = top_trending(limit)
+    except Exception:
+        ids = []
+    return ids or list(
+        Product.objects.filter(status="published").order_by('-trending_score').values_list('id', flat=True)[:limit]
+    )
+
+
+def get_user_recommendations(user_id, limit=RECOMMENDATION_LIMIT):
+    """The stored list for a customer, hydrated in one query; trending products when there is none."""
+    ids = cache.get(_user_key(user_id)) if user_id else None
+    if ids is None and user_id:
+        schedule_user_refresh(user_id)
+    if not ids:
+        ids = trending_product_ids(limit)
+
+    by_id = Product.objects.filter(id__in=ids[:limit * 2], status="published").in_bulk()
+    return [by_id[product_id] for product_id in ids if product_id in by_id][:limit]
@@ -0,0 +1,90 @@
+# product/view_counters.py
+"""
+Buffered view counters for products, categories and brands.
+
+Page views are counted in Redis hashes (one per model, field = object id) with
+a single HINCRBY, so the hot pages never write to the database or contend for
+row locks on popular items. The `flush_view_counts` task, meant to run every
+minute, moves the accumulated deltas into the `views` columns with one
+`UPDATE ... SET views = views + n` per distinct delta.
+
+Counting is best effort: while Redis is unavailable views are dropped rather
+than slowing the page down.
+"""
+import logging
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F
+from django_redis import get_redis_connection
+from redis.exceptions import ResponseError
+
+from .models import Brand, Category, Product, Sub_Category
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'view_counts'
+FLUSH_BATCH_SIZE = 1000
+COUNTED_MODELS = {
+    'product': Product,
+    'category': Category,
+    'sub_category': Sub_Category,
+    'brand': Brand,
+}
+
+
+def _counter_key(kind):
+    return f'{KEY_PREFIX}:{kind}'
+
+
+def get_connection():
+    return get_redis_connection('default')
+
+
+def record_views(*views):
+    """Count one view for each (kind, id) pair, e.g. record_views(('product', 3)). Never raises."""
+    try:
+        pipe = get_connection().pipeline(transaction=False)
+        for kind, object_id in views:
+            if object_id:
+                pipe.hincrby(_counter_key(kind), object_id, 1)
+        pipe.execute()
+    except Exception as e:
+        logger.debug(f"View not counted: {e}")
+
+
+def apply_view_deltas(model, deltas, batch_size=FLUSH_BATCH_SIZE):
+    """Add `deltas` ({id: count}) to `model.views`, one batched F() update per distinct count."""
+    ids_by_delta = defaultdict(list)
+    for object_id, delta in deltas.items():
+        if delta > 0:
+            ids_by_delta[delta].append(object_id)
+
+    with transaction.atomic():
+        for delta, ids in ids_by_delta.items():
+            for start in range(0, len(ids), batch_size):
+                model.objects.filter(id__in=ids[start:start + batch_size]).update(views=F('views') + delta)
+
+
+def flush_view_counts(kind, conn=None):
+    """
+    Move the buffered counts for `kind` into the database. Returns the number
+    of objects updated.
+
+    The live hash is renamed to a pending key first, so views counted during
+    the flush go to a fresh hash. If the database write fails, the pending
+    hash is kept and retried on the next run.
+    """
+    conn = conn or get_connection()
+    key = _counter_key(kind)
+    pending = f'{key}:pending'
+    if not conn.exists(pending):
+        try:
+            conn.rename(key, pending)
+        except ResponseError:
+            return 0  # nothing counted since the last flush
+
+    deltas = {int(object_id): int(count) for object_id, count in conn.hgetall(pending).items()}
+    apply_view_deltas(COUNTED_MODELS[kind], deltas)
+    conn.delete(pending)
+    return len(deltas)
@@ -8,15 +8,24 @@ from userauths.authentication import CustomJWTAuthentication
 from address.serializers import AddressSerializer
 
 from django.core.cache import cache
-from rest_framework.permissions import AllowAny
-from product.service import get_recommended_products, get_cart_based_recommendations
+from rest_framework.permissions import AllowAny, IsAdminUser
+from product.service import get_recommended_products
 from rest_framework import status
 from rest_framework.views import APIView
 
 from order.service import *
 from .service import get_fbt_recommendations, get_cart_product_ids
 from .shipping import can_product_ship_to_user
-from copy import deepcopy
+from .listing import ProductListing
+from .search import SearchListing
+from .local_search import LocalSearchListing
+from .autocomplete import suggest
+from .view_counters import record_views
+from .trending import VIEW_WEIGHT
+from .trending_stream import record_trending_event
+from core.currency import currency_context, get_request_currency
+from .detail_cache import get_product_detail
+from .similarity import get_similar_products
 
 class ProductsAPIView(APIView):
     permission_classes = [AllowAny]
@@ -57,55 +66,36 @@ class AjaxColorAPIView(APIView):
 
 
 def get_cached_product_data(sku, slug, request, currency):
-    cache_key = f"product_detail_cache:{sku}:{slug}:{currency}"
-    cached_data = cache.get(cache_key)
+    """Shared detail payload and product, served from the versioned detail cache."""
+    return get_product_detail(sku, slug, currency, lambda: build_product_data(sku, slug, request))
 
-    if cached_data:
-        return deepcopy(cached_data), Product.objects.get(sku=sku, slug=slug)
-    
+
+def build_product_data(sku, slug, request):
+    context = currency_context(request)
     product = get_object_or_404(
-        Product.objects.annotate(
-            average_rating=Avg('reviews__rating'),
-            review_count=Count('reviews')
-        ),
+        Product.objects.select_related('vendor', 'sub_category'),
         slug=slug,
         status='published',
         sku=sku
     )
 
-    p_images = ProductImageSerializer(product.p_images.all(), many=True, context={'request': request}).data
-    related_products = Product.objects.filter(sub_category=product.sub_category, status="published").exclude(id=product.id)[:10]
+    p_images = ProductImageSerializer(product.p_images.all(), many=True, context=context).data
+    related_products = get_similar_products(product)
     vendor_products = Product.objects.filter(vendor=product.vendor, status="published").exclude(id=product.id)[:10]
     reviews = ProductReview.objects.filter(product=product, status=True).order_by("-date")
     delivery_options = ProductDeliveryOption.objects.filter(product=product)
 
     shared_data = {
-        "product": ProductSerializer(product, context={'request': request}).data,
+        "product": ProductSerializer(product, context=context).data,
         "p_images": p_images,
-        "related_products": ProductSerializer(related_products, many=True, context={'request': request}).data,
-        "vendor_products": ProductSerializer(vendor_products, many=True, context={'request': request}).data,
-        "reviews": ProductReviewSerializer(reviews, many=True, context={'request': request}).data,
-        'average_rating': product.average_rating or 0,
-        'review_count': product.review_count or 0,
+        "related_products": ProductSerializer(related_products, many=True, context=context).data,
+        "vendor_products": ProductSerializer(vendor_products, many=True, context=context).data,
+        "reviews": ProductReviewSerializer(reviews, many=True, context=context).data,
+        'average_rating': product.average_rating,
+        'review_count': product.review_count,
         'delivery_options': ProductDeliveryOptionSerializer(delivery_options, many=True).data
     }
-
-    cache.set(cache_key, shared_data, timeout=600)
-    return deepcopy(shared_data), product
-
-
-def convert_currency(product_data, currency):
-    product_data['product']['currency'] = currency
-    product_data['product']['price'] = round(product_data['product']['price'], 2)
-    product_data['product']['old_price'] = round(product_data['product']['old_price'], 2)
-
-    for list_name in ['related_products', 'vendor_products']:
-        for p in product_data[list_name]:
-            p['currency'] = currency
-            p['price'] = round(p['price'], 2)
-            p['old_price'] = round(p['old_price'], 2)
-
-    return product_data
+    return shared_data, product
 
 
 class ProductDetailAPIView(APIView):
@@ -114,13 +104,12 @@ class ProductDetailAPIView(APIView):
     def get(self, request, sku, slug):
         try:
             variant_id = request.GET.get('variantid')
-            currency = request.headers.get('X-Currency', 'GHS')
-            rates = get_exchange_rates()
-            exchange_rate = rates.get(currency, 1)
+            currency, exchange_rate = get_request_currency(request)
 
-            # 🔁 Get cached or DB data
+            # 🔁 Get cached or DB data (shared between requests, don't mutate)
             shared_data, product = get_cached_product_data(sku, slug, request, currency)
-            shared_data = convert_currency(shared_data, currency)
+            record_views(('product', product.id))
+            record_trending_event(product.id, product.sub_category_id, VIEW_WEIGHT)
 
             # 🔄 Fresh: variant, stock, shipping, cart
             variant = Variants.objects.get(id=variant_id) if variant_id else Variants.objects.filter(product=product).first()
@@ -220,6 +209,17 @@ class SearchSuggestionsAPIView(APIView):
         query = request.GET.get("q", "").strip()
 
         if query:
+            # Prefix index in Redis; the LIKE scan below is only a fallback
+            try:
+                suggestions = suggest(query)
+            except Exception as e:
+                logger.warning(f"Autocomplete index unavailable: {str(e)}")
+            else:
+                for suggestion in suggestions:
+                    if suggestion["thumbnail"]:
+                        suggestion["thumbnail"] = request.build_absolute_uri(suggestion["thumbnail"])
+                return Response(suggestions, status=status.HTTP_200_OK)
+
             suggestions_qs = (
                 Product.objects
                 .filter(title__icontains=query, status="published")
@@ -243,270 +243,40 @@ class SearchSuggestionsAPIView(APIView):
 class CategoryProductListView(APIView):
     def get(self, request, slug):
         # Fetch the category by slug
-        category = Sub_Category.objects.filter(slug=slug).first()
+        category = Sub_Category.objects.select_related('category__main_category').filter(slug=slug).first()
         if not category:
             return Response({"detail": "Category not found"}, status=404)
-        
-        # Extract currency and exchange rate
-        currency = request.headers.get('X-Currency', 'GHS')
-        rates = get_exchange_rates()
-        exchange_rate = rates.get(currency, 1)
-
-        # Base queryset for the category (before filters)
-        base_queryset = Product.objects.filter(
-            status="published",
-            sub_category=category
-        ).annotate(
-            average_rating=Avg('reviews__rating'),
-            review_count=Count('reviews')
-        ).order_by('id')  # To prevent UnorderedObjectListWarning
-
-        # Unfiltered price range for slider bounds
-        unfiltered_price_range = base_queryset.aggregate(
-            min_price_unfiltered=Min('price'),
-            max_price_unfiltered=Max('price')
-        )
-        min_price_unfiltered = unfiltered_price_range['min_price_unfiltered'] or 0
-        max_price_unfiltered = unfiltered_price_range['max_price_unfiltered'] or 0
 
-        # Initialize filters
         try:
-            active_colors = [int(i) for i in request.GET.getlist('color') if i.isdigit()]
-            active_sizes = [int(i) for i in request.GET.getlist('size') if i.isdigit()]
-            active_brands = [int(i) for i in request.GET.getlist('brand') if i.isdigit()]
-            active_vendors = [int(i) for i in request.GET.getlist('vendor') if i.isdigit()]
-            rating = [int(i) for i in request.GET.getlist('rating') if i.isdigit()]
-            min_price = float(request.GET.get('from')) if request.GET.get('from') else None
-            max_price = float(request.GET.get('to')) if request.GET.get('to') else None
+            listing = ProductListing(request, Q(sub_category=category))
         except ValueError:
             return Response({"detail": "Invalid filter parameters"}, status=400)
 
-        # Apply filters to base queryset
-        filtered_products = base_queryset
-        filters = Q()
-
-        if active_colors:
-            filters &= Q(variants__color__id__in=active_colors)
-        if active_sizes:
-            filters &= Q(variants__size__id__in=active_sizes)
-        if active_brands:
-            filters &= Q(brand__id__in=active_brands)
-        if active_vendors:
-            filters &= Q(vendor__id__in=active_vendors)
-        if min_price is not None:
-            filters &= Q(price__gte=min_price / exchange_rate)
-        if max_price is not None:
-            filters &= Q(price__lte=max_price / exchange_rate)
-        if rating:
-            filters &= Q(average_rating__gte=min(rating))
-
-        if filters:
-            filtered_products = base_queryset.filter(filters).distinct().annotate(
-                average_rating=Avg('reviews__rating'),
-                review_count=Count('reviews')
-            )
-
-        # Price range based on filtered products
-        price_range = filtered_products.aggregate(
-            max_price=Max('price'), min_price=Min('price')
-        )
-
-        # Pagination
-        paginator = PageNumberPagination()
-        paginator.page_size = 12
-        try:
-            total_items = filtered_products.count()
-            total_pages = max(1, (total_items + paginator.page_size - 1) // paginator.page_size)
-            requested_page = int(request.GET.get('page', '1'))
-            if requested_page > total_pages or total_items == 0:
-                requested_page = 1
-            request._request.GET._mutable = True
-            request._request.GET['page'] = str(requested_page)
-            request._request.GET._mutable = False
-            paged_products = paginator.paginate_queryset(filtered_products, request)
-        except Exception:
-            paged_products = []
-            paginator._page_number = 1
-            paginator.page = None
-
-        # Serialize paginated products
-        serialized_products = ProductSerializer(paged_products, many=True, context={'request': request}).data
-
-        # Prepare product details
-        products_with_details = []
-        for product in paged_products or []:
-            product_variants = Variants.objects.filter(product=product)
-            product_colors = product_variants.values('color__name', 'color__code', 'id').distinct()
-            products_with_details.append({
-                'product': ProductSerializer(product, context={'request': request}).data,
-                'average_rating': product.average_rating or 0,
-                'review_count': product.review_count or 0,
-                'variants': VariantSerializer(product_variants, many=True).data,
-                'colors': list(product_colors),
-            })
-
-        # Sidebar filters
-        sizes = Size.objects.filter(variants__product__sub_category=category).distinct()
-        colors = Color.objects.filter(variants__product__sub_category=category).distinct()
-        brands = Brand.objects.filter(product__sub_category=category).distinct()
-        vendors = Vendor.objects.filter(product__sub_category=category).distinct()
-
-        context = {
-            "colors": ColorSerializer(colors, many=True).data,
-            "sizes": SizeSerializer(sizes, many=True).data,
-            "vendors": VendorSerializer(vendors, many=True).data,
-            "brands": BrandSerializer(brands, many=True).data,
-            "category": SubCategorySerializer(category).data,
-            "products": serialized_products,
-            "products_with_details": products_with_details,
-            "min_price": round((price_range['min_price'] or min_price_unfiltered) * exchange_rate, 2),
-            "max_price": round((price_range['max_price'] or max_price_unfiltered) * exchange_rate, 2),
-            "min_price_unfiltered": round(min_price_unfiltered * exchange_rate, 2),
-            "max_price_unfiltered": round(max_price_unfiltered * exchange_rate, 2),
-            "default_max_price": round(10000 * exchange_rate, 2),
-            "currency": currency,
-            "next": paginator.get_next_link() if paged_products else None,
-            "previous": paginator.get_previous_link() if paged_products else None,
-            "total": total_items,
-        }
+        context = listing.get_data()
+        context["category"] = SubCategorySerializer(category).data
+        record_views(('sub_category', category.id), ('category', category.category_id))
         return Response(context)
 
 
 class BrandProductListView(APIView):
     def get(self, request, slug):
         # Fetch the brand by slug
-        currency = request.headers.get('X-Currency', 'GHS')
-        rates = get_exchange_rates()
-        exchange_rate = rates.get(currency, 1)
-        
         brand = Brand.objects.filter(slug=slug).first()
         if not brand:
             return Response({"detail": "Brand not found"}, status=404)
-        
-        # Base queryset for the brand (before filters)
-        base_queryset = Product.objects.filter(
-            status="published",
-            brand=brand
-        ).annotate(
-            average_rating=Avg('reviews__rating'),
-            review_count=Count('reviews')
-        ).order_by('id')  # To prevent UnorderedObjectListWarning
-
-        # Unfiltered price range for slider bounds
-        unfiltered_price_range = base_queryset.aggregate(
-            min_price_unfiltered=Min('price'),
-            max_price_unfiltered=Max('price')
-        )
-        min_price_unfiltered = unfiltered_price_range['min_price_unfiltered'] or 0
-        max_price_unfiltered = unfiltered_price_range['max_price_unfiltered'] or 0
-
-        converted_min_unfiltered = round(min_price_unfiltered * exchange_rate, 2)
-        converted_max_unfiltered = round(max_price_unfiltered * exchange_rate, 2)
 
-
-        # Initialize filters
         try:
-            active_colors = [int(i) for i in request.GET.getlist('color') if i.isdigit()]
-            active_sizes = [int(i) for i in request.GET.getlist('size') if i.isdigit()]
-            active_vendors = [int(i) for i in request.GET.getlist('vendor') if i.isdigit()]
-            rating = [int(i) for i in request.GET.getlist('rating') if i.isdigit()]
-            min_price = float(request.GET.get('from')) if request.GET.get('from') else None
-            max_price = float(request.GET.get('to')) if request.GET.get('to') else None
+            listing = ProductListing(request, Q(brand=brand), facets=('colors', 'sizes', 'vendors'))
         except ValueError:
             return Response({"detail": "Invalid filter parameters"}, status=400)
 
-        # Apply filters to base queryset
-        filtered_products = base_queryset
-        filters = Q()
-
-        if active_colors:
-            filters &= Q(variants__color__id__in=active_colors)
-        if active_sizes:
-            filters &= Q(variants__size__id__in=active_sizes)
-        if active_vendors:
-            filters &= Q(vendor__id__in=active_vendors)
-        if min_price is not None:
-            filters &= Q(price__gte=min_price / exchange_rate)
-        if max_price is not None:
-            filters &= Q(price__lte=max_price / exchange_rate)
-        if rating:
-            filters &= Q(average_rating__gte=min(rating))
-
-        if filters:
-            filtered_products = base_queryset.filter(filters).distinct().annotate(
-                average_rating=Avg('reviews__rating'),
-                review_count=Count('reviews')
-            )
-
-        # Price range based on filtered products
-        price_range = filtered_products.aggregate(
-            max_price=Max('price'), min_price=Min('price')
-        )
-
-        converted_min_price = round((price_range['min_price'] or min_price_unfiltered) * exchange_rate, 2)
-        converted_max_price = round((price_range['max_price'] or max_price_unfiltered) * exchange_rate, 2)
-
-
-        # Pagination
-        paginator = PageNumberPagination()
-        paginator.page_size = 12
-        try:
-            total_items = filtered_products.count()
-            total_pages = max(1, (total_items + paginator.page_size - 1) // paginator.page_size)
-            requested_page = int(request.GET.get('page', '1'))
-            if requested_page > total_pages or total_items == 0:
-                requested_page = 1
-            request._request.GET._mutable = True
-            request._request.GET['page'] = str(requested_page)
-            request._request.GET._mutable = False
-            paged_products = paginator.paginate_queryset(filtered_products, request)
-        except Exception:
-            paged_products = []
-            paginator._page_number = 1
-            paginator.page = None
-
-        # Serialize paginated products
-        serialized_products = ProductSerializer(paged_products, many=True, context={'request': request}).data
-
-        # Prepare product details
-        products_with_details = []
-        for product in paged_products or []:
-            product_variants = Variants.objects.filter(product=product)
-            product_colors = product_variants.values('color__name', 'color__code', 'id').distinct()
-            products_with_details.append({
-                'product': ProductSerializer(product, context={'request': request}).data,
-                'average_rating': product.average_rating or 0,
-                'review_count': product.review_count or 0,
-                'variants': VariantSerializer(product_variants, many=True).data,
-                'colors': list(product_colors),
-            })
-
-        # Sidebar filters
-        sizes = Size.objects.filter(variants__product__brand=brand).distinct()
-        colors = Color.objects.filter(variants__product__brand=brand).distinct()
-        vendors = Vendor.objects.filter(product__brand=brand).distinct()
-
-        context = {
-            "colors": ColorSerializer(colors, many=True).data,
-            "sizes": SizeSerializer(sizes, many=True).data,
-            "vendors": VendorSerializer(vendors, many=True).data,
-            "brand": BrandSerializer(brand).data,
-            "products": serialized_products,
-            "products_with_details": products_with_details,
-            "min_price": converted_min_price,
-            "max_price": converted_max_price,
-            "min_price_unfiltered": converted_min_unfiltered,
-            "max_price_unfiltered": converted_max_unfiltered,
-            "currency": currency,
-            "exchange_rate": exchange_rate,
-            "default_max_price": round(10000 * exchange_rate,2),
-            "next": paginator.get_next_link() if paged_products else None,
-            "previous": paginator.get_previous_link() if paged_products else None,
-            "total": total_items,
-        }
+        context = listing.get_data()
+        context["brand"] = BrandSerializer(brand).data
+        record_views(('brand', brand.id))
+        context["exchange_rate"] = listing.exchange_rate
         return Response(context)
 
-from elasticsearch8 import Elasticsearch
+from .search_client import SearchUnavailable, search_metrics
 
 import logging
 
@@ -514,153 +284,45 @@ import logging
 logger = logging.getLogger(__name__)
 
 class ProductSearchAPIView(APIView):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.es = Elasticsearch(hosts=["http://localhost:9200"], request_timeout=30)
-
     def get(self, request, format=None):
         query = request.GET.get('q', '').strip()
 
-        # Initialize base queryset and aggregations
-        base_queryset = Product.objects.filter(title__icontains=query, status="published").annotate(
-            average_rating=Avg('reviews__rating'),
-            review_count=Count('reviews')
-        ).order_by('id')
-
-        # Currency setup
-        currency = request.headers.get('X-Currency', 'GHS')
-        rates = get_exchange_rates()
-        exchange_rate = rates.get(currency, 1)
-
-        # Get unfiltered price range for slider bounds
-        unfiltered_price_range = base_queryset.aggregate(
-            min_price_unfiltered=Min('price'),
-            max_price_unfiltered=Max('price')
-        )
-        min_price_unfiltered = unfiltered_price_range['min_price_unfiltered'] or 0
-        max_price_unfiltered = unfiltered_price_range['max_price_unfiltered'] or 0
-
-        # Initialize filters
-        try:
-            active_colors = [int(i) for i in request.GET.getlist('color') if i.isdigit()]
-            active_sizes = [int(i) for i in request.GET.getlist('size') if i.isdigit()]
-            active_brands = [int(i) for i in request.GET.getlist('brand') if i.isdigit()]
-            active_vendors = [int(i) for i in request.GET.getlist('vendor') if i.isdigit()]
-            rating = [int(i) for i in request.GET.getlist('rating') if i.isdigit()]
-            min_price = float(request.GET.get('from')) if request.GET.get('from') else None
-            max_price = float(request.GET.get('to')) if request.GET.get('to') else None
-        except ValueError:
-            return Response({"detail": "Invalid filter parameters"}, status=400)
-
-        # Apply filters to base queryset
-        filters = Q()
-        if active_colors:
-            filters &= Q(variants__color__id__in=active_colors)
-        if active_sizes:
-            filters &= Q(variants__size__id__in=active_sizes)
-        if active_brands:
-            filters &= Q(brand__id__in=active_brands)
-        if active_vendors:
-            filters &= Q(vendor__id__in=active_vendors)
-        if min_price is not None:
-            filters &= Q(price__gte=min_price / exchange_rate)
-        if max_price is not None:
-            filters &= Q(price__lte=max_price / exchange_rate)
-        if rating:
-            filters &= Q(average_rating__gte=min(rating))
-
         # === Elasticsearch Integration ===
-        product_ids = []
+        # Filters, facets and paging all run in ES; Postgres only hydrates the page
         if query:
             try:
-                body = {
-                    "query": {
-                        "multi_match": {
-                            "query": query,
-                            "fields": ["title^2", "description"],
-                            "fuzziness": "AUTO"
-                        }
-                    },
-                    "size": 1000,
-                    "_source": ["id"]
-                }
-
-                response = self.es.search(index="products", body=body)
-                product_ids = [hit["_source"]["id"] for hit in response["hits"]["hits"]]
-
-                filters &= Q(id__in=product_ids)
+                listing = SearchListing(request, query)
+            except ValueError:
+                return Response({"detail": "Invalid filter parameters"}, status=400)
+            try:
+                return Response(listing.get_data())
+            except SearchUnavailable:
+                pass  # breaker is open; go straight to the fallback
             except Exception as e:
                 logger.error(f"Elasticsearch error: {str(e)}")
 
-        # Apply all filters
-        filtered_products = base_queryset.filter(filters).distinct()
+        try:
+            if query:
+                # ES is unreachable: rank with the in-process index instead
+                listing = LocalSearchListing(request, query)
+            else:
+                listing = ProductListing(
+                    request, Q(),
+                    facets=('colors', 'sizes', 'vendors', 'brands', 'categories'),
+                    facet_filtered=True,
+                )
+        except ValueError:
+            return Response({"detail": "Invalid filter parameters"}, status=400)
 
-        # Price range based on filtered products
-        price_range = filtered_products.aggregate(
-            max_price=Max('price'),
-            min_price=Min('price')
-        )
+        return Response(listing.get_data())
 
-        # Pagination
-        paginator = PageNumberPagination()
-        paginator.page_size = 12
-        try:
-            total_items = filtered_products.count()
-            total_pages = max(1, (total_items + paginator.page_size - 1) // paginator.page_size)
-            requested_page = int(request.GET.get('page', '1'))
-            if requested_page > total_pages or total_items == 0:
-                requested_page = 1
-            request._request.GET._mutable = True
-            request._request.GET['page'] = str(requested_page)
-            request._request.GET._mutable = False
-            paged_products = paginator.paginate_queryset(filtered_products, request)
-        except Exception:
-            paged_products = []
-            paginator._page_number = 1
-            paginator.page = None
-
-        # Serialize paginated products
-        serialized_products = ProductSerializer(paged_products, many=True, context={'request': request}).data
-
-        # Prepare product details
-        products_with_details = []
-        for product in paged_products or []:
-            product_variants = Variants.objects.filter(product=product)
-            product_colors = product_variants.values('color__name', 'color__code', 'id').distinct()
-            products_with_details.append({
-                'product': ProductSerializer(product, context={'request': request}).data,
-                'average_rating': product.average_rating or 0,
-                'review_count': product.review_count or 0,
-                'variants': VariantSerializer(product_variants, many=True).data,
-                'colors': list(product_colors),
-            })
-
-        # Sidebar filters
-        sizes = Size.objects.filter(variants__product__in=filtered_products).distinct()
-        colors = Color.objects.filter(variants__product__in=filtered_products).distinct()
-        brands = Brand.objects.filter(product__in=filtered_products).distinct()
-        vendors = Vendor.objects.filter(product__in=filtered_products).distinct()
-        categories = Sub_Category.objects.filter(product__in=filtered_products).distinct()
-
-        context = {
-            "colors": ColorSerializer(colors, many=True).data,
-            "sizes": SizeSerializer(sizes, many=True).data,
-            "vendors": VendorSerializer(vendors, many=True).data,
-            "brands": BrandSerializer(brands, many=True).data,
-            "categories": SubCategorySerializer(categories, many=True).data,
-            "products": serialized_products,
-            "products_with_details": products_with_details,
-            "min_price": round((price_range['min_price'] or min_price_unfiltered) * exchange_rate, 2),
-            "max_price": round((price_range['max_price'] or max_price_unfiltered) * exchange_rate, 2),
-            "min_price_unfiltered": round(min_price_unfiltered * exchange_rate, 2),
-            "max_price_unfiltered": round(max_price_unfiltered * exchange_rate, 2),
-            "default_max_price": round(10000 * exchange_rate, 2),
-            "currency": currency,
-            "next": paginator.get_next_link() if paged_products else None,
-            "previous": paginator.get_previous_link() if paged_products else None,
-            "total": total_items,
-        }
-        return Response(context)
+
+class SearchHealthAPIView(APIView):
+    """Circuit breaker state and query latency of the search client in this worker process."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(search_metrics())
 
 
 
@@ -725,12 +387,7 @@ class CartRecommendationsAPIView(APIView):
             cart_product_ids = []
 
         # 1. Frequently bought together
-        bought_together_set = set()
-        for pid in cart_product_ids:
-            related_products = get_cart_based_recommendations(pid)
-            bought_together_set.update(related_products.values_list('id', flat=True))
-
-        bought_together = Product.objects.filter(id__in=bought_together_set).exclude(id__in=cart_product_ids)[:10]
+        bought_together = get_fbt_recommendations(list(cart_product_ids))
         bought_together_serialized = ProductSerializer(bought_together, many=True, context={'request': request}).data
 
         # 2. Personalized